@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'adorn_jewellery.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,7 +46,7 @@ ROOT_URLCONF = 'adorn_jewellery.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'adorn_jewellery.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -54,6 +55,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'adorn_jewellery.shop.context_processors.header_state',
             ],
         },
     },
@@ -79,6 +81,35 @@ DATABASES = {
 }
 
 
+# Cache - catalog reads, facet counts and product cards (see shop/cache.py)
+# CACHE_BACKEND: 'locmem' (per process), 'file' (shared via CACHE_LOCATION dir),
+# 'db' (run `python manage.py createcachetable` first), 'redis' (needs the
+# `redis` package) or 'memcached' (needs `pymemcache`).
+# The catalog version and header badge counts live in this cache, so with
+# more than one worker it must be shared and increment atomically;
+# CACHE_REQUIRE_SHARED (on outside DEBUG) fails the system check for any
+# backend but redis or memcached.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'adorn-catalog'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'adorn_cache'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+}
+_cache_name = config('CACHE_BACKEND', default='locmem')
+_cache_backend, _cache_location = CACHE_BACKENDS[_cache_name]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': config('CACHE_LOCATION', default=_cache_location),
+        'TIMEOUT': 60 * 60,
+    }
+}
+if _cache_name in ('locmem', 'file', 'db'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int)}
+CACHE_REQUIRE_SHARED = config('CACHE_REQUIRE_SHARED', default=not DEBUG, cast=bool)
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -100,11 +131,48 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Outside DEBUG, `collectstatic` writes content-hashed names plus .gz (and .br
+# when the `brotli` package is installed) copies, and the WSGI/ASGI entry
+# points serve STATIC_ROOT themselves with far-future cache headers.
+SERVE_STATIC = config('SERVE_STATIC', default=not DEBUG, cast=bool)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'adorn_jewellery.static_assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
 
+# Part of every ETag the catalog pages send; change it on deploy so browsers
+# re-fetch pages whose data is unchanged but whose templates are not.
+RELEASE_ID = config('RELEASE_ID', default='')
+
+# Server-Timing headers (queries, DB/template/mail time) on every response.
+# Every request is logged on `adorn_jewellery.timing` at INFO; slow requests
+# and repeated (N+1) queries at WARNING. Off unless DEBUG: the header tells
+# any visitor how much work a page costs.
+REQUEST_TIMING = config('REQUEST_TIMING', default=DEBUG, cast=bool)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'adorn_jewellery.timing': {
+            'handlers': ['console'],
+            'level': config('REQUEST_TIMING_LOG_LEVEL', default='WARNING'),
+        },
+    },
+}
+
+# Minutes a checkout holds stock before `release_expired_reservations` returns it
+STOCK_RESERVATION_MINUTES = config('STOCK_RESERVATION_MINUTES', default=15, cast=int)
+
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -112,7 +180,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ──────────────────────────────────────────────
 # EMAIL CONFIGURATION — SECURE & WORKING ON WINDOWS
 # ──────────────────────────────────────────────
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Views only queue mail; `python manage.py send_queued_mail` delivers it.
+# Point EMAIL_BACKEND at the console or file backend to test locally.
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = config('EMAIL_FILE_PATH', default=str(BASE_DIR / 'sent_emails'))
 EMAIL_HOST = config('EMAIL_HOST')
 EMAIL_PORT = config('EMAIL_PORT', cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', cast=bool)
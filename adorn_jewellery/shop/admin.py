@@ -1,5 +1,18 @@
+import time
+from datetime import timedelta
+
 from django.contrib import admin
-from .models import Category, Product, Order, OrderItem, ContactMessage
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.utils import timezone
+from .models import Category, Product, Order, OrderItem, ContactMessage, DailySales, QueuedEmail, StockReservation
+from . import exports, order_numbers
+from .cache import bump_catalog_version
+from .changelists import LargeTableAdmin, bulk_edit
+from .sales import report
+from .search import search_product_ids
 
 
 @admin.register(Category)
@@ -9,13 +22,42 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ['name', 'category', 'price', 'stock', 'is_featured', 'is_available', 'created_at']
     list_filter = ['category', 'is_featured', 'is_available', 'created_at']
     list_editable = ['is_featured', 'is_available', 'stock', 'price']
+    list_select_related = ['category']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name', 'description']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Same ranked index as the storefront instead of LIKE '%term%' scans.
+        if not search_term:
+            return queryset, False
+        return queryset.filter(id__in=search_product_ids(search_term, limit=1000, queryset=queryset)), False
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST' or '_save' not in request.POST:
+            return super().changelist_view(request, extra_context)
+        # save_model collects the list_editable changes; they are written together below.
+        request.list_edits = {}
+        with transaction.atomic():
+            response = super().changelist_view(request, extra_context)
+            if request.list_edits:
+                self.save_list_edits(request.list_edits)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        edits = getattr(request, 'list_edits', None)
+        if edits is None:
+            return super().save_model(request, obj, form, change)
+        edits[obj.pk] = {field: form.cleaned_data[field] for field in form.changed_data}
+
+    def save_list_edits(self, edits):
+        bulk_edit(Product.objects.all(), edits, updated_at=timezone.now())
+        # The UPDATEs send no post_save; the bump makes every worker resync the typeahead index.
+        transaction.on_commit(bump_catalog_version)
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -24,12 +66,51 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(LargeTableAdmin):
     list_display = ['order_number', 'first_name', 'last_name', 'email', 'total_amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
-    search_fields = ['order_number', 'email', 'first_name', 'last_name']
+    search_fields = ['=order_number', '=email', '^last_name', '^first_name']
+    search_help_text = 'An order number, an email address, or a surname (optionally after a first name).'
     readonly_fields = ['order_number', 'created_at', 'updated_at']
     inlines = [OrderItemInline]
+    actions = ['export_csv', 'export_jsonl']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Each kind of term is answered from one index instead of LIKE '%term%' over four columns.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if '@' in term:
+            return queryset.filter(email__iexact=term), False
+        if term.isdigit():
+            term = order_numbers.format_order_number(term)
+        if term.upper().startswith(order_numbers.PREFIX):
+            return queryset.filter(order_number__istartswith=term), False
+        first, *rest = term.split()
+        if rest:
+            return queryset.filter(last_name__istartswith=rest[-1], first_name__istartswith=first), False
+        return queryset.filter(last_name__istartswith=term), False
+
+    def _export(self, queryset, fmt):
+        response = StreamingHttpResponse(exports.order_lines(queryset, fmt), content_type=exports.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="orders-{timezone.localdate():%Y%m%d}.{fmt}"'
+        return response
+
+    @admin.action(description='Export selected orders with items (CSV)')
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description='Export selected orders with items (JSON Lines)')
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'user', 'quantity', 'status', 'expires_at', 'order']
+    list_filter = ['status']
+    list_select_related = ['product', 'user', 'order']
+    readonly_fields = ['user', 'product', 'order', 'quantity', 'expires_at', 'created_at']
 
 
 @admin.register(ContactMessage)
@@ -38,3 +119,65 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_filter = ['is_read', 'created_at']
     search_fields = ['name', 'email', 'subject', 'message']
     list_editable = ['is_read']
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    search_fields = ['subject', 'recipients']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'sent_at']
+    actions = ['retry_now']
+
+    @admin.action(description='Retry selected emails now')
+    def retry_now(self, request, queryset):
+        # A message being sent now is retaken anyway if its lease runs out.
+        updated = queryset.exclude(status__in=['sent', 'sending']).update(
+            status='pending', next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f'{updated} email(s) queued for retry.')
+
+
+# (label, days back); None covers every recorded day
+SALES_RANGES = [('Last 7 days', 7), ('Last 30 days', 30), ('Last 90 days', 90), ('Last 12 months', 365),
+                ('All time', None)]
+
+
+@admin.register(DailySales)
+class SalesDashboardAdmin(admin.ModelAdmin):
+    """Sales report read from the rollup tables only; the changelist is replaced by the dashboard."""
+    change_list_template = 'admin/shop/dailysales/dashboard.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        started = time.perf_counter()
+        labels = dict(SALES_RANGES)
+        selected = request.GET.get('range', 'Last 30 days')
+        if selected not in labels:
+            selected = 'Last 30 days'
+        end = timezone.localdate()
+        days = labels[selected]
+        start = end - timedelta(days=days - 1) if days else (
+            DailySales.objects.order_by('date').values_list('date', flat=True).first() or end
+        )
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Sales',
+            'opts': self.model._meta,
+            'ranges': [label for label, _days in SALES_RANGES],
+            'selected': selected,
+            'report': report(start, end),
+            **(extra_context or {}),
+        }
+        context['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return TemplateResponse(request, self.change_list_template, context)
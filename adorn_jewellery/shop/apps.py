@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'adorn_jewellery.shop'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
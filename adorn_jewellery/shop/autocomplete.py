@@ -0,0 +1,214 @@
+# adorn_jewellery/shop/autocomplete.py
+"""
+In-memory typeahead over product and category names.
+
+``PrefixIndex`` keeps a sorted list of ``(key, entry_id)`` pairs, one per
+word start in each name plus the slug, so a lookup is a ``bisect`` followed
+by a short forward scan. The process-wide indexes (one for categories, one
+for products) are built from the database once, then updated from the
+Product/Category signals in ``signals.py`` for changes this process saves.
+They are tagged with the catalog version from ``cache.py``: a process that
+bumps the version right after its own change just moves the tag along,
+while any other bump (another worker's save, a bulk ``update()``) makes
+the next lookup start a rebuild on a background thread. Lookups keep
+answering from the current index until the new one is swapped in, and
+never query the database.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+
+from django.db import connection
+from django.urls import reverse
+
+from .cache import catalog_version
+from .models import Category, Product
+
+DEFAULT_LIMIT = 8
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall((text or '').lower()))
+
+
+def _keys(label, slug):
+    """Every suffix of the name that starts on a word boundary, plus the slug."""
+    words = normalize(label).split()
+    keys = {' '.join(words[i:]) for i in range(len(words))}
+    if slug:
+        keys.add(slug.lower())
+    return keys
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self._entry_keys = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry_id, label, slug):
+        with self._lock:
+            self._remove(entry_id)
+            keys = _keys(label, slug)
+            self._entries[entry_id] = (label, slug)
+            self._entry_keys[entry_id] = keys
+            for key in keys:
+                insort(self._keys, (key, entry_id))
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        for key in self._entry_keys.pop(entry_id, ()):
+            position = bisect_left(self._keys, (key, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, entry_id):
+                del self._keys[position]
+        self._entries.pop(entry_id, None)
+
+    def bulk_load(self, entries):
+        """Replace the contents with ``(entry_id, label, slug)`` tuples in one sort."""
+        keys, stored, entry_keys = [], {}, {}
+        for entry_id, label, slug in entries:
+            stored[entry_id] = (label, slug)
+            entry_keys[entry_id] = _keys(label, slug)
+            keys.extend((key, entry_id) for key in entry_keys[entry_id])
+        keys.sort()
+        with self._lock:
+            self._keys, self._entries, self._entry_keys = keys, stored, entry_keys
+
+    def lookup(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        ``(label, slug)`` pairs with a word starting with ``prefix``: names
+        that start with it first, then shorter names.
+        """
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        keys, entries = self._keys, self._entries
+        matches = {}
+        position = bisect_left(keys, (prefix,))
+        # Scan a bounded window so a one-letter prefix stays cheap on a huge index.
+        while position < len(keys) and len(matches) < limit * 4:
+            key, entry_id = keys[position]
+            if not key.startswith(prefix):
+                break
+            entry = entries.get(entry_id)
+            if entry is not None and entry_id not in matches:
+                matches[entry_id] = entry
+            position += 1
+
+        def rank(entry):
+            return not normalize(entry[0]).startswith(prefix), len(entry[0])
+
+        return sorted(matches.values(), key=rank)[:limit]
+
+
+# (catalog version, categories, products)
+_indexes = None
+_index_lock = threading.Lock()
+_resync_lock = threading.Lock()
+
+
+def _build():
+    categories, products = PrefixIndex(), PrefixIndex()
+    categories.bulk_load(Category.objects.values_list('id', 'name', 'slug'))
+    rows = Product.objects.filter(is_available=True).values_list('id', 'name', 'slug')
+    products.bulk_load(rows.iterator(chunk_size=5000))
+    return categories, products
+
+
+def _resync():
+    """Rebuild from the database and swap the new indexes in; the caller holds ``_resync_lock``."""
+    global _indexes
+    try:
+        # Read the version first, so a change committed during the build triggers another resync.
+        version = catalog_version()
+        _indexes = (version, *_build())
+    finally:
+        _resync_lock.release()
+
+
+def _resync_in_background():
+    def run():
+        try:
+            _resync()
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name='autocomplete-resync', daemon=True).start()
+
+
+def get_indexes():
+    """``(categories, products)`` prefix indexes; only the very first call waits for a build."""
+    global _indexes
+    current = _indexes
+    if current is None:
+        with _index_lock:
+            if _indexes is None:
+                _indexes = (catalog_version(), *_build())
+            return _indexes[1:]
+    if current[0] != catalog_version() and _resync_lock.acquire(blocking=False):
+        _resync_in_background()
+    return current[1:]
+
+
+def advance(version):
+    """
+    Tag the indexes with ``version``, the result of this process bumping the
+    catalog version after a change the signals already applied. Skipped when
+    another bump came in between, so that one still triggers a resync.
+    """
+    global _indexes
+    current = _indexes
+    if current is not None and current[0] == version - 1:
+        _indexes = (version, *current[1:])
+
+
+def index_product(product):
+    if _indexes is None:
+        return
+    if product.is_available:
+        _indexes[2].add(product.id, product.name, product.slug)
+    else:
+        _indexes[2].remove(product.id)
+
+
+def unindex_product(product_id):
+    if _indexes is not None:
+        _indexes[2].remove(product_id)
+
+
+def index_category(category):
+    if _indexes is not None:
+        _indexes[1].add(category.id, category.name, category.slug)
+
+
+def unindex_category(category_id):
+    if _indexes is not None:
+        _indexes[1].remove(category_id)
+
+
+def reset_index():
+    global _indexes
+    _indexes = None
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    """Matching categories first, then products."""
+    categories, products = get_indexes()
+    suggestions = [
+        {'type': 'category', 'label': label, 'url': f"{reverse('shop:shop')}?category={slug}"}
+        for label, slug in categories.lookup(prefix, limit)
+    ]
+    suggestions += [
+        {'type': 'product', 'label': label, 'url': reverse('shop:product_detail', args=[slug])}
+        for label, slug in products.lookup(prefix, limit - len(suggestions))
+    ]
+    return suggestions
@@ -0,0 +1,220 @@
+# adorn_jewellery/shop/benchmarks.py
+"""
+Deterministic data seeding and timing helpers for the benchmark commands.
+
+Seeded rows use a ``bench-`` slug/username prefix so they can be told apart
+from real catalog data and removed with ``clear_seed_data``.
+
+``wsgi_request`` sends one request through Django's real WSGI handler (every
+middleware, a fresh connection per request when ``CONN_MAX_AGE`` is 0) and
+reads the query count from the ``Server-Timing`` header that
+``adorn_jewellery.timing`` adds; ``summarize`` turns a run into latency
+percentiles, throughput and queries per request.
+"""
+import io
+import json
+import random
+import re
+import statistics
+import time
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.test import Client
+from django.utils.crypto import get_random_string
+
+from . import search
+from .cache import bump_catalog_version
+from .models import Category, Product, Order, CartItem, WishlistItem
+
+SEED_PREFIX = 'bench-'
+CATEGORY_COUNT = 20
+BATCH_SIZE = 5000
+
+CATALOG_SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+_QUERY_COUNT = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+_WORDS = ['Gold', 'Silver', 'Pearl', 'Diamond', 'Ruby', 'Emerald', 'Sapphire', 'Rose', 'Twisted',
+          'Classic', 'Vintage', 'Minimal', 'Royal', 'Drop', 'Hoop', 'Chain', 'Charm', 'Cuff']
+_KINDS = ['Necklace', 'Earrings', 'Bracelet', 'Ring', 'Anklet', 'Pendant', 'Brooch', 'Bangle']
+
+
+def seed_categories():
+    existing = set(Category.objects.filter(slug__startswith=SEED_PREFIX).values_list('slug', flat=True))
+    Category.objects.bulk_create([
+        Category(name=f'Bench Category {i}', slug=f'{SEED_PREFIX}category-{i}', description='Benchmark data')
+        for i in range(CATEGORY_COUNT)
+        if f'{SEED_PREFIX}category-{i}' not in existing
+    ])
+    return list(Category.objects.filter(slug__startswith=SEED_PREFIX).order_by('slug'))
+
+
+def seed_catalog(products, seed=42):
+    """Top the ``bench-`` catalog up to ``products`` rows; returns how many were created."""
+    categories = seed_categories()
+    existing = Product.objects.filter(slug__startswith=SEED_PREFIX).count()
+
+    created = 0
+    for start in range(existing, products, BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + BATCH_SIZE, products)):
+            # Seeding each row on its own keeps reruns and top-ups deterministic.
+            rng = random.Random(seed * 1_000_003 + i)
+            price = Decimal(rng.randint(500, 150000)) / 100
+            discounted = rng.random() < 0.3
+            batch.append(Product(
+                name=f'{rng.choice(_WORDS)} {rng.choice(_WORDS)} {rng.choice(_KINDS)} {i}',
+                slug=f'{SEED_PREFIX}{i}',
+                category=categories[i % len(categories)],
+                description='Benchmark product',
+                price=price,
+                original_price=(price * Decimal('1.25')).quantize(Decimal('0.01')) if discounted else None,
+                stock=rng.randint(0, 50),
+                is_featured=rng.random() < 0.02,
+                is_available=rng.random() < 0.95,
+            ))
+        Product.objects.bulk_create(batch)
+        created += len(batch)
+    if created:
+        # bulk_create sends no post_save; rebuild what the signals would have updated.
+        search.reset_index()
+        bump_catalog_version()
+    return created
+
+
+def seed_customer(orders=200, cart_items=10, wishlist_items=10, username=f'{SEED_PREFIX}customer'):
+    """A customer with order history, a cart and a wishlist over the seeded catalog."""
+    user, _ = User.objects.get_or_create(username=username, defaults={'email': f'{username}@example.com'})
+    missing = orders - user.orders.count()
+    if missing > 0:
+        Order.objects.bulk_create([
+            Order(user=user, order_number=f'{SEED_PREFIX}{user.pk}-{i}', first_name='Bench', last_name='User',
+                  email=user.email, phone='0700000000', address='1 Bench Road', city='Nairobi',
+                  state='Nairobi', postal_code='00100', country='Kenya', total_amount=Decimal('1000.00'))
+            for i in range(orders - missing, orders)
+        ])
+    product_ids = list(
+        Product.objects.filter(slug__startswith=SEED_PREFIX).order_by('id').values_list('id', flat=True)[:max(cart_items, wishlist_items)]
+    )
+    CartItem.objects.bulk_create(
+        [CartItem(user=user, product_id=product_id) for product_id in product_ids[:cart_items]],
+        ignore_conflicts=True,
+    )
+    WishlistItem.objects.bulk_create(
+        [WishlistItem(user=user, product_id=product_id) for product_id in product_ids[:wishlist_items]],
+        ignore_conflicts=True,
+    )
+    return user
+
+
+def seed_customers(count, orders=20, cart_items=3, wishlist_items=3):
+    """``count`` customers named ``bench-customer-<n>``, each set up by ``seed_customer``."""
+    return [
+        seed_customer(orders, cart_items, wishlist_items, username=f'{SEED_PREFIX}customer-{i}')
+        for i in range(count)
+    ]
+
+
+def clear_seed_data():
+    User.objects.filter(username__startswith=SEED_PREFIX).delete()
+    Product.objects.filter(slug__startswith=SEED_PREFIX).delete()
+    Category.objects.filter(slug__startswith=SEED_PREFIX).delete()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def time_call(func, repeat):
+    """Run ``func`` ``repeat`` times and return timing stats in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return f"sessionid={client.cookies['sessionid'].value}"
+
+
+class BenchClient:
+    """One signed-in shopper's cookies, with a CSRF token so POSTs pass ``CsrfViewMiddleware``."""
+
+    def __init__(self, user):
+        self.user = user
+        self.csrf_token = get_random_string(32)
+        self.cookie = f'{session_cookie(user)}; csrftoken={self.csrf_token}'
+
+
+def wsgi_request(handler, client, method, path, query=None, data=None, json_body=None):
+    """Send one request through ``handler``; returns ``(status, latency_ms, queries)``."""
+    if json_body is not None:
+        body, content_type = json.dumps(json_body).encode(), 'application/json'
+    else:
+        body, content_type = urlencode(data or {}).encode(), 'application/x-www-form-urlencoded'
+    environ = {
+        'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': urlencode(query or {}),
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'HTTP_COOKIE': client.cookie, 'HTTP_X_CSRFTOKEN': client.csrf_token,
+        'CONTENT_TYPE': content_type, 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body), 'wsgi.url_scheme': 'http', 'wsgi.errors': io.StringIO(),
+    }
+    started = []
+
+    def start_response(status, headers):
+        started.append((int(status.split()[0]), dict(headers)))
+
+    start = time.perf_counter()
+    response = handler(environ, start_response)
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    latency = (time.perf_counter() - start) * 1000
+    status, headers = started[0]
+    match = _QUERY_COUNT.search(headers.get('Server-Timing', ''))
+    return status, latency, int(match.group(1)) if match else None
+
+
+def summarize(results, elapsed, expected_status=None):
+    """
+    Stats for ``[(status, latency_ms, queries), ...]`` collected over ``elapsed`` seconds.
+
+    A response succeeds when its status is ``expected_status``, or below 400
+    when that is ``None``. Latency, throughput and query counts cover
+    successful responses only, so a fast error page cannot flatter them;
+    failures are counted in ``errors``.
+    """
+    succeeded = [
+        result for result in results
+        if (result[0] == expected_status if expected_status is not None else result[0] < 400)
+    ]
+    latencies = [latency for _status, latency, _queries in succeeded]
+    queries = [count for _status, _latency, count in succeeded if count is not None]
+
+    def ms(stat, *args):
+        return round(stat(latencies, *args), 3) if latencies else None
+
+    return {
+        'requests': len(results),
+        'errors': len(results) - len(succeeded),
+        'throughput_rps': round(len(succeeded) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile, 50),
+        'p95_ms': ms(percentile, 95),
+        'p99_ms': ms(percentile, 99),
+        'mean_ms': ms(statistics.mean),
+        'queries_per_request': round(statistics.mean(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
@@ -0,0 +1,107 @@
+# adorn_jewellery/shop/cache.py
+"""
+Catalog read cache.
+
+Every cached catalog value is keyed by the current catalog version. The
+Product/Category signals in ``signals.py`` bump the version once the
+change commits, which orphans all older entries at once instead of deleting
+them one by one; the backend evicts them as they expire. The backend is
+whatever ``CACHES['default']`` points at. It must be shared between
+workers, or a bump only reaches the process that made it; the
+``shop.E001`` system check enforces that outside DEBUG.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from .models import Category, Product
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_TIMEOUT = 60 * 60
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from the clock so a cleared cache never reuses an old version.
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+async def acatalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        await cache.aadd(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return catalog_version()
+
+
+def catalog_key(*parts):
+    return ':'.join(['catalog', str(catalog_version()), *map(str, parts)])
+
+
+def _record(name, hit):
+    with _stats_lock:
+        _stats[f'{name}:hits' if hit else f'{name}:misses'] += 1
+
+
+def cache_stats():
+    """``{name: {'hits': n, 'misses': n, 'hit_rate': r}}`` for this process."""
+    with _stats_lock:
+        counts = dict(_stats)
+    stats = {}
+    for key, count in counts.items():
+        name, kind = key.rsplit(':', 1)
+        stats.setdefault(name, {'hits': 0, 'misses': 0})[kind] = count
+    for entry in stats.values():
+        total = entry['hits'] + entry['misses']
+        entry['hit_rate'] = round(entry['hits'] / total, 3) if total else 0.0
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def cached(name, build, *parts, timeout=CATALOG_TIMEOUT):
+    """Return the cached value for ``name``/``parts``, calling ``build()`` on a miss."""
+    key = catalog_key(name, *parts)
+    value = cache.get(key, _MISSING)
+    _record(name, value is not _MISSING)
+    if value is _MISSING:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+def all_categories():
+    return cached('categories', lambda: list(Category.objects.all()))
+
+
+def featured_products():
+    return cached('featured', lambda: list(
+        Product.objects.filter(is_featured=True, is_available=True).select_related('category')[:6]
+    ))
+
+
+def product_by_slug(slug):
+    """The available product with ``slug``, or ``None``; misses are cached too."""
+    return cached('product', lambda: Product.objects.filter(
+        slug=slug, is_available=True,
+    ).select_related('category').first(), slug)
+
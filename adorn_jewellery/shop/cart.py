@@ -0,0 +1,219 @@
+# adorn_jewellery/shop/cart.py
+"""
+Batched cart mutations.
+
+``apply_cart_operations`` folds a list of add/set/remove operations into one
+net change per product and applies them in a fixed number of statements:
+a DELETE for removals, an upsert for absolute quantities, and an
+insert-if-missing followed by a single ``quantity = quantity + CASE ...``
+UPDATE for increments. The increment is done by the database, so two tabs
+adding the same product at once both count.
+
+``merge_guest_state`` uses the same statements to fold a guest's
+localStorage cart and wishlist into the server rows after login.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Least
+
+from . import counters
+from .models import CartItem, Product, WishlistItem
+
+OPERATIONS = ('add', 'set', 'remove')
+
+# Most units one cart line may hold; far above any real order, far below the column's range.
+MAX_QUANTITY = 999
+
+# Set on login/signup; the next page load posts the guest's localStorage once.
+GUEST_MERGE_SESSION_KEY = 'merge_guest_state'
+
+
+class InvalidCartOperation(ValueError):
+    pass
+
+
+class UnavailableProduct(InvalidCartOperation):
+    """The operation is well formed but names a product that does not exist or is not for sale."""
+
+
+def _quantity(operation, minimum):
+    try:
+        quantity = int(operation.get('quantity', 1))
+    except (TypeError, ValueError):
+        raise InvalidCartOperation('quantity must be a whole number')
+    if quantity < minimum:
+        raise InvalidCartOperation(f'quantity must be at least {minimum}')
+    return _at_most_max(quantity)
+
+
+def _at_most_max(quantity):
+    if quantity > MAX_QUANTITY:
+        raise InvalidCartOperation(f'quantity must be at most {MAX_QUANTITY}')
+    return quantity
+
+
+def net_changes(operations):
+    """
+    ``{product_id: ('add', n) | ('set', n)}``; a remove is ``('set', 0)``.
+
+    Operations apply in order, so ``set 2`` then ``add 1`` is ``set 3``.
+    """
+    changes = {}
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise InvalidCartOperation(f"op must be one of {', '.join(OPERATIONS)}")
+        try:
+            product_id = int(operation['product_id'])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidCartOperation('product_id is required')
+
+        kind, current = changes.get(product_id, ('add', 0))
+        if operation['op'] == 'add':
+            changes[product_id] = (kind, _at_most_max(current + _quantity(operation, 1)))
+        elif operation['op'] == 'set':
+            changes[product_id] = ('set', _quantity(operation, 0))
+        else:
+            changes[product_id] = ('set', 0)
+    return changes
+
+
+def _upsert(user, quantities):
+    rows = [CartItem(user=user, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()]
+    options = {'update_conflicts': True, 'update_fields': ['quantity']}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['user', 'product']
+    CartItem.objects.bulk_create(rows, **options)
+
+
+def _increment(user, deltas, clamp=False):
+    """
+    Add ``deltas`` to the user's lines. A line that would pass ``MAX_QUANTITY``
+    raises ``InvalidCartOperation``, or is capped at it with ``clamp``.
+    """
+    CartItem.objects.bulk_create(
+        [CartItem(user=user, product_id=product_id, quantity=0) for product_id in deltas],
+        ignore_conflicts=True,
+    )
+    delta = Case(
+        *[When(product_id=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    rows = CartItem.objects.filter(user=user, product_id__in=deltas)
+    if clamp:
+        rows.update(quantity=Least(F('quantity') + delta, Value(MAX_QUANTITY)))
+        return
+    # Every line exists after the insert, so fewer rows updated means one would pass the limit.
+    if rows.filter(quantity__lte=Value(MAX_QUANTITY) - delta).update(quantity=F('quantity') + delta) < len(deltas):
+        raise InvalidCartOperation(f'quantity must be at most {MAX_QUANTITY}')
+
+
+def apply_cart_operations(user, operations):
+    """
+    Apply ``operations`` atomically and return the user's cart items.
+
+    Raises ``InvalidCartOperation`` for a malformed operation, a line that
+    would hold more than ``MAX_QUANTITY``, or a product that does not exist
+    or is not for sale; nothing is changed in that case.
+    """
+    changes = net_changes(operations)
+    added = [product_id for product_id, (kind, quantity) in changes.items() if quantity > 0]
+    available = set(
+        Product.objects.filter(id__in=added, is_available=True).order_by().values_list('id', flat=True)
+    ) if added else set()
+    missing = sorted(set(added) - available)
+    if missing:
+        raise UnavailableProduct(f"unavailable product(s): {', '.join(map(str, missing))}")
+
+    return _apply(user, changes)
+
+
+async def aadd_to_cart(user, product_id, quantity=1):
+    """
+    Async single-product ``add``; returns the new number of cart lines.
+
+    The async ORM has no transactions, but none is needed: the insert is
+    ``INSERT ... IGNORE`` and the increment is one ``UPDATE``, each atomic.
+    """
+    changes = net_changes([{'op': 'add', 'product_id': product_id, 'quantity': quantity}])
+    product_id, (_kind, quantity) = changes.popitem()
+    if not await Product.objects.filter(id=product_id, is_available=True).aexists():
+        raise UnavailableProduct(f'unavailable product(s): {product_id}')
+
+    await CartItem.objects.abulk_create([CartItem(user=user, product_id=product_id, quantity=0)], ignore_conflicts=True)
+    updated = await CartItem.objects.filter(
+        user=user, product_id=product_id, quantity__lte=MAX_QUANTITY - quantity,
+    ).aupdate(quantity=F('quantity') + quantity)
+    if not updated:
+        raise InvalidCartOperation(f'quantity must be at most {MAX_QUANTITY}')
+    count = await CartItem.objects.filter(user=user).acount()
+    await counters.areset(user.id, 'cart_count', count)
+    return count
+
+
+def _apply(user, changes, clamp=False):
+    removed = [product_id for product_id, (kind, quantity) in changes.items() if kind == 'set' and quantity == 0]
+    sets = {product_id: quantity for product_id, (kind, quantity) in changes.items() if kind == 'set' and quantity}
+    deltas = {product_id: quantity for product_id, (kind, quantity) in changes.items() if kind == 'add' and quantity}
+
+    with transaction.atomic():
+        if removed:
+            CartItem.objects.filter(user=user, product_id__in=removed).delete()
+        if sets:
+            _upsert(user, sets)
+        if deltas:
+            _increment(user, deltas, clamp)
+        items = list(user.cart_items.select_related('product').order_by('added_at', 'id'))
+        transaction.on_commit(lambda: counters.reset(user.id, 'cart_count', len(items)))
+    return items
+
+
+def _guest_quantities(cart_lines):
+    quantities = {}
+    for line in cart_lines if isinstance(cart_lines, list) else []:
+        try:
+            product_id, quantity = int(line['id']), int(line.get('quantity', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        if quantity > 0:
+            quantities[product_id] = min(quantities.get(product_id, 0) + quantity, MAX_QUANTITY)
+    return quantities
+
+
+def _guest_ids(wishlist_lines):
+    ids = set()
+    for line in wishlist_lines if isinstance(wishlist_lines, list) else []:
+        try:
+            ids.add(int(line['id'] if isinstance(line, dict) else line))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return ids
+
+
+def merge_guest_state(user, cart_lines, wishlist_lines):
+    """
+    Fold a guest's localStorage cart and wishlist into ``user``'s rows.
+
+    Guest quantities are added to what the user already has, capped at
+    ``MAX_QUANTITY``; wishlist entries are unioned. Malformed lines and
+    products no longer for sale are skipped rather than failing the merge.
+    Returns the cart items.
+    """
+    quantities = _guest_quantities(cart_lines)
+    wishlist_ids = _guest_ids(wishlist_lines)
+    wanted = set(quantities) | wishlist_ids
+    available = set(
+        Product.objects.filter(id__in=wanted, is_available=True).order_by().values_list('id', flat=True)
+    ) if wanted else set()
+
+    with transaction.atomic():
+        items = _apply(user, {
+            product_id: ('add', quantity) for product_id, quantity in quantities.items() if product_id in available
+        }, clamp=True)
+        WishlistItem.objects.bulk_create(
+            [WishlistItem(user=user, product_id=product_id) for product_id in wishlist_ids & available],
+            ignore_conflicts=True,
+        )
+        transaction.on_commit(lambda: counters.forget(user.id))
+    return items
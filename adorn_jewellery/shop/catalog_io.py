@@ -0,0 +1,249 @@
+# adorn_jewellery/shop/catalog_io.py
+"""
+Bulk catalog import and export.
+
+``import_catalog`` reads rows from ``read_rows`` (CSV or JSON Lines, one row
+at a time) and writes them ``batch_size`` at a time: one query to find which
+slugs already exist, one ``bulk_create`` for the new products and one upsert
+(``INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE``) for the rest. Memory use depends on the batch size, not the
+file size.
+
+Products are keyed by ``slug``, or ``slugify(name)`` when the row has none.
+A slug seen twice in one batch keeps the last row; a slug that already
+exists is updated in place (or skipped with ``update_existing=False``).
+Only the columns a row actually has are written on update. Categories are
+matched by name or slug through a map loaded once, and created when missing.
+
+Bulk writes send no signals, so the search index and the catalog cache
+(which the autocomplete index follows) are reset once at the end. Run
+``build_image_variants`` afterwards for rows that set ``image``.
+"""
+import csv
+import json
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from . import search
+from .cache import bump_catalog_version
+from .exports import encode
+from .models import Category, Product
+
+FIELDS = ['slug', 'name', 'category', 'description', 'price', 'original_price', 'stock', 'is_featured',
+          'is_available', 'image']
+REQUIRED = ('name', 'category', 'price')
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+# Largest value a MySQL INT column (stock) holds.
+MAX_INT = 2 ** 31 - 1
+
+_TRUE = {'1', 'true', 'yes', 'y'}
+_FALSE = {'0', 'false', 'no', 'n', ''}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(fh, fmt):
+    """``(line_number, row_dict)`` pairs from an open text file."""
+    if fmt == 'csv':
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(fh, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = exc
+        yield line_number, row
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _decimal(value, field):
+    if _text(value) == '':
+        return None
+    try:
+        number = Decimal(_text(value))
+    except InvalidOperation:
+        raise RowError(f'{field} is not a number: {value!r}')
+    if not number.is_finite() or number < 0:
+        raise RowError(f'{field} must be a positive number')
+    model_field = Product._meta.get_field(field)
+    limit = Decimal(10) ** (model_field.max_digits - model_field.decimal_places)
+    # Compare after rounding: 99999999.999 only reaches the limit once quantized.
+    if number < limit:
+        number = number.quantize(Decimal('0.01'))
+    if number >= limit:
+        raise RowError(f'{field} must be less than {limit:,}')
+    return number
+
+
+def _image(value, field):
+    name = _text(value)
+    max_length = Product._meta.get_field(field).max_length
+    if len(name) > max_length:
+        raise RowError(f'{field} path is longer than {max_length} characters')
+    return name or None
+
+
+def _int(value, field):
+    try:
+        number = int(_text(value) or 0)
+    except ValueError:
+        raise RowError(f'{field} is not a whole number: {value!r}')
+    if not 0 <= number <= MAX_INT:
+        raise RowError(f'{field} must be between 0 and {MAX_INT:,}')
+    return number
+
+
+def _bool(value, field):
+    if isinstance(value, bool):
+        return value
+    text = _text(value).lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise RowError(f'{field} must be true or false')
+
+
+class CategoryMap:
+    """Category ids by lower-cased name and by slug; missing categories are created on first use."""
+
+    def __init__(self):
+        self.ids = {}
+        for category_id, name, slug in Category.objects.values_list('id', 'name', 'slug'):
+            self.ids[name.lower()] = self.ids[slug] = category_id
+        self.created = 0
+
+    def resolve(self, value):
+        # Cut to the column sizes like product names, so MySQL strict mode never rejects the INSERT.
+        name = _text(value)[:200]
+        slug = slugify(name)[:50]
+        if not slug:
+            raise RowError('category is required')
+        category_id = self.ids.get(name.lower()) or self.ids.get(slug)
+        if category_id is None:
+            category_id = Category.objects.create(name=name, slug=slug).id
+            self.ids[name.lower()] = self.ids[slug] = category_id
+            self.created += 1
+        return category_id
+
+
+def _product(row, categories):
+    """An unsaved ``Product`` and the model fields ``row`` supplies."""
+    if not isinstance(row, dict):
+        raise RowError(f'invalid JSON: {row}' if isinstance(row, ValueError) else 'not a JSON object')
+    missing = [field for field in REQUIRED if _text(row.get(field)) == '']
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+
+    name = _text(row['name'])[:200]
+    slug = slugify(_text(row.get('slug')) or name)[:50]
+    if not slug:
+        raise RowError('name gives an empty slug; add a slug column')
+    values = {
+        'name': name,
+        'category_id': categories.resolve(row['category']),
+        'price': _decimal(row['price'], 'price'),
+    }
+    converters = {
+        'description': lambda value, _field: _text(value),
+        'original_price': _decimal,
+        'stock': _int,
+        'is_featured': _bool,
+        'is_available': _bool,
+        'image': _image,
+    }
+    for field, convert in converters.items():
+        if field in row:
+            values[field] = convert(row[field], field)
+    return Product(slug=slug, **values), tuple(sorted(values))
+
+
+def _flush(batch, stats, update_existing):
+    existing = set(Product.objects.filter(slug__in=batch).values_list('slug', flat=True))
+    new, updates = [], {}
+    for slug, (product, fields) in batch.items():
+        if slug in existing:
+            updates.setdefault(fields, []).append(product)
+        else:
+            new.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_create(new)
+        if update_existing:
+            # An upsert on slug is one statement; bulk_update would be a CASE per column per row.
+            options = {'update_conflicts': True}
+            if connection.features.supports_update_conflicts_with_target:
+                options['unique_fields'] = ['slug']
+            for fields, products in updates.items():
+                Product.objects.bulk_create(products, update_fields=[*fields, 'updated_at'], **options)
+    stats['created'] += len(new)
+    stats['updated' if update_existing else 'skipped'] += len(existing)
+
+
+def import_catalog(rows, batch_size=BATCH_SIZE, update_existing=True):
+    """
+    Import ``(line_number, row)`` pairs; returns ``(stats, errors)`` where
+    ``stats`` counts rows, created, updated, skipped, duplicates, invalid and
+    categories_created, and ``errors`` holds the first few problems by line.
+    """
+    stats, errors = Counter(), []
+    categories = CategoryMap()
+    batch = {}
+    try:
+        for line_number, row in rows:
+            stats['rows'] += 1
+            try:
+                product, fields = _product(row, categories)
+            except RowError as exc:
+                stats['invalid'] += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f'line {line_number}: {exc}')
+                continue
+            if product.slug in batch:
+                stats['duplicates'] += 1
+            batch[product.slug] = (product, fields)
+            if len(batch) >= batch_size:
+                _flush(batch, stats, update_existing)
+                batch = {}
+        if batch:
+            _flush(batch, stats, update_existing)
+    finally:
+        stats['categories_created'] = categories.created
+        if stats['created'] or stats['updated'] or categories.created:
+            search.reset_index()
+            bump_catalog_version()
+    return stats, errors
+
+
+def _export_rows(queryset, chunk_size=BATCH_SIZE):
+    # Id-keyset chunks rather than iterator(): mysqlclient buffers a whole result set on the client.
+    columns = ['slug', 'name', 'category__name', 'description', 'price', 'original_price', 'stock',
+               'is_featured', 'is_available', 'image']
+    queryset = queryset.order_by('id').values_list('id', *columns)
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        for _id, *values in chunk:
+            row = dict(zip(FIELDS, values))
+            row['image'] = row['image'] or None
+            yield row
+        last_id = chunk[-1][0]
+
+
+def export_catalog(fmt, queryset=None):
+    """Lines of the catalog in ``fmt``; the output of one can be fed back to ``import_catalog``."""
+    return encode(_export_rows(queryset if queryset is not None else Product.objects.all()), FIELDS, fmt)
@@ -0,0 +1,155 @@
+# adorn_jewellery/shop/changelists.py
+"""
+Admin changelists for tables too big to count or page by offset.
+
+``LargeTableAdmin`` is a ``ModelAdmin`` base for models ordered by
+``-created_at``:
+
+* ``EstimatedCountPaginator`` reads the row count of an unfiltered
+  changelist from the table statistics (``information_schema`` on MySQL,
+  ``pg_class`` on PostgreSQL) and stops counting a filtered one at
+  ``COUNT_LIMIT``, and ``show_full_result_count`` is off, so no page runs a
+  ``COUNT(*)`` over the whole table.
+* ``KeysetChangeList`` pages the default ordering with a
+  ``(created_at, id)`` cursor from ``pagination`` instead of ``OFFSET``, so
+  the thousandth page costs the same as the first. Sorting by a column
+  falls back to numbered pages.
+* ``date_hierarchy`` drills down on ``created_at``, which is indexed.
+
+``bulk_edit`` writes list_editable changes with one ``UPDATE`` per field.
+"""
+from collections import defaultdict
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Case, Value, When
+from django.utils.functional import cached_property
+
+from .pagination import after_cursor, cursor_after
+
+CURSOR_VAR = 'cursor'
+KEYSET_SORT = 'newest'
+
+# Below this many rows an exact count is cheap and the estimate's error shows.
+ESTIMATE_MIN_ROWS = 10000
+# Filtered changelists count at most this many rows.
+COUNT_LIMIT = 10000
+
+
+def estimated_row_count(model):
+    """The planner's row estimate for ``model``'s table, or ``None`` where the backend has none."""
+    table = model._meta.db_table
+    if connection.vendor == 'mysql':
+        sql = 'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)'
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that has never been analysed.
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator whose ``count`` never scans more than ``COUNT_LIMIT`` rows."""
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            rows = estimated_row_count(queryset.model)
+            if rows is not None and rows >= ESTIMATE_MIN_ROWS:
+                self.estimated = True
+                return rows
+        rows = queryset.order_by().values('pk')[:COUNT_LIMIT + 1].count()
+        if rows > COUNT_LIMIT:
+            self.estimated = True
+            return COUNT_LIMIT
+        return rows
+
+    @property
+    def count_label(self):
+        count = self.count
+        if not self.estimated:
+            return f'{count:,}'
+        return f'{count:,}+' if count == COUNT_LIMIT else f'about {count:,}'
+
+
+class KeysetChangeList(ChangeList):
+    """A changelist that pages its default ordering with a cursor."""
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Sorting, filtering or searching starts again from the first page.
+        return super().get_query_string(new_params, [CURSOR_VAR, *(remove or [])])
+
+    @cached_property
+    def uses_keyset(self):
+        return ORDER_VAR not in self.params and not self.show_all
+
+    def get_results(self, request):
+        super().get_results(request)
+        if self.uses_keyset and self.multi_page:
+            self.cursor = request.GET.get(CURSOR_VAR)
+            self.result_list = after_cursor(self.queryset, KEYSET_SORT, self.cursor)[:self.list_per_page]
+
+    @cached_property
+    def next_page_url(self):
+        if not (self.uses_keyset and self.multi_page):
+            return None
+        # The results table has evaluated result_list by the time this is read.
+        rows = list(self.result_list)
+        if len(rows) < self.list_per_page:
+            return None
+        return self.get_query_string({CURSOR_VAR: cursor_after(rows[-1], KEYSET_SORT)})
+
+    @cached_property
+    def first_page_url(self):
+        return self.get_query_string() if getattr(self, 'cursor', None) else None
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/shop/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+def bulk_edit(queryset, edits, **extra):
+    """
+    Write ``{pk: {field: value}}`` to ``queryset``'s rows with one
+    ``UPDATE ... SET field = CASE id WHEN ... END`` per field; ``extra``
+    is set on every edited row.
+    """
+    by_field = defaultdict(dict)
+    for pk, values in edits.items():
+        for field, value in values.items():
+            by_field[field][pk] = value
+
+    opts = queryset.model._meta
+    for field, values in by_field.items():
+        output_field = opts.get_field(field)
+        distinct = set(values.values())
+        if len(distinct) == 1:
+            value = distinct.pop()
+        else:
+            value = Case(
+                *[When(pk=pk, then=Value(new, output_field=output_field)) for pk, new in values.items()],
+                output_field=output_field,
+            )
+        queryset.filter(pk__in=values).update(**{field: value}, **extra)
@@ -0,0 +1,47 @@
+# adorn_jewellery/shop/checks.py
+"""
+System checks for deployment settings the shop's design depends on.
+
+The catalog version (``cache.py``) lives in the default cache. With a
+per-process backend each worker keeps its own version, so a change made
+in one worker is never seen by the others until their entries expire.
+The header badge counts (``counters.py``) live there too and are moved
+with ``incr``, which only Redis and Memcached apply atomically; the file
+and database backends read and then write, so concurrent changes are lost.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose contents are private to one process.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+# Backends whose ``incr`` is a single atomic operation on the server.
+ATOMIC_INCR_CACHES = {
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+}
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if not getattr(settings, 'CACHE_REQUIRE_SHARED', False):
+        return []
+    backend = settings.CACHES['default']['BACKEND']
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'The default cache ({backend}) is private to each process.',
+            hint='Set CACHE_BACKEND to a shared backend so catalog changes reach every worker, '
+                 'or CACHE_REQUIRE_SHARED=False for a single-process deployment.',
+            id='shop.E001',
+        )]
+    if backend not in ATOMIC_INCR_CACHES:
+        return [Error(
+            f'The default cache ({backend}) does not increment atomically.',
+            hint="Use CACHE_BACKEND 'redis' or 'memcached' so concurrent cart and wishlist changes "
+                 'are not lost from the header counts.',
+            id='shop.E002',
+        )]
+    return []
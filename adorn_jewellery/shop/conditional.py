@@ -0,0 +1,162 @@
+# adorn_jewellery/shop/conditional.py
+"""
+Conditional GET for catalog pages and JSON APIs.
+
+``conditional(validator)`` wraps a view. ``validator(request, *args,
+**kwargs)`` returns ``(parts, last_modified)`` built from the cache or one
+aggregate query, or ``None`` when the response cannot be validated (for
+example a product that does not exist). The parts are hashed into an ETag,
+so a browser revalidating with ``If-None-Match``/``If-Modified-Since`` gets
+a 304 before the view's own queries and template rendering run.
+
+Pages also depend on who is asking: the header greeting and badge counts,
+the CSRF cookie and the guest-merge flag go into the ETag, and a page with
+flash messages waiting is always rendered in full. Responses are marked
+``private, no-cache`` so browsers store them but always revalidate.
+
+For async views the validator must be a coroutine function too.
+``conditional_stats()`` reports, per view, how many responses were 304s and
+the thread CPU time they saved compared with a full render (approximate for
+async views, whose event loop thread also runs other requests).
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import counters
+from .cart import GUEST_MERGE_SESSION_KEY
+
+_stats = defaultdict(lambda: {'full': 0, 'not_modified': 0, 'full_cpu': 0.0, 'not_modified_cpu': 0.0})
+_stats_lock = threading.Lock()
+
+
+def _user_parts(request, user, header_counts):
+    return [
+        user.pk,
+        user.first_name if user.is_authenticated else '',
+        sorted(header_counts.items()),
+        request.META.get('CSRF_COOKIE', ''),
+        bool(request.session.get(GUEST_MERGE_SESSION_KEY)),
+    ]
+
+
+def _etag(parts):
+    return '"%s"' % hashlib.md5(repr([settings.RELEASE_ID, *parts]).encode()).hexdigest()
+
+
+def _check(request, validated):
+    """``(etag, last_modified, response or None)`` for a validator result."""
+    parts, last_modified = validated
+    etag = _etag([request.get_full_path(), *parts])
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+    return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def _finish(request, response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _record(name, not_modified, started):
+    elapsed = time.thread_time() - started
+    with _stats_lock:
+        entry = _stats[name]
+        if not_modified:
+            entry['not_modified'] += 1
+            entry['not_modified_cpu'] += elapsed
+        else:
+            entry['full'] += 1
+            entry['full_cpu'] += elapsed
+
+
+def _skip(request):
+    return request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)) > 0
+
+
+def conditional(validator, page=True):
+    """
+    Answer revalidations of the decorated view with 304 when ``validator``'s
+    result is unchanged. ``page=False`` is for JSON APIs, whose ETag only
+    needs the user id rather than everything the page header shows.
+    """
+    def decorator(view):
+        name = view.__name__
+
+        if iscoroutinefunction(view):
+            # Sessions and messages are synchronous, so async views (the JSON
+            # APIs) are keyed by user id only and never skipped for messages.
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                started = time.thread_time()
+                validated = await validator(request, *args, **kwargs)
+                if validated is None:
+                    return await view(request, *args, **kwargs)
+                user = await request.auser()
+                etag, last_modified, response = _check(request, (validated[0] + [user.pk], validated[1]))
+                not_modified = response is not None
+                if not not_modified:
+                    response = await view(request, *args, **kwargs)
+                _record(name, not_modified, started)
+                return _finish(request, response, etag, last_modified)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if _skip(request):
+                    return view(request, *args, **kwargs)
+                started = time.thread_time()
+                validated = validator(request, *args, **kwargs)
+                if validated is None:
+                    return view(request, *args, **kwargs)
+                user = request.user
+                extra = _user_parts(request, user, counters.header_counts(user)) if page else [user.pk]
+                etag, last_modified, response = _check(request, (validated[0] + extra, validated[1]))
+                not_modified = response is not None
+                if not not_modified:
+                    response = view(request, *args, **kwargs)
+                _record(name, not_modified, started)
+                return _finish(request, response, etag, last_modified)
+
+        return inner
+
+    return decorator
+
+
+def conditional_stats():
+    """
+    Per view: full responses, 304s, the 304 share, and the CPU milliseconds
+    the 304s saved (each one priced at the average full response minus its
+    own cost). Thread CPU time, for this worker process only.
+    """
+    with _stats_lock:
+        snapshot = {name: dict(entry) for name, entry in _stats.items()}
+    stats = {}
+    for name, entry in snapshot.items():
+        total = entry['full'] + entry['not_modified']
+        average_full = entry['full_cpu'] / entry['full'] if entry['full'] else 0.0
+        saved = entry['not_modified'] * average_full - entry['not_modified_cpu']
+        stats[name] = {
+            'full': entry['full'],
+            'not_modified': entry['not_modified'],
+            'not_modified_rate': round(entry['not_modified'] / total, 3) if total else 0.0,
+            'cpu_saved_ms': round(max(saved, 0.0) * 1000, 1),
+        }
+    return stats
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
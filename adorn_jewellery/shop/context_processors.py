@@ -0,0 +1,13 @@
+# adorn_jewellery/shop/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .counters import header_counts
+
+
+def header_state(request):
+    """Cart and wishlist badge counts, so pages render them without extra requests."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    # Lazy so JSON fragments rendered with the request skip the cache lookup.
+    return {'header_counts': SimpleLazyObject(lambda: header_counts(user))}
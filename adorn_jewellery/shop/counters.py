@@ -0,0 +1,96 @@
+# adorn_jewellery/shop/counters.py
+"""
+Per-user cart and wishlist counts for the header badges.
+
+Both counts live in the cache under one key each, so a page render costs a
+single ``get_many``. Views that change a cart or wishlist adjust the cached
+value with ``incr``/``decr``, or ``forget`` it when the change is too broad
+to track; a miss is rebuilt with one query. ``incr`` is atomic on Redis and
+Memcached only: locmem keeps separate counts in each worker, and the file
+and database backends read then write, so concurrent changes can be lost
+until the key expires. The ``shop.E002`` system check requires one of the
+atomic backends outside DEBUG.
+The ``a``-prefixed functions are the same operations for async views.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import CartItem, WishlistItem
+
+COUNTS_TIMEOUT = 60 * 60 * 24
+
+COUNTERS = {
+    'cart_count': CartItem,
+    'wishlist_count': WishlistItem,
+}
+
+
+def _key(name, user_id):
+    return f'header:{name}:{user_id}'
+
+
+def _count(model):
+    rows = model.objects.filter(user=OuterRef('pk')).order_by().values('user').annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def _counts_query(user):
+    return User.objects.filter(pk=user.pk).values(**{name: _count(model) for name, model in COUNTERS.items()})
+
+
+def header_counts(user):
+    """``{'cart_count': n, 'wishlist_count': n}``; zeros for anonymous users."""
+    if not user.is_authenticated:
+        return dict.fromkeys(COUNTERS, 0)
+
+    keys = {name: _key(name, user.pk) for name in COUNTERS}
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(keys):
+        return {name: cached[key] for name, key in keys.items()}
+
+    counts = _counts_query(user).first() or dict.fromkeys(COUNTERS, 0)
+    cache.set_many({keys[name]: counts[name] for name in COUNTERS}, COUNTS_TIMEOUT)
+    return counts
+
+
+async def aheader_counts(user):
+    if not user.is_authenticated:
+        return dict.fromkeys(COUNTERS, 0)
+
+    keys = {name: _key(name, user.pk) for name in COUNTERS}
+    cached = await cache.aget_many(keys.values())
+    if len(cached) == len(keys):
+        return {name: cached[key] for name, key in keys.items()}
+
+    counts = await _counts_query(user).afirst() or dict.fromkeys(COUNTERS, 0)
+    await cache.aset_many({keys[name]: counts[name] for name in COUNTERS}, COUNTS_TIMEOUT)
+    return counts
+
+
+def adjust(user_id, name, delta):
+    """Shift a cached count by ``delta``; a count that is not cached is left to be rebuilt."""
+    try:
+        cache.incr(_key(name, user_id), delta)
+    except ValueError:
+        pass
+
+
+async def aadjust(user_id, name, delta):
+    try:
+        await cache.aincr(_key(name, user_id), delta)
+    except ValueError:
+        pass
+
+
+def reset(user_id, name, value=0):
+    cache.set(_key(name, user_id), value, COUNTS_TIMEOUT)
+
+
+async def areset(user_id, name, value=0):
+    await cache.aset(_key(name, user_id), value, COUNTS_TIMEOUT)
+
+
+def forget(user_id):
+    cache.delete_many([_key(name, user_id) for name in COUNTERS])
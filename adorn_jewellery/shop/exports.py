@@ -0,0 +1,126 @@
+# adorn_jewellery/shop/exports.py
+"""
+Streaming CSV / JSON Lines encoding.
+
+``encode(rows, fields, fmt)`` turns an iterator of dicts into an iterator of
+text lines (a header first for CSV), one row at a time, so callers can write
+them to a file or hand them to a ``StreamingHttpResponse`` without holding
+the export in memory.
+
+``order_lines`` exports orders with their items: a CSV row per item (order
+columns repeated) or a JSON line per order with an ``items`` list. Orders are
+read in id order ``chunk_size`` at a time with their items prefetched, so an
+export costs two queries per chunk and memory stays flat however many
+orders there are. Id-keyset chunks rather than ``iterator()``, because
+mysqlclient buffers a whole result set on the client.
+"""
+import csv
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import OrderItem
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+ORDER_FIELDS = ['order_number', 'created_at', 'status', 'user_id', 'first_name', 'last_name', 'email', 'phone',
+                'address', 'city', 'state', 'postal_code', 'country', 'total_amount', 'notes']
+ITEM_FIELDS = ['product_id', 'product_name', 'quantity', 'price', 'subtotal']
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """A file-like object whose ``write`` hands the line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode(rows, fields, fmt):
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fields)
+        for row in rows:
+            yield writer.writerow([_cell(row.get(field)) for field in fields])
+    elif fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps({field: row.get(field) for field in fields}, default=_json_default) + '\n'
+    else:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+
+def format_for(path, default='csv'):
+    """The format implied by ``path``'s extension (``.csv``, ``.jsonl``/``.ndjson``)."""
+    extension = os.path.splitext(path or '')[1].lower()
+    return {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}.get(extension, default)
+
+
+def iter_orders(queryset, chunk_size=CHUNK_SIZE):
+    items = OrderItem.objects.select_related('product').only('order', 'product__name', 'quantity', 'price')
+    queryset = queryset.order_by('id').prefetch_related(Prefetch('items', queryset=items))
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_id = chunk[-1].id
+
+
+def _order_row(order):
+    row = {field: getattr(order, field) for field in ORDER_FIELDS}
+    row['created_at'] = timezone.localtime(order.created_at)
+    return row
+
+
+def _item_row(item):
+    return {
+        'product_id': item.product_id,
+        'product_name': item.product.name,
+        'quantity': item.quantity,
+        'price': item.price,
+        'subtotal': item.subtotal,
+    }
+
+
+def _csv_order_rows(orders):
+    for order in orders:
+        row = _order_row(order)
+        items = order.items.all()
+        if not items:
+            yield row
+        for item in items:
+            yield {**row, **_item_row(item)}
+
+
+def _json_order_rows(orders):
+    for order in orders:
+        yield {**_order_row(order), 'items': [_item_row(item) for item in order.items.all()]}
+
+
+def order_lines(queryset, fmt, chunk_size=CHUNK_SIZE):
+    orders = iter_orders(queryset, chunk_size)
+    if fmt == 'csv':
+        return encode(_csv_order_rows(orders), ORDER_FIELDS + ITEM_FIELDS, fmt)
+    return encode(_json_order_rows(orders), ORDER_FIELDS + ['items'], fmt)
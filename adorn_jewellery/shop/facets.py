@@ -0,0 +1,147 @@
+# adorn_jewellery/shop/facets.py
+"""
+Facet counts for the shop sidebar.
+
+All counts for a filter set come from a single ``SELECT COUNT(...) FILTER``
+aggregate (``CASE WHEN`` on MySQL). Each facet ignores its own dimension, so
+the category counts show what picking another category would return with the
+price and stock filters kept. Results are cached under the catalog version
+from ``cache.py``, which the Product/Category signals bump.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, F, Q
+
+from .cache import cached
+from .models import Product
+
+# Stock is decremented with bulk UPDATEs that send no signals, so the
+# in-stock counts are refreshed by expiry rather than by version bumps.
+FACET_TIMEOUT = 300
+
+# (label, min_price, max_price), inclusive at both ends
+PRICE_BUCKETS = [
+    ('Under 1,000', None, Decimal('999.99')),
+    ('1,000 - 4,999', Decimal('1000'), Decimal('4999.99')),
+    ('5,000 - 9,999', Decimal('5000'), Decimal('9999.99')),
+    ('10,000 and above', Decimal('10000'), None),
+]
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return price if price.is_finite() else None
+
+
+def parse_filters(params):
+    """The shop filters from a ``QueryDict``; unparseable prices are ignored."""
+    return {
+        'category': params.get('category') or None,
+        'min_price': _price(params.get('min_price')),
+        'max_price': _price(params.get('max_price')),
+        'in_stock': params.get('in_stock') == '1',
+        'on_sale': params.get('on_sale') == '1',
+    }
+
+
+def _price_q(min_price, max_price):
+    q = Q()
+    if min_price is not None:
+        q &= Q(price__gte=min_price)
+    if max_price is not None:
+        q &= Q(price__lte=max_price)
+    return q
+
+
+def filter_q(filters, skip=None):
+    """``Q`` for every active filter except the ``skip`` dimension."""
+    q = Q()
+    if filters['category'] and skip != 'category':
+        q &= Q(category__slug=filters['category'])
+    if skip != 'price':
+        q &= _price_q(filters['min_price'], filters['max_price'])
+    if filters['in_stock'] and skip != 'in_stock':
+        q &= Q(stock__gt=0)
+    if filters['on_sale'] and skip != 'on_sale':
+        q &= Q(original_price__gt=F('price'))
+    return q
+
+
+def _aggregate(filters, category_ids):
+    counts = {'total': Count('id', filter=filter_q(filters))}
+    by_category = filter_q(filters, skip='category')
+    for category_id in category_ids:
+        counts[f'category_{category_id}'] = Count('id', filter=by_category & Q(category_id=category_id))
+    by_price = filter_q(filters, skip='price')
+    for position, (_label, low, high) in enumerate(PRICE_BUCKETS):
+        counts[f'price_{position}'] = Count('id', filter=by_price & _price_q(low, high))
+    counts['in_stock'] = Count('id', filter=filter_q(filters, skip='in_stock') & Q(stock__gt=0))
+    counts['on_sale'] = Count('id', filter=filter_q(filters, skip='on_sale') & Q(original_price__gt=F('price')))
+
+    row = Product.objects.filter(is_available=True).aggregate(**counts)
+    return {
+        'total': row['total'],
+        'categories': {category_id: row[f'category_{category_id}'] for category_id in category_ids},
+        'prices': [row[f'price_{position}'] for position in range(len(PRICE_BUCKETS))],
+        'in_stock': row['in_stock'],
+        'on_sale': row['on_sale'],
+    }
+
+
+def facet_counts(filters, category_ids):
+    """Counts for ``filters``, from the cache or one aggregate query."""
+    category_ids = sorted(category_ids)
+    fingerprint = hashlib.md5(repr((sorted(filters.items()), category_ids)).encode()).hexdigest()
+    return cached('facets', lambda: _aggregate(filters, category_ids), fingerprint, timeout=FACET_TIMEOUT)
+
+
+def _link(params, **changes):
+    query = params.copy()
+    query.pop('cursor', None)
+    for name, value in changes.items():
+        if value is None:
+            query.pop(name, None)
+        else:
+            query[name] = value
+    encoded = query.urlencode()
+    return f'?{encoded}' if encoded else '?'
+
+
+def sidebar(params, categories):
+    """Template context for the sidebar: each facet value with its count and toggle link."""
+    filters = parse_filters(params)
+    counts = facet_counts(filters, [category.id for category in categories])
+
+    def price_active(low, high):
+        return filters['min_price'] == low and filters['max_price'] == high
+
+    return {
+        'total': counts['total'],
+        'categories': [{
+            'category': category,
+            'count': counts['categories'].get(category.id, 0),
+            'active': filters['category'] == category.slug,
+            'url': _link(params, category=category.slug),
+        } for category in categories],
+        'all_url': _link(params, category=None),
+        'prices': [{
+            'label': label,
+            'count': count,
+            'active': price_active(low, high),
+            'url': _link(
+                params,
+                **({'min_price': None, 'max_price': None} if price_active(low, high) else
+                   {'min_price': low and str(low), 'max_price': high and str(high)}),
+            ),
+        } for (label, low, high), count in zip(PRICE_BUCKETS, counts['prices'])],
+        'states': [{
+            'label': label,
+            'count': counts[name],
+            'active': filters[name],
+            'url': _link(params, **{name: None if filters[name] else '1'}),
+        } for name, label in (('in_stock', 'In stock'), ('on_sale', 'On sale'))],
+    }
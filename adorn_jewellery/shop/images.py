@@ -0,0 +1,165 @@
+# adorn_jewellery/shop/images.py
+"""
+Responsive product images.
+
+``generate_variants`` resizes ``Product.image`` to each of ``VARIANT_WIDTHS``
+(never upscaling) and writes a WebP and a JPEG copy of every size under
+``products/variants/``. What was written is recorded in
+``Product.image_variants``::
+
+    {'source': 'products/ring.jpg', 'original_bytes': 2480113,
+     'variants': [{'width': 320, 'webp': '...', 'webp_bytes': 9120,
+                   'jpeg': '...', 'jpeg_bytes': 14233}, ...]}
+
+New uploads are processed from the Product ``post_save`` signal once the
+transaction commits; ``manage.py build_image_variants`` backfills the rest.
+Files from the previous record that the new one does not reuse are deleted.
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import autocomplete
+from .cache import bump_catalog_version
+from .models import Product
+
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_DIR = 'products/variants'
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Width the shop grid cards are laid out at; used for the bytes-saved report.
+CARD_WIDTH = 320
+
+# What Pillow raises for unreadable, truncated or oversized (decompression bomb) files.
+IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+logger = logging.getLogger(__name__)
+
+
+def needs_variants(product):
+    return bool(product.image) and (product.image_variants or {}).get('source') != product.image.name
+
+
+def _encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    options = {'quality': quality}
+    if fmt == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _store(name, data):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
+
+
+def build_variants(product):
+    """Write the resized copies of ``product.image`` and return the ``image_variants`` record."""
+    with product.image.open('rb') as fh:
+        original_bytes = product.image.size
+        source = ImageOps.exif_transpose(Image.open(fh))
+        source.load()
+    if source.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', source.size, 'white')
+        background.paste(source, mask=source.convert('RGBA').getchannel('A'))
+        source = background
+    source = source.convert('RGB')
+
+    widths = sorted({min(width, source.width) for width in VARIANT_WIDTHS})
+    stem = f'{VARIANT_DIR}/{product.pk}-{os.path.splitext(os.path.basename(product.image.name))[0]}'
+    variants = []
+    for width in widths:
+        height = max(1, round(source.height * width / source.width))
+        resized = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+        webp = _encode(resized, 'WEBP', WEBP_QUALITY)
+        jpeg = _encode(resized, 'JPEG', JPEG_QUALITY)
+        variants.append({
+            'width': width,
+            'webp': _store(f'{stem}-{width}.webp', webp),
+            'webp_bytes': len(webp),
+            'jpeg': _store(f'{stem}-{width}.jpg', jpeg),
+            'jpeg_bytes': len(jpeg),
+        })
+    return {'source': product.image.name, 'original_bytes': original_bytes, 'variants': variants}
+
+
+def _files(record):
+    return {variant[fmt] for variant in (record or {}).get('variants', []) for fmt in ('webp', 'jpeg')}
+
+
+def delete_variants(record, keep=None):
+    """Delete the files listed in an ``image_variants`` record, except those also in ``keep``."""
+    for name in _files(record) - _files(keep):
+        default_storage.delete(name)
+
+
+def generate_variants(product):
+    """Build and save the variants for ``product``; returns the new record."""
+    previous = Product.objects.filter(pk=product.pk).values_list('image_variants', flat=True).first()
+    record = build_variants(product)
+    # update() rather than save(): no signals, so no second round of processing.
+    Product.objects.filter(pk=product.pk).update(image_variants=record)
+    product.image_variants = record
+    delete_variants(previous, keep=record)
+    # Variants are not in the typeahead index, so it needs no resync for this bump.
+    autocomplete.advance(bump_catalog_version())
+    return record
+
+
+def generate_on_commit(product):
+    """Build the variants once the current transaction commits; failures are logged, not raised."""
+    def run():
+        try:
+            generate_variants(product)
+        except IMAGE_ERRORS as exc:
+            logger.warning('Building image variants for product %s failed: %s', product.pk, exc)
+
+    transaction.on_commit(run)
+
+
+def variants(product):
+    """The recorded variants, or ``[]`` when they are missing or stale."""
+    record = product.image_variants or {}
+    if not product.image or record.get('source') != product.image.name:
+        return []
+    return record.get('variants', [])
+
+
+def _pick(sized, width):
+    return next((variant for variant in sized if variant['width'] >= width), sized[-1])
+
+
+def srcset(product, fmt):
+    return ', '.join(f"{default_storage.url(variant[fmt])} {variant['width']}w" for variant in variants(product))
+
+
+def thumbnail_url(product, width=CARD_WIDTH):
+    """URL of the smallest JPEG at least ``width`` wide, falling back to the original."""
+    if not product.image:
+        return ''
+    sized = variants(product)
+    if not sized:
+        return product.image.url
+    return default_storage.url(_pick(sized, width)['jpeg'])
+
+
+def bytes_saved(products, width=CARD_WIDTH):
+    """``(original_bytes, served_bytes)`` for a page of cards served as WebP at ``width``."""
+    original = served = 0
+    for product in products:
+        sized = variants(product)
+        if not sized:
+            continue
+        original += product.image_variants['original_bytes']
+        served += _pick(sized, width)['webp_bytes']
+    return original, served
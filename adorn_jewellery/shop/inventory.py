@@ -0,0 +1,143 @@
+# adorn_jewellery/shop/inventory.py
+"""
+Stock reservations.
+
+Stock is taken off ``Product.stock`` when a hold is placed, with a single
+conditional ``UPDATE ... WHERE stock >= n`` so two checkouts can never both
+get the last unit. Holds that are not confirmed by an order before
+``expires_at`` are handed back by ``release_expired`` (run from the
+``release_expired_reservations`` command).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product, StockReservation
+
+
+class OutOfStock(Exception):
+    """Raised when a hold cannot be placed; ``available`` maps product id to units left."""
+
+    def __init__(self, available):
+        self.available = available
+        super().__init__(f'Insufficient stock for products {sorted(available)}')
+
+
+class _Shortage(Exception):
+    pass
+
+
+def _per_product(quantities):
+    return Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _restock(rows):
+    """Give ``(product_id, quantity)`` pairs back to stock in one UPDATE."""
+    totals = defaultdict(int)
+    for product_id, quantity in rows:
+        totals[product_id] += quantity
+    if totals:
+        Product.objects.filter(id__in=totals).update(stock=F('stock') + _per_product(totals))
+
+
+def reserve_stock(user, quantities, minutes=None):
+    """
+    Hold ``quantities`` ({product_id: units}) for ``user``.
+
+    Either every line is held or none is: a short line raises ``OutOfStock``
+    and the whole UPDATE is rolled back.
+    """
+    if not quantities:
+        return []
+    minutes = minutes or settings.STOCK_RESERVATION_MINUTES
+    wanted = _per_product(quantities)
+    try:
+        with transaction.atomic():
+            updated = Product.objects.filter(id__in=quantities, stock__gte=wanted).update(
+                stock=F('stock') - wanted
+            )
+            if updated != len(quantities):
+                raise _Shortage
+            expires_at = timezone.now() + timedelta(minutes=minutes)
+            return StockReservation.objects.bulk_create([
+                StockReservation(user=user, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                for product_id, quantity in quantities.items()
+            ])
+    except _Shortage:
+        stock = dict(Product.objects.filter(id__in=quantities).values_list('id', 'stock'))
+        raise OutOfStock({
+            product_id: max(stock.get(product_id, 0), 0)
+            for product_id, quantity in quantities.items()
+            if stock.get(product_id, 0) < quantity
+        })
+
+
+def release_reservations(reservation_ids):
+    """Release held reservations and return their stock; returns how many were released."""
+    with transaction.atomic():
+        rows = list(
+            StockReservation.objects.select_for_update()
+            .filter(id__in=reservation_ids, status='held')
+            .values_list('id', 'product_id', 'quantity')
+        )
+        if rows:
+            StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status='released')
+            _restock(row[1:] for row in rows)
+    return len(rows)
+
+
+def hold_for_checkout(user, quantities):
+    """Replace whatever ``user`` currently holds with a fresh hold on ``quantities``."""
+    with transaction.atomic():
+        release_reservations(list(user.stock_reservations.filter(status='held').values_list('id', flat=True)))
+        return reserve_stock(user, quantities)
+
+
+def claim_for_order(user, quantities):
+    """
+    Return held reservations covering ``quantities`` for an order being placed.
+
+    A live hold that matches the cart exactly is reused; anything else is
+    released and the cart is reserved afresh.
+    """
+    held = list(user.stock_reservations.select_for_update().filter(status='held'))
+    now = timezone.now()
+    if (
+        held
+        and all(reservation.expires_at > now for reservation in held)
+        and len(held) == len(quantities)
+        and {reservation.product_id: reservation.quantity for reservation in held} == quantities
+    ):
+        return held
+    if held:
+        release_reservations([reservation.id for reservation in held])
+    return reserve_stock(user, quantities)
+
+
+def confirm_reservations(user, order):
+    """Attach the holds returned by ``claim_for_order`` to ``order``; call in the same transaction."""
+    user.stock_reservations.filter(status='held').update(status='confirmed', order=order)
+
+
+def release_expired(batch_size=500):
+    """Release expired holds in batches; returns the number released."""
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(status='held', expires_at__lte=timezone.now())
+                .values_list('id', 'product_id', 'quantity')[:batch_size]
+            )
+            if not rows:
+                return released
+            StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status='released')
+            _restock(row[1:] for row in rows)
+        released += len(rows)
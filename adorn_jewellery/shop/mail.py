@@ -0,0 +1,133 @@
+# adorn_jewellery/shop/mail.py
+"""
+Outbound mail queue.
+
+Views call ``queue_mail`` (same arguments as ``send_mail``) which only stores
+the rendered message. The ``send_queued_mail`` management command drains the
+queue in batches over a single backend connection and retries failures with
+exponential backoff.
+
+A batch is claimed in a short transaction that marks its rows ``sending``
+with a lease (``next_attempt_at`` is when the lease runs out), and the
+messages go out after that transaction commits, so no row lock is held
+across SMTP. Rows left ``sending`` by a worker that died are picked up
+again once their lease expires, so delivery is at-least-once.
+"""
+from datetime import timedelta
+import logging
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from adorn_jewellery.timing import track
+
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+# How long a worker may take to send a claimed batch before others retake it.
+SEND_LEASE = timedelta(minutes=10)
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    with track('mail'):
+        return QueuedEmail.objects.create(
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email,
+            recipients=','.join(recipient_list),
+        )
+
+
+def retry_delay(attempts):
+    """Backoff after ``attempts`` failed deliveries: 1, 2, 4 ... minutes, capped."""
+    return min(RETRY_BASE_DELAY * (2 ** (attempts - 1)), RETRY_MAX_DELAY)
+
+
+def _build_message(queued, connection):
+    message = EmailMultiAlternatives(
+        subject=queued.subject,
+        body=queued.body,
+        from_email=queued.from_email,
+        to=queued.recipient_list,
+        connection=connection,
+    )
+    if queued.html_body:
+        message.attach_alternative(queued.html_body, 'text/html')
+    return message
+
+
+def _mark_failed(queued, error, now, max_attempts):
+    queued.attempts += 1
+    queued.last_error = str(error)
+    if queued.attempts >= max_attempts:
+        queued.status = 'failed'
+    else:
+        queued.status = 'pending'
+        queued.next_attempt_at = now + retry_delay(queued.attempts)
+
+
+def claim_batch(batch_size, now):
+    """Lease up to ``batch_size`` due messages to this worker and return them."""
+    with transaction.atomic():
+        batch = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        QueuedEmail.objects.filter(pk__in=[queued.pk for queued in batch]).update(
+            status='sending', next_attempt_at=now + SEND_LEASE,
+        )
+    return batch
+
+
+def send_queued_mail(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Send one batch of due messages and return ``(sent, failed)`` counts.
+
+    Rows are claimed with ``SKIP LOCKED`` and a lease so several workers
+    can drain the queue side by side without sending the same message twice.
+    """
+    now = timezone.now()
+    sent = failed = 0
+
+    batch = claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.warning('Mail backend unavailable: %s', exc)
+        for queued in batch:
+            _mark_failed(queued, exc, now, max_attempts)
+        failed = len(batch)
+    else:
+        try:
+            for queued in batch:
+                try:
+                    connection.send_messages([_build_message(queued, connection)])
+                except Exception as exc:
+                    logger.warning('Sending queued email %s failed: %s', queued.pk, exc)
+                    _mark_failed(queued, exc, now, max_attempts)
+                    failed += 1
+                else:
+                    queued.attempts += 1
+                    queued.status = 'sent'
+                    queued.sent_at = timezone.now()
+                    queued.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+
+    QueuedEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+    )
+    return sent, failed
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop.benchmarks import percentile, seed_catalog, seed_customer, session_cookie
+
+ENDPOINTS = ['/api/cart-count/', '/api/wishlist-count/', '/api/cart-items/', '/api/header-state/']
+
+
+def run_wsgi(paths, cookie, workers):
+    """Drive the WSGI handler from ``workers`` threads, as a threaded WSGI server would."""
+    handler = WSGIHandler()
+
+    def request(path):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie,
+            'wsgi.input': io.BytesIO(b''), 'wsgi.url_scheme': 'http', 'wsgi.errors': io.StringIO(),
+        }
+        statuses = []
+        start = time.perf_counter()
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        return statuses[0], (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(request, paths))
+
+
+async def _run_asgi(paths, cookie, concurrency):
+    handler = ASGIHandler()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def request(path):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        messages = []
+        body_sent = asyncio.Event()
+
+        async def receive():
+            if body_sent.is_set():
+                # The client stays connected; Django cancels this wait once the response is sent.
+                await asyncio.Future()
+            body_sent.set()
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async with gate:
+            start = time.perf_counter()
+            await handler(scope, receive, send)
+            return messages[0]['status'], (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(request(path) for path in paths))
+
+
+def run_asgi(paths, cookie, concurrency):
+    """Drive the ASGI handler with up to ``concurrency`` requests in flight on one event loop."""
+    return asyncio.run(_run_asgi(paths, cookie, concurrency))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare in-process throughput of the cart/wishlist/count JSON endpoints through the WSGI handler '
+        '(a thread per request) and the ASGI handler (one event loop).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per mode.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--workers', type=int, default=8, help='WSGI worker threads.')
+
+    def handle(self, *args, **options):
+        seed_catalog(100)
+        cookie = session_cookie(seed_customer(orders=0))
+        paths = [ENDPOINTS[i % len(ENDPOINTS)] for i in range(options['requests'])]
+
+        modes = {
+            f"wsgi ({options['workers']} threads)": lambda: run_wsgi(paths, cookie, options['workers']),
+            f"asgi ({options['concurrency']} in flight)": lambda: run_asgi(paths, cookie, options['concurrency']),
+        }
+        self.stdout.write(f"{'mode':<24}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, run in modes.items():
+            run()  # warm caches, sessions and connections
+            start = time.perf_counter()
+            results = run()
+            elapsed = time.perf_counter() - start
+            latencies = [latency for _status, latency in results]
+            errors = sum(1 for status, _latency in results if not str(status).startswith('200'))
+            self.stdout.write(
+                f'{name:<24}{len(results) / elapsed:>10.0f}{percentile(latencies, 50):>10.2f}'
+                f'{percentile(latencies, 95):>10.2f}{errors:>8}'
+            )
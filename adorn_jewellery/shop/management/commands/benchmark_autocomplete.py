@@ -0,0 +1,48 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop.autocomplete import PrefixIndex
+from adorn_jewellery.shop.benchmarks import _KINDS, _WORDS, percentile
+
+
+class Command(BaseCommand):
+    help = 'Measure typeahead lookup latency on a synthetic in-memory prefix index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=100_000, help='Names loaded into the index.')
+        parser.add_argument('--lookups', type=int, default=20_000, help='Timed prefix lookups.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = [
+            (i, f'{rng.choice(_WORDS)} {rng.choice(_WORDS)} {rng.choice(_KINDS)} {i}', f'bench-{i}')
+            for i in range(options['names'])
+        ]
+
+        index = PrefixIndex()
+        start = time.perf_counter()
+        index.bulk_load(rows)
+        self.stdout.write(f"Built index of {len(index)} names in {time.perf_counter() - start:.2f}s")
+
+        # Prefixes as typed: 1-6 leading characters of a random word in a random name.
+        vocabulary = [word.lower() for word in _WORDS + _KINDS]
+        prefixes = [rng.choice(vocabulary)[:rng.randint(1, 6)] for _ in range(options['lookups'])]
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.lookup(prefix)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+
+        start = time.perf_counter()
+        for i in range(1000):
+            index.add(options['names'] + i, f'New Arrival Ring {i}', f'new-{i}')
+        update_us = (time.perf_counter() - start) * 1000
+
+        self.stdout.write(
+            f"Lookups: p50 {percentile(timings, 50):.1f}us  p95 {percentile(timings, 95):.1f}us  "
+            f"p99 {percentile(timings, 99):.1f}us  max {max(timings):.1f}us"
+        )
+        self.stdout.write(f'Incremental add: {update_us:.1f}us per product')
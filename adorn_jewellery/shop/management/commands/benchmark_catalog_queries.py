@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+
+from adorn_jewellery.shop.benchmarks import SEED_PREFIX, clear_seed_data, seed_catalog, seed_customer, time_call
+from adorn_jewellery.shop.models import Category, Product, Order
+
+
+def storefront_queries(category, customer):
+    """The query shapes issued by home, shop, product_detail and my_account."""
+    available = Product.objects.filter(is_available=True)
+    return {
+        'home_featured': Product.objects.filter(is_featured=True, is_available=True)[:6],
+        'shop_newest': available.order_by('-created_at', '-id')[:25],
+        'shop_price_low': available.order_by('price', 'id')[:25],
+        'shop_price_high': available.order_by('-price', '-id')[:25],
+        'shop_price_range': available.filter(price__gte=100, price__lte=500).order_by('price', 'id')[:25],
+        'shop_category_newest': available.filter(category=category).order_by('-created_at', '-id')[:25],
+        'shop_category_price_low': available.filter(category=category).order_by('price', 'id')[:25],
+        'product_related': available.filter(category=category).exclude(id=0)[:4],
+        'my_account_orders': Order.objects.filter(user=customer).order_by('-created_at')[:20],
+        'cart_count': customer.cart_items.all(),
+        'wishlist_count': customer.wishlist_items.all(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalog and record EXPLAIN plans and timings for the storefront queries. '
+        'Run once before and once after migrating to compare index changes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000, help='Size of the seeded catalog.')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query.')
+        parser.add_argument('--label', default='', help='Name for this run, e.g. "before" or "after".')
+        parser.add_argument('--output', help='Write the report to this JSON file.')
+        parser.add_argument('--compare', help='Earlier JSON report to compare medians against.')
+        parser.add_argument('--no-seed', action='store_true', help='Benchmark the data already in the database.')
+        parser.add_argument('--clear', action='store_true', help=f'Delete all {SEED_PREFIX}* rows and exit.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_seed_data()
+            self.stdout.write(self.style.SUCCESS('Removed benchmark data'))
+            return
+
+        if not options['no_seed']:
+            created = seed_catalog(options['products'])
+            self.stdout.write(f'Seeded {created} product(s)')
+        customer = seed_customer()
+        category = Category.objects.filter(slug__startswith=SEED_PREFIX).first() or Category.objects.first()
+
+        latest = MigrationRecorder.Migration.objects.filter(app='shop').order_by('-id').first()
+        report = {
+            'label': options['label'],
+            'vendor': connection.vendor,
+            'products': Product.objects.count(),
+            'shop_migration': latest.name if latest else None,
+            'queries': {},
+        }
+
+        for name, queryset in storefront_queries(category, customer).items():
+            # Counts are what the views actually run for the cart/wishlist badges.
+            run = queryset.count if name.endswith('_count') else (lambda qs=queryset: list(qs._chain()))
+            report['queries'][name] = {
+                'sql': str(queryset.query),
+                'plan': queryset.explain(),
+                **time_call(run, options['repeat']),
+            }
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)['queries']
+
+        self.stdout.write(f"\n{'query':<26}{'median ms':>12}{'min ms':>10}" + (f"{'before':>12}{'speedup':>10}" if baseline else ''))
+        for name, result in report['queries'].items():
+            line = f"{name:<26}{result['median_ms']:>12.3f}{result['min_ms']:>10.3f}"
+            if baseline and name in baseline:
+                before = baseline[name]['median_ms']
+                line += f"{before:>12.3f}{before / result['median_ms'] if result['median_ms'] else 0:>9.1f}x"
+            self.stdout.write(line)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2, default=str)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
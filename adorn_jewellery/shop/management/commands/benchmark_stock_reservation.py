@@ -0,0 +1,81 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.db.models import F
+
+from adorn_jewellery.shop import inventory
+from adorn_jewellery.shop.benchmarks import SEED_PREFIX, percentile, seed_catalog, seed_customers
+from adorn_jewellery.shop.models import Product, StockReservation
+
+STOCK = 1_000_000
+
+
+def unguarded(user, quantities):
+    """The decrement checkout used before reservations: no stock check, so it can oversell."""
+    Product.objects.filter(id__in=quantities).update(stock=F('stock') - inventory._per_product(quantities))
+
+
+MODES = {'unguarded': unguarded, 'reserve': inventory.reserve_stock}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of the guarded stock hold (one conditional UPDATE plus the reservation rows) '
+        'with the old unguarded F() decrement, with concurrent shoppers buying from a small set of hot products.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50, help='Hot products the orders draw from.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Shoppers placing holds at once.')
+        parser.add_argument('--operations', type=int, default=2000, help='Holds per mode.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        seed_catalog(options['products'], seed=options['seed'])
+        users = seed_customers(concurrency, orders=0, cart_items=0, wishlist_items=0)
+        product_ids = list(
+            Product.objects.filter(slug__startswith=SEED_PREFIX).order_by('id').values_list('id', flat=True)
+            [:options['products']]
+        )
+        rng = random.Random(options['seed'])
+        baskets = [
+            {product_id: 1 for product_id in rng.sample(product_ids, rng.randint(1, min(3, len(product_ids))))}
+            for _ in range(options['operations'])
+        ]
+
+        self.stdout.write(f"{'mode':<12}{'holds/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+        for name, hold in MODES.items():
+            Product.objects.filter(id__in=product_ids).update(stock=STOCK)
+
+            def drive(index):
+                user, timings, errors = users[index], [], 0
+                try:
+                    for basket in baskets[index::concurrency]:
+                        start = time.perf_counter()
+                        try:
+                            hold(user, basket)
+                        except (DatabaseError, inventory.OutOfStock):
+                            errors += 1
+                            continue
+                        timings.append((time.perf_counter() - start) * 1000)
+                finally:
+                    connection.close()
+                return timings, errors
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                runs = list(pool.map(drive, range(concurrency)))
+            elapsed = time.perf_counter() - start
+            timings = [timing for run, _errors in runs for timing in run]
+            errors = sum(errors for _run, errors in runs)
+            self.stdout.write(
+                f"{name:<12}{len(timings) / elapsed:>10.1f}{percentile(timings or [0], 50):>9.2f}"
+                f"{percentile(timings or [0], 95):>9.2f}{errors:>8}"
+            )
+
+        StockReservation.objects.filter(user__in=users).delete()
+        Product.objects.filter(id__in=product_ids).update(stock=STOCK)
@@ -0,0 +1,211 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from adorn_jewellery.shop.benchmarks import (
+    CATALOG_SIZES, SEED_PREFIX, BenchClient, clear_seed_data, seed_catalog, seed_customers, summarize, wsgi_request,
+)
+from adorn_jewellery.shop.models import Category, Product
+
+SHOP_QUERIES = {
+    'shop_newest': {'sort': 'newest'},
+    'shop_price_low': {'sort': 'price_low'},
+    'shop_price_high': {'sort': 'price_high'},
+    'shop_price_range': {'min_price': '100', 'max_price': '500'},
+    'shop_in_stock': {'in_stock': '1'},
+    'shop_on_sale': {'on_sale': '1'},
+    'shop_search': {'q': 'gold'},
+}
+
+CHECKOUT_FORM = {
+    'first_name': 'Bench', 'last_name': 'User', 'email': 'bench@example.com', 'phone': '0700000000',
+    'address': '1 Bench Road', 'city': 'Nairobi', 'state': 'Nairobi', 'postal_code': '00100', 'country': 'Kenya',
+}
+
+# Products checkout draws from; their stock is topped up so runs never sell out.
+CHECKOUT_PRODUCTS = 50
+CHECKOUT_STOCK = 1_000_000
+PRODUCT_SAMPLE = 1000
+
+# Scenarios whose failures are redirects: checkout renders the confirmation
+# page (200) and sends every failure (out of stock, withdrawn product) back
+# to the cart with a 302.
+EXPECTED_STATUS = {'checkout': 200}
+
+
+def build_scenarios(slugs, categories, cart_product_ids):
+    """``name -> (prepare, request)``; each is ``f(n) -> (method, path, kwargs)``, only ``request`` is timed."""
+    def add_to_cart(n):
+        return 'POST', reverse('shop:add_to_cart'), {
+            'json_body': {'product_id': cart_product_ids[n % len(cart_product_ids)], 'quantity': 1},
+        }
+
+    def get(name, **kwargs):
+        return lambda n: ('GET', reverse(name, kwargs=kwargs or None), {})
+
+    scenarios = {'home': (None, get('shop:home'))}
+    for name, query in SHOP_QUERIES.items():
+        scenarios[name] = (None, lambda n, query=query: ('GET', reverse('shop:shop'), {'query': query}))
+    scenarios['shop_category'] = (None, lambda n: (
+        'GET', reverse('shop:shop'), {'query': {'category': categories[n % len(categories)]}},
+    ))
+    scenarios['product_detail'] = (None, lambda n: (
+        'GET', reverse('shop:product_detail', args=[slugs[n % len(slugs)]]), {},
+    ))
+    scenarios['api_add_to_cart'] = (None, add_to_cart)
+    scenarios['api_cart_items'] = (None, get('shop:get_cart_items'))
+    scenarios['api_header_state'] = (None, get('shop:header_state'))
+    scenarios['checkout'] = (add_to_cart, lambda n: ('POST', reverse('shop:checkout'), {'data': CHECKOUT_FORM}))
+    return scenarios
+
+
+def serializes_writes():
+    """SQLite fails a second concurrent writer with "database is locked" instead of queueing it."""
+    return connection.vendor == 'sqlite'
+
+
+def run_scenario(handler, clients, prepare, request, count):
+    """
+    ``count`` requests shared between ``clients``, each client on its own thread, one request at a time.
+
+    On SQLite, POSTs take turns behind a lock; the wait is not part of their latency.
+    """
+    write_lock = threading.Lock() if serializes_writes() else nullcontext()
+
+    def send(client, method, path, kwargs):
+        with write_lock if method != 'GET' else nullcontext():
+            return wsgi_request(handler, client, method, path, **kwargs)
+
+    def drive(index):
+        client = clients[index]
+        results = []
+        try:
+            for n in range(index, count, len(clients)):
+                if prepare:
+                    send(client, *prepare(n))
+                results.append(send(client, *request(n)))
+        finally:
+            connection.close()
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        chunks = list(pool.map(drive, range(len(clients))))
+    return [result for chunk in chunks for result in chunk], time.perf_counter() - start
+
+
+def _column(value, width):
+    """``value`` right-aligned to ``width``; ``-`` when a scenario had no successful requests."""
+    return f'{value:>{width}.2f}' if value is not None else f"{'-':>{width}}"
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a deterministic bench- catalog with customers, then drive the storefront (home, shop sorts and '
+        'filters, product pages, cart APIs, checkout) through the WSGI handler with concurrent signed-in '
+        'clients. Reports p50/p95/p99 latency, throughput and queries per request of the successful requests, '
+        'counts failed ones as errors, and writes them to JSON. Checkout throughput includes the add-to-cart '
+        'request made before each checkout. On SQLite, write requests run one at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catalog', choices=CATALOG_SIZES, default='1k', help='Size of the seeded catalog.')
+        parser.add_argument('--products', type=int, help='Seed this many products instead of a --catalog size.')
+        parser.add_argument('--customers', type=int, help='Seeded customers (default: one per client).')
+        parser.add_argument('--concurrency', type=int, default=8, help='Clients sending requests at once.')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario.')
+        parser.add_argument('--scenario', action='append', help='Run only this scenario (repeatable).')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for the catalog and the request mix.')
+        parser.add_argument('--label', default='', help='Name for this run, e.g. "before" or "after".')
+        parser.add_argument('--output', help='Report file (default: storefront-<products>-<timestamp>.json).')
+        parser.add_argument('--compare', help='Earlier JSON report to compare p95 latencies against.')
+        parser.add_argument('--clear', action='store_true', help=f'Delete all {SEED_PREFIX}* rows and exit.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_seed_data()
+            self.stdout.write(self.style.SUCCESS('Removed benchmark data'))
+            return
+
+        products = options['products'] or CATALOG_SIZES[options['catalog']]
+        concurrency = max(1, options['concurrency'])
+        started = time.perf_counter()
+        created = seed_catalog(products, seed=options['seed'])
+        users = seed_customers(max(options['customers'] or concurrency, concurrency), orders=20)
+        self.stdout.write(f'Seeded {created} product(s) and {len(users)} customer(s) '
+                          f'in {time.perf_counter() - started:.1f}s')
+
+        bench = Product.objects.filter(slug__startswith=SEED_PREFIX, is_available=True)
+        rng = random.Random(options['seed'])
+        candidates = [f'{SEED_PREFIX}{rng.randrange(products)}' for _ in range(PRODUCT_SAMPLE)]
+        slugs = list(bench.filter(slug__in=candidates).order_by('id').values_list('slug', flat=True))
+        cart_product_ids = list(bench.order_by('id').values_list('id', flat=True)[:CHECKOUT_PRODUCTS])
+        Product.objects.filter(id__in=cart_product_ids).update(stock=CHECKOUT_STOCK)
+        categories = list(Category.objects.filter(slug__startswith=SEED_PREFIX).values_list('slug', flat=True))
+
+        scenarios = build_scenarios(slugs, categories, cart_product_ids)
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s) {', '.join(sorted(unknown))}; choose from {', '.join(scenarios)}")
+
+        handler = WSGIHandler()
+        clients = [BenchClient(user) for user in users[:concurrency]]
+        report = {
+            'label': options['label'],
+            'created_at': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'products': Product.objects.filter(slug__startswith=SEED_PREFIX).count(),
+            'concurrency': concurrency,
+            'requests': options['requests'],
+            'seed': options['seed'],
+            'release': settings.RELEASE_ID,
+            'serialized_writes': serializes_writes(),
+            'scenarios': {},
+        }
+        if not settings.REQUEST_TIMING:
+            self.stderr.write('REQUEST_TIMING is off; queries per request will not be reported.')
+        if serializes_writes():
+            self.stderr.write('SQLite allows one writer at a time; cart and checkout requests run one by one.')
+
+        for name in selected:
+            prepare, request = scenarios[name]
+            run_scenario(handler, clients, prepare, request, len(clients))  # warm caches and connections
+            results, elapsed = run_scenario(handler, clients, prepare, request, options['requests'])
+            report['scenarios'][name] = summarize(results, elapsed, EXPECTED_STATUS.get(name))
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = json.load(fh)['scenarios']
+
+        self.stdout.write(
+            f"\n{'scenario':<20}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}{'errors':>8}"
+            + (f"{'p95 before':>12}{'speedup':>9}" if baseline else '')
+        )
+        for name, result in report['scenarios'].items():
+            line = (
+                f"{name:<20}{result['throughput_rps']:>9.1f}{_column(result['p50_ms'], 9)}"
+                f"{_column(result['p95_ms'], 9)}{_column(result['p99_ms'], 9)}"
+                f"{_column(result['queries_per_request'], 8)}{result['errors']:>8}"
+            )
+            if baseline and name in baseline:
+                before, after = baseline[name]['p95_ms'], result['p95_ms']
+                speedup = f'{before / after:>8.1f}x' if before and after else f"{'-':>9}"
+                line += f'{_column(before, 12)}{speedup}'
+            self.stdout.write(line)
+
+        output = options['output'] or f"storefront-{products}-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Report written to {output}'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop import images
+from adorn_jewellery.shop.models import Product
+from adorn_jewellery.shop.pagination import PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for product images that lack them, and report the bytes saved.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that are already up to date.')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Products fetched per query.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        built = failed = 0
+        for product in products.iterator(chunk_size=options['chunk_size']):
+            if not options['force'] and not images.needs_variants(product):
+                continue
+            try:
+                images.generate_variants(product)
+                built += 1
+            except images.IMAGE_ERRORS as exc:
+                failed += 1
+                self.stderr.write(f'{product.pk} {product.image.name}: {exc}')
+
+        original = served = with_variants = 0
+        for product in products.only('id', 'image', 'image_variants').iterator(chunk_size=options['chunk_size']):
+            page_original, page_served = images.bytes_saved([product])
+            if page_original:
+                with_variants += 1
+                original += page_original
+                served += page_served
+
+        self.stdout.write(self.style.SUCCESS(f'Built variants for {built} product(s); {failed} failed'))
+        if with_variants:
+            per_card = (original - served) / with_variants
+            self.stdout.write(
+                f'Grid cards ({images.CARD_WIDTH}px WebP): {served / 1024:,.0f} KiB instead of {original / 1024:,.0f} KiB '
+                f'across {with_variants} product(s); about {per_card * PAGE_SIZE / 1024:,.0f} KiB saved per '
+                f'{PAGE_SIZE}-product page'
+            )
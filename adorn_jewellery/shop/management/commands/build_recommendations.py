@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop.recommendations import update_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Fold orders placed since the last run into the "customers also bought" recommendations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Discard the stored counts and rebuild from every order.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Products re-ranked per query.')
+
+    def handle(self, *args, **options):
+        result = update_recommendations(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result['orders']} order(s); updated recommendations for {result['products']} product(s)"
+        ))
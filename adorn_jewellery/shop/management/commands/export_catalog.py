@@ -0,0 +1,34 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop.catalog_io import export_catalog
+from adorn_jewellery.shop.exports import FORMATS, format_for
+
+
+class Command(BaseCommand):
+    help = 'Stream the catalog to a CSV or JSON Lines file that import_catalog can read back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file; "-" (the default) writes to stdout.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, else csv.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        started = time.perf_counter()
+        rows = -1 if fmt == 'csv' else 0  # the CSV header is not a product
+
+        fh = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            for line in export_catalog(fmt):
+                fh.write(line)
+                rows += 1
+        finally:
+            if fh is not sys.stdout:
+                fh.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f'Exported {max(rows, 0)} product(s) in {elapsed:.1f}s '
+                          f'({max(rows, 0) / max(elapsed, 1e-6):,.0f} rows/s)')
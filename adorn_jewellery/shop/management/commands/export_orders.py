@@ -0,0 +1,53 @@
+import sys
+import time
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from adorn_jewellery.shop.exports import CHUNK_SIZE, FORMATS, format_for, order_lines
+from adorn_jewellery.shop.models import Order
+
+
+def _day(value, option):
+    try:
+        return timezone.make_aware(datetime.combine(date.fromisoformat(value), datetime.min.time()))
+    except ValueError:
+        raise CommandError(f'--{option} must be a date in YYYY-MM-DD format')
+
+
+class Command(BaseCommand):
+    help = 'Stream orders with their items to a CSV (one row per item) or JSON Lines (one line per order) file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Output file; "-" (the default) writes to stdout.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, else csv.')
+        parser.add_argument('--since', help='Only orders placed on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Only orders placed before this date (YYYY-MM-DD).')
+        parser.add_argument('--status', choices=[value for value, _label in Order.STATUS_CHOICES])
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Orders fetched per query.')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options['since']:
+            orders = orders.filter(created_at__gte=_day(options['since'], 'since'))
+        if options['until']:
+            orders = orders.filter(created_at__lt=_day(options['until'], 'until'))
+        if options['status']:
+            orders = orders.filter(status=options['status'])
+
+        path = options['path']
+        fmt = options['format'] or format_for(path)
+        started = time.perf_counter()
+        lines = 0
+        fh = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            for line in order_lines(orders, fmt, options['chunk_size']):
+                fh.write(line)
+                lines += 1
+        finally:
+            if fh is not sys.stdout:
+                fh.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f'Wrote {lines} line(s) in {elapsed:.1f}s ({lines / max(elapsed, 1e-6):,.0f} lines/s)')
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adorn_jewellery.shop.catalog_io import BATCH_SIZE, FIELDS, import_catalog, read_rows
+from adorn_jewellery.shop.exports import FORMATS, format_for
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream products from a CSV or JSON Lines file into the catalog in batches. '
+        f"Columns: {', '.join(FIELDS)} (name, category and price are required)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import.')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, else csv.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows written per query.')
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='Leave products whose slug already exists untouched instead of updating them.')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or format_for(options['path'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as fh:
+                stats, errors = import_catalog(
+                    read_rows(fh, fmt), batch_size=options['batch_size'],
+                    update_existing=not options['skip_existing'],
+                )
+        except OSError as exc:
+            raise CommandError(exc)
+        elapsed = time.perf_counter() - started
+
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['rows']} row(s) in {elapsed:.1f}s ({stats['rows'] / max(elapsed, 1e-6):,.0f} rows/s): "
+            f"{stats['created']} created, {stats['updated']} updated, {stats['skipped']} skipped, "
+            f"{stats['duplicates']} duplicate slug(s), {stats['invalid']} invalid; "
+            f"{stats['categories_created']} new categor{'y' if stats['categories_created'] == 1 else 'ies'}"
+        ))
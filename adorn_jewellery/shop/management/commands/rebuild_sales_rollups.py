@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from adorn_jewellery.shop.sales import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups behind the admin sales dashboard from the order history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days from this date (YYYY-MM-DD) on.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rollup rows inserted per query.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+        days = rebuild(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt sales rollups; {days} day(s) with sales in total'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Return stock held by checkout reservations that expired without an order.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Reservations released per transaction.')
+
+    def handle(self, *args, **options):
+        released = release_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservation(s)'))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from adorn_jewellery.shop.mail import DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS, send_queued_mail
+
+
+class Command(BaseCommand):
+    help = 'Send queued order and contact emails in batches, retrying failures with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Messages sent per backend connection.')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help='Give up on a message after this many failed attempts.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running and poll the queue instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to sleep between polls when --loop is set.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_mail(options['batch_size'], options['max_attempts'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'Sent {sent}, failed {failed}')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_sent} sent, {total_failed} failed'))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:06
+
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    # FULLTEXT is MySQL-only; other backends use shop.search.InvertedIndex.
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX product_fulltext_idx ON shop_product (name, description)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX product_fulltext_idx ON shop_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0005_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
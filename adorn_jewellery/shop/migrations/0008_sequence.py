@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+def create_order_number_sequence(apps, schema_editor):
+    # Matches order_numbers.FIRST_NUMBER; the allocator also creates the row if it is missing.
+    apps.get_model('shop', 'Sequence').objects.get_or_create(name='order_number', defaults={'last_value': 999999})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_order_number_sequence, migrations.RunPython.noop),
+    ]
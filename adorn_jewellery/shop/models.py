@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.text import slugify
 from django.conf import settings
 
@@ -30,6 +31,8 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized WebP/JPEG copies of ``image``, written by shop/images.py
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     stock = models.IntegerField(default=0)
     is_featured = models.BooleanField(default=False)
     is_available = models.BooleanField(default=True)
@@ -38,6 +41,15 @@ class Product(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Match the storefront's filters + keyset sort keys (see pagination.SORT_ORDERS)
+        indexes = [
+            models.Index(fields=['is_available', 'created_at', 'id'], name='product_avail_created_idx'),
+            models.Index(fields=['is_available', 'price', 'id'], name='product_avail_price_idx'),
+            models.Index(fields=['category', 'is_available', 'created_at', 'id'], name='product_cat_created_idx'),
+            models.Index(fields=['category', 'is_available', 'price', 'id'], name='product_cat_price_idx'),
+            models.Index(fields=['is_featured', 'is_available', 'created_at'], name='product_featured_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -82,17 +94,34 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+            # Admin changelist: keyset pages, the date drill-down, the status filter and search.
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='order_status_created_idx'),
+            models.Index(fields=['email'], name='order_email_idx'),
+            models.Index(fields=['last_name', 'first_name'], name='order_name_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.order_number:
-            import random
-            self.order_number = f'ORD{random.randint(100000, 999999)}'
+            from .order_numbers import next_order_number
+            self.order_number = next_order_number()
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f'Order {self.order_number}'
 
 
+class Sequence(models.Model):
+    """A named counter; ``order_numbers`` hands out blocks of it."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.name} = {self.last_value}'
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -107,6 +136,96 @@ class OrderItem(models.Model):
         return self.quantity * self.price
 
 
+class CoPurchase(models.Model):
+    """How many orders contained both products; the input ``recommendations`` accumulates into."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('product', 'other')
+
+
+class Recommendation(models.Model):
+    """The top co-purchased products for ``product``, best first."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    orders = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = ('product', 'rank')
+
+    def __str__(self):
+        return f'{self.product_id} -> {self.recommended_id} (#{self.rank})'
+
+
+class DailySales(models.Model):
+    """Orders, units and revenue per day; kept up to date by ``sales.py``."""
+    date = models.DateField(unique=True)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'Daily sales'
+
+    def __str__(self):
+        return f'{self.date}: {self.revenue}'
+
+
+class DailyProductSales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'product')
+        verbose_name_plural = 'Daily product sales'
+
+
+class DailyCategorySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('date', 'category')
+        verbose_name_plural = 'Daily category sales'
+
+
+class StockReservation(models.Model):
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('confirmed', 'Confirmed'),
+        ('released', 'Released'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_expiry_idx'),
+            models.Index(fields=['user', 'status'], name='reservation_user_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity} x {self.product.name} ({self.get_status_display()})'
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=200)
     email = models.EmailField()
@@ -121,6 +240,40 @@ class ContactMessage(models.Model):
     def __str__(self):
         return f'{self.name} - {self.subject}'
 
+
+class QueuedEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=300)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipients = models.TextField(help_text='Comma-separated list of addresses')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='queuedemail_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {self.recipients}'
+
+    @property
+    def recipient_list(self):
+        return [address for address in self.recipients.split(',') if address]
+
 class CartItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart_items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
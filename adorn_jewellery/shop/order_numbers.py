@@ -0,0 +1,72 @@
+# adorn_jewellery/shop/order_numbers.py
+"""
+Order numbers from a database counter.
+
+Numbers come from the ``Sequence`` row named ``order_number``. Each process
+reserves ``BLOCK_SIZE`` of them at a time, with one ``UPDATE ... SET
+last_value = last_value + n`` committed on its own, and then hands them out
+from memory. No two processes can get the same block, so there is nothing to
+retry. Numbers increase within a process and stay short: ``ORD1000000``,
+``ORD1000001``, ... Old random numbers have six digits, so they never clash.
+
+Blocks are only reserved outside a transaction. Inside an ``atomic()``
+block a rollback would undo the reservation while this process kept using
+it, so there a single number is taken within the caller's transaction
+instead. That holds the counter row lock until the caller commits, so hot
+paths such as checkout should call ``next_order_number()`` before opening
+their transaction. A process that exits or a checkout that fails leaves a
+gap; numbers are unique, not contiguous.
+"""
+import os
+import threading
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Sequence
+
+SEQUENCE_NAME = 'order_number'
+FIRST_NUMBER = 1000000
+BLOCK_SIZE = 50
+PREFIX = 'ORD'
+
+_lock = threading.Lock()
+_block = {'pid': None, 'next': 0, 'end': 0}
+
+
+def format_order_number(number):
+    return f'{PREFIX}{number}'
+
+
+def reserve(count):
+    """Take ``count`` numbers from the counter; returns the first one."""
+    with transaction.atomic():
+        counter = Sequence.objects.filter(name=SEQUENCE_NAME)
+        if not counter.update(last_value=F('last_value') + count):
+            Sequence.objects.get_or_create(name=SEQUENCE_NAME, defaults={'last_value': FIRST_NUMBER - 1})
+            counter.update(last_value=F('last_value') + count)
+        last_value = counter.values_list('last_value', flat=True).get()
+    return last_value - count + 1
+
+
+def next_number():
+    if connection.in_atomic_block:
+        return reserve(1)
+    with _lock:
+        # A forked worker must not reuse the block its parent was handing out.
+        if _block['pid'] != os.getpid() or _block['next'] >= _block['end']:
+            start = reserve(BLOCK_SIZE)
+            _block.update(pid=os.getpid(), next=start, end=start + BLOCK_SIZE)
+        number = _block['next']
+        _block['next'] += 1
+    return number
+
+
+def next_order_number():
+    return format_order_number(next_number())
+
+
+def discard_block():
+    """Forget this process's unused numbers (used by tests after a flush)."""
+    with _lock:
+        _block.update(pid=None, next=0, end=0)
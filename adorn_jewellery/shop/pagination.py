@@ -0,0 +1,102 @@
+# adorn_jewellery/shop/pagination.py
+"""
+Keyset (cursor) pagination for the product listing.
+
+Each page is fetched with ``WHERE (sort_key, id) > (last_sort_key, last_id)``
+instead of ``OFFSET``, so page 1000 costs the same as page 1. The cursor is
+an opaque, URL-safe token holding the last row's sort value and id.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Product
+
+PAGE_SIZE = 24
+
+# ``sort`` query value -> (ordering field, tiebreaker)
+SORT_ORDERS = {
+    'price_low': ('price', 'id'),
+    'price_high': ('-price', '-id'),
+    'newest': ('-created_at', '-id'),
+}
+DEFAULT_SORT = 'newest'
+
+
+_PRICE_FIELD = Product._meta.get_field('price')
+_PRICE_LIMIT = Decimal(10) ** (_PRICE_FIELD.max_digits - _PRICE_FIELD.decimal_places)
+
+
+def _price(value):
+    value = Decimal(value)
+    # NaN, Infinity and out-of-range values parse but no stored price can produce them.
+    return value if value.is_finite() and abs(value) < _PRICE_LIMIT else None
+
+
+_PARSERS = {
+    'price': _price,
+    'created_at': parse_datetime,
+}
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([str(value) if isinstance(value, Decimal) else value.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field):
+    """Return ``(value, pk)`` or ``None`` for a missing or tampered cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        value = _PARSERS[field](value)
+        if value is None:
+            return None
+        return value, int(pk)
+    except (binascii.Error, ValueError, TypeError, InvalidOperation, UnicodeDecodeError):
+        return None
+
+
+def _sort_order(sort):
+    return SORT_ORDERS.get(sort or DEFAULT_SORT, SORT_ORDERS[DEFAULT_SORT])
+
+
+def after_cursor(queryset, sort=None, cursor=None):
+    """``queryset`` in ``sort`` order, starting with the row after ``cursor``."""
+    order, tiebreak = _sort_order(sort)
+    field = order.lstrip('-')
+    queryset = queryset.order_by(order, tiebreak)
+
+    position = decode_cursor(cursor, field)
+    if position:
+        value, pk = position
+        lookup = 'lt' if order.startswith('-') else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+        )
+    return queryset
+
+
+def cursor_after(row, sort=None):
+    """The cursor for the page that follows ``row``."""
+    field = _sort_order(sort)[0].lstrip('-')
+    return encode_cursor(getattr(row, field), row.pk)
+
+
+def keyset_page(queryset, sort=None, cursor=None, page_size=PAGE_SIZE):
+    """
+    Return ``(objects, next_cursor)`` for the page after ``cursor``.
+
+    ``next_cursor`` is ``None`` on the last page.
+    """
+    rows = list(after_cursor(queryset, sort, cursor)[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, cursor_after(rows[-1], sort)
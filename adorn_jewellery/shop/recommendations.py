@@ -0,0 +1,143 @@
+# adorn_jewellery/shop/recommendations.py
+"""
+"Customers also bought" from order history.
+
+``update_recommendations`` reads the order lines created since its last
+run, counts product pairs with pandas (a self-merge of the order lines on
+``order_id``), and adds them to the running totals in ``CoPurchase``. Only
+products whose totals changed get their ``Recommendation`` rows (the top
+``TOP_K`` partners) rewritten, so each run costs in proportion to the new
+orders, not the whole history. The last processed order id is kept in the
+``Sequence`` row named ``recommendations``.
+
+``related_products`` reads the stored list with one indexed query and tops
+it up with same-category products when a product has too little history.
+The result is cached under the catalog version, which each run bumps.
+Run ``manage.py build_recommendations`` from cron.
+"""
+from datetime import timedelta
+
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version, cached
+from .models import CoPurchase, OrderItem, Product, Recommendation, Sequence
+
+CHECKPOINT = 'recommendations'
+TOP_K = 8
+RELATED_COUNT = 4
+
+# Orders younger than this are left for the next run, so a checkout that
+# commits after a later order id was processed is not skipped.
+SETTLE_TIME = timedelta(minutes=5)
+
+
+def _checkpoint():
+    sequence, _created = Sequence.objects.get_or_create(name=CHECKPOINT, defaults={'last_value': 0})
+    return sequence.last_value
+
+
+def _new_lines(after, before):
+    rows = (
+        OrderItem.objects.filter(order_id__gt=after, order__created_at__lt=before)
+        .exclude(order__status='cancelled')
+        .order_by()
+        .values_list('order_id', 'product_id')
+        .distinct()
+    )
+    return pd.DataFrame.from_records(rows.iterator(chunk_size=5000), columns=['order_id', 'product_id'])
+
+
+def pair_counts(lines):
+    """``DataFrame(product_id, other_id, orders)`` for every ordered pair bought together."""
+    pairs = lines.merge(lines, on='order_id', suffixes=('', '_other'))
+    pairs = pairs[pairs['product_id'] != pairs['product_id_other']]
+    return (
+        pairs.groupby(['product_id', 'product_id_other']).size()
+        .rename('orders').reset_index()
+        .rename(columns={'product_id_other': 'other_id'})
+    )
+
+
+def _accumulate(counts):
+    """Add ``counts`` to the stored totals; returns the ids whose totals changed."""
+    product_ids = counts['product_id'].unique().tolist()
+    existing = pd.DataFrame.from_records(
+        CoPurchase.objects.filter(product_id__in=product_ids).values_list('product_id', 'other_id', 'orders'),
+        columns=['product_id', 'other_id', 'orders'],
+    )
+    totals = (
+        pd.concat([existing, counts]).groupby(['product_id', 'other_id'], as_index=False)['orders'].sum()
+        .merge(counts[['product_id', 'other_id']], on=['product_id', 'other_id'])
+    )
+    options = {'update_conflicts': True, 'update_fields': ['orders']}
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = ['product', 'other']
+    CoPurchase.objects.bulk_create([
+        CoPurchase(product_id=product_id, other_id=other_id, orders=orders)
+        for product_id, other_id, orders in totals.itertuples(index=False)
+    ], batch_size=1000, **options)
+    return product_ids
+
+
+def _rank(product_ids):
+    """Rewrite the top ``TOP_K`` rows of each product in ``product_ids``."""
+    totals = pd.DataFrame.from_records(
+        CoPurchase.objects.filter(product_id__in=product_ids).values_list('product_id', 'other_id', 'orders'),
+        columns=['product_id', 'other_id', 'orders'],
+    )
+    # Ties go to the lower id so reruns give the same order.
+    top = (
+        totals.sort_values(['product_id', 'orders', 'other_id'], ascending=[True, False, True])
+        .groupby('product_id').head(TOP_K)
+    )
+    top = top.assign(rank=top.groupby('product_id').cumcount() + 1)
+
+    Recommendation.objects.filter(product_id__in=product_ids).delete()
+    Recommendation.objects.bulk_create([
+        Recommendation(product_id=product_id, recommended_id=other_id, orders=orders, rank=rank)
+        for product_id, other_id, orders, rank in top[['product_id', 'other_id', 'orders', 'rank']].itertuples(index=False)
+    ], batch_size=1000)
+
+
+def update_recommendations(full=False, batch_size=500):
+    """
+    Fold new orders into the recommendations; ``full`` starts again from
+    the first order. Returns ``{'orders': n, 'products': n}`` for the run.
+    """
+    with transaction.atomic():
+        if full:
+            CoPurchase.objects.all().delete()
+            Recommendation.objects.all().delete()
+            Sequence.objects.filter(name=CHECKPOINT).delete()
+        after = _checkpoint()
+        lines = _new_lines(after, timezone.now() - SETTLE_TIME)
+        if lines.empty:
+            return {'orders': 0, 'products': 0}
+
+        counts = pair_counts(lines)
+        changed = _accumulate(counts) if not counts.empty else []
+        for start in range(0, len(changed), batch_size):
+            _rank(changed[start:start + batch_size])
+        Sequence.objects.filter(name=CHECKPOINT).update(last_value=int(lines['order_id'].max()))
+        transaction.on_commit(bump_catalog_version)
+    return {'orders': lines['order_id'].nunique(), 'products': len(changed)}
+
+
+def _related(product, count):
+    related = [
+        recommendation.recommended for recommendation in
+        Recommendation.objects.filter(product=product, recommended__is_available=True)
+        .select_related('recommended').order_by('rank')[:count]
+    ]
+    if len(related) < count:
+        related += Product.objects.filter(category=product.category_id, is_available=True).exclude(
+            id__in=[product.id, *(item.id for item in related)],
+        )[:count - len(related)]
+    return related
+
+
+def related_products(product, count=RELATED_COUNT):
+    """Co-purchased products for sale, best first, filled up from ``product``'s category."""
+    return cached('related', lambda: _related(product, count), product.id, count)
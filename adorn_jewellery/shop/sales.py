@@ -0,0 +1,159 @@
+# adorn_jewellery/shop/sales.py
+"""
+Sales rollups.
+
+``DailySales``, ``DailyProductSales`` and ``DailyCategorySales`` hold
+orders, units and revenue per day (in ``TIME_ZONE``), overall and per
+product/category. Checkout calls ``record_order`` once an order's items
+exist; the Order signals in ``signals.py`` take an order back out when it is
+cancelled or deleted, and put it back if it is un-cancelled. Each change is
+a few statements whatever the order size: insert-if-missing, then one
+``UPDATE ... SET revenue = revenue + CASE ...`` per table.
+
+Changes made with ``QuerySet.update()`` bypass the signals; run
+``manage.py rebuild_sales_rollups`` after those, and once to backfill.
+The admin dashboard (``report``) reads only these tables.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyProductSales, DailySales, OrderItem
+
+EXCLUDED_STATUSES = ('cancelled',)
+
+# Longer reports are charted per month instead of per day.
+DAILY_SERIES_MAX_DAYS = 92
+TOP_PRODUCTS = 10
+
+
+def counts_towards_sales(status):
+    return status not in EXCLUDED_STATUSES
+
+
+def _line_totals(items, key):
+    return items.values(key).annotate(
+        units=Sum('quantity'), revenue=Sum(F('quantity') * F('price'), output_field=DecimalField()),
+    ).values_list(key, 'units', 'revenue')
+
+
+def _add_day(date, orders, units, revenue):
+    DailySales.objects.bulk_create([DailySales(date=date)], ignore_conflicts=True)
+    DailySales.objects.filter(date=date).update(
+        orders=F('orders') + orders, units=F('units') + units, revenue=F('revenue') + revenue,
+    )
+
+
+def _add(model, key, date, totals):
+    """Add ``{key_id: (orders, units, revenue)}`` to ``model``'s rows for ``date``."""
+    model.objects.bulk_create([model(date=date, **{f'{key}_id': key_id}) for key_id in totals], ignore_conflicts=True)
+
+    def per_row(position, output_field):
+        return Case(
+            *[When(**{f'{key}_id': key_id}, then=Value(values[position])) for key_id, values in totals.items()],
+            default=Value(0), output_field=output_field,
+        )
+
+    model.objects.filter(date=date, **{f'{key}_id__in': totals}).update(
+        orders=F('orders') + per_row(0, IntegerField()),
+        units=F('units') + per_row(1, IntegerField()),
+        revenue=F('revenue') + per_row(2, DecimalField(max_digits=14, decimal_places=2)),
+    )
+
+
+def record_order(order, sign=1):
+    """Add ``order`` to the rollups, or take it out with ``sign=-1``."""
+    items = OrderItem.objects.filter(order=order).order_by()
+    products = {product_id: (sign, sign * units, sign * revenue)
+                for product_id, units, revenue in _line_totals(items, 'product_id')}
+    if not products:
+        return
+    categories = {category_id: (sign, sign * units, sign * revenue)
+                  for category_id, units, revenue in _line_totals(items, 'product__category_id')}
+    date = timezone.localdate(order.created_at)
+
+    with transaction.atomic():
+        _add_day(
+            date, sign,
+            sum(units for _orders, units, _revenue in products.values()),
+            sum((revenue for _orders, _units, revenue in products.values()), Decimal('0')),
+        )
+        _add(DailyProductSales, 'product', date, products)
+        _add(DailyCategorySales, 'category', date, categories)
+
+
+def _aggregate(items, *keys):
+    return items.values('day', *keys).annotate(
+        orders=Count('order_id', distinct=True),
+        units=Sum('quantity'),
+        revenue=Sum(F('quantity') * F('price'), output_field=DecimalField()),
+    ).order_by()
+
+
+def rebuild(since=None, batch_size=1000):
+    """Recompute the rollups from ``Order``/``OrderItem``, for every day or from ``since`` on."""
+    items = OrderItem.objects.exclude(order__status__in=EXCLUDED_STATUSES).annotate(
+        day=TruncDate('order__created_at', tzinfo=timezone.get_current_timezone()),
+    )
+    if since is not None:
+        items = items.filter(order__created_at__gte=timezone.make_aware(datetime.combine(since, time.min)))
+
+    with transaction.atomic():
+        for model in (DailySales, DailyProductSales, DailyCategorySales):
+            stale = model.objects.all()
+            (stale.filter(date__gte=since) if since is not None else stale).delete()
+
+        DailySales.objects.bulk_create([
+            DailySales(date=row['day'], orders=row['orders'], units=row['units'], revenue=row['revenue'])
+            for row in _aggregate(items)
+        ], batch_size=batch_size)
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(date=row['day'], product_id=row['product_id'], orders=row['orders'],
+                              units=row['units'], revenue=row['revenue'])
+            for row in _aggregate(items, 'product_id')
+        ], batch_size=batch_size)
+        DailyCategorySales.objects.bulk_create([
+            DailyCategorySales(date=row['day'], category_id=row['product__category_id'], orders=row['orders'],
+                               units=row['units'], revenue=row['revenue'])
+            for row in _aggregate(items, 'product__category_id')
+        ], batch_size=batch_size)
+    return DailySales.objects.count()
+
+
+def _totals(rows):
+    return rows.aggregate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+
+
+def report(start, end):
+    """Everything the sales dashboard shows for ``start``..``end`` (inclusive dates)."""
+    days = DailySales.objects.filter(date__range=(start, end))
+    monthly = (end - start) > timedelta(days=DAILY_SERIES_MAX_DAYS)
+    period = TruncMonth('date') if monthly else F('date')
+    series = list(
+        days.annotate(period=period).values('period')
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue')).order_by('period')
+    )
+    categories = list(
+        DailyCategorySales.objects.filter(date__range=(start, end)).values('category_id', 'category__name')
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue')).order_by('-revenue')
+    )
+    products = list(
+        DailyProductSales.objects.filter(date__range=(start, end)).values('product_id', 'product__name')
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue')).order_by('-revenue')[:TOP_PRODUCTS]
+    )
+    peak = max((row['revenue'] for row in series), default=0) or 1
+    for row in series:
+        row['share'] = round(100 * row['revenue'] / peak)
+    return {
+        'start': start,
+        'end': end,
+        'monthly': monthly,
+        'totals': _totals(days),
+        'series': series,
+        'categories': categories,
+        'products': products,
+    }
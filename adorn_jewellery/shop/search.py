@@ -0,0 +1,200 @@
+# adorn_jewellery/shop/search.py
+"""
+Ranked product search.
+
+On MySQL the query runs against the ``product_fulltext_idx`` FULLTEXT index
+(``MATCH ... AGAINST`` in natural language mode). Other backends (SQLite in
+development and tests) use ``InvertedIndex``, an in-process index built once
+from the whole catalog and kept current by the Product signals in
+``signals.py``.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from operator import itemgetter
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+MAX_RESULTS = 200
+NAME_WEIGHT = 3
+CATEGORY_WEIGHT = 2
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_STOPWORDS = frozenset('a an and are as at be by for from in is it of on or the to with'.split())
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall((text or '').lower()) if token not in _STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    token -> {product_id: BM25 term impact}.
+
+    The length-normalised term part of BM25 is computed when a product is
+    added, using the average document length at that moment, so a query only
+    has to sum ``idf * impact`` over its postings.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, average_length=20):
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._lengths = {}
+        self._total_length = 0
+        self._average_length = average_length
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def _terms(self, name, description, category_name):
+        terms = defaultdict(int)
+        for token in tokenize(name):
+            terms[token] += NAME_WEIGHT
+        for token in tokenize(category_name):
+            terms[token] += CATEGORY_WEIGHT
+        for token in tokenize(description):
+            terms[token] += 1
+        return terms
+
+    def add(self, product_id, name, description='', category_name=''):
+        with self._lock:
+            self.remove(product_id)
+            terms = self._terms(name, description, category_name)
+            length = sum(terms.values())
+            if self._lengths:
+                self._average_length = (self._total_length + length) / (len(self._lengths) + 1)
+            norm = self.k1 * (1 - self.b + self.b * length / self._average_length)
+            for token, frequency in terms.items():
+                self._postings[token][product_id] = frequency * (self.k1 + 1) / (frequency + norm)
+            self._doc_terms[product_id] = tuple(terms)
+            self._lengths[product_id] = length
+            self._total_length += length
+
+    def remove(self, product_id):
+        with self._lock:
+            length = self._lengths.pop(product_id, None)
+            if length is None:
+                return
+            self._total_length -= length
+            for token in self._doc_terms.pop(product_id):
+                postings = self._postings[token]
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Return ``[(product_id, score), ...]`` best first; every match when ``limit`` is ``None``."""
+        tokens = set(tokenize(query))
+        with self._lock:
+            if not tokens or not self._lengths:
+                return []
+            count = len(self._lengths)
+            scores = {}
+            for token in tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, impact in postings.items():
+                    scores[product_id] = scores.get(product_id, 0.0) + idf * impact
+        if limit is None:
+            return sorted(scores.items(), key=itemgetter(1), reverse=True)
+        return heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide fallback index, built from the catalog on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = InvertedIndex()
+                rows = Product.objects.values_list(
+                    'id', 'name', 'description', 'category__name',
+                )
+                for row in rows.iterator(chunk_size=2000):
+                    index.add(*row)
+                _index = index
+    return _index
+
+
+def index_product(product):
+    """Keep the fallback index in step with a saved product (no-op until it is built)."""
+    if _index is not None:
+        _index.add(product.id, product.name, product.description, product.category.name)
+
+
+def unindex_product(product_id):
+    if _index is not None:
+        _index.remove(product_id)
+
+
+def reset_index():
+    global _index
+    _index = None
+
+
+def uses_fulltext():
+    return connection.vendor == 'mysql'
+
+
+def search_product_ids(query, limit=MAX_RESULTS, queryset=None):
+    """
+    Ids of products matching ``query``, most relevant first.
+
+    ``queryset`` narrows the FULLTEXT query on MySQL; the in-process index
+    always covers the whole catalog, so callers filter its ids themselves.
+    ``limit=None`` returns every match (in-process index only).
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    if uses_fulltext():
+        queryset = queryset if queryset is not None else Product.objects.all()
+        relevance = RawSQL(
+            'MATCH (shop_product.name, shop_product.description) AGAINST (%s IN NATURAL LANGUAGE MODE)',
+            (query,),
+        )
+        return list(
+            queryset.annotate(relevance=relevance).filter(relevance__gt=0)
+            .order_by('-relevance').values_list('id', flat=True)[:limit]
+        )
+
+    return [product_id for product_id, _score in get_index().search(query, limit)]
+
+
+def _in_rank_order(queryset, ids):
+    rank = {product_id: position for position, product_id in enumerate(ids)}
+    return sorted(queryset.filter(id__in=ids), key=lambda product: rank[product.id])
+
+
+def search_products(query, queryset=None, limit=MAX_RESULTS):
+    """Up to ``limit`` products from ``queryset`` matching ``query``, in relevance order."""
+    queryset = queryset if queryset is not None else Product.objects.filter(is_available=True)
+    if uses_fulltext():
+        return _in_rank_order(queryset, search_product_ids(query, limit, queryset))
+
+    # The in-process index ranks the whole catalog, so matches outside
+    # ``queryset`` (unavailable, other categories) are skipped a chunk at a
+    # time until ``limit`` in-scope products are found.
+    ranked = search_product_ids(query, None)
+    products = []
+    for start in range(0, len(ranked), limit):
+        products.extend(_in_rank_order(queryset, ranked[start:start + limit]))
+        if len(products) >= limit:
+            break
+    return products[:limit]
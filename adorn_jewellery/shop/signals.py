@@ -0,0 +1,71 @@
+# adorn_jewellery/shop/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, images, sales, search
+from .cache import bump_catalog_version
+from .models import Category, Order, Product
+
+
+# Bumps wait for the commit: a read between the bump and the commit would
+# cache the old rows under the new version.
+def catalog_changed():
+    # The receivers below already applied the change to the typeahead index.
+    autocomplete.advance(bump_catalog_version())
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    search.index_product(instance)
+    autocomplete.index_product(instance)
+    transaction.on_commit(catalog_changed)
+    if images.needs_variants(instance):
+        images.generate_on_commit(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    search.unindex_product(instance.pk)
+    autocomplete.unindex_product(instance.pk)
+    transaction.on_commit(catalog_changed)
+    transaction.on_commit(lambda: images.delete_variants(instance.image_variants))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    # Category names are indexed with every product in them; rebuild lazily.
+    search.reset_index()
+    autocomplete.index_category(instance)
+    transaction.on_commit(catalog_changed)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    search.reset_index()
+    autocomplete.unindex_category(instance.pk)
+    transaction.on_commit(catalog_changed)
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, **kwargs):
+    # New orders are added to the rollups by checkout, once their items exist.
+    if instance.pk:
+        previous = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        instance._counted_in_sales = previous is not None and sales.counts_towards_sales(previous)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    counted = getattr(instance, '_counted_in_sales', None)
+    if created or counted is None:
+        return
+    if counted != sales.counts_towards_sales(instance.status):
+        sales.record_order(instance, sign=-1 if counted else 1)
+    del instance._counted_in_sales
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, **kwargs):
+    if sales.counts_towards_sales(instance.status):
+        sales.record_order(instance, sign=-1)
@@ -0,0 +1,36 @@
+# adorn_jewellery/shop/templatetags/catalog.py
+from django import template
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .. import images
+from ..cache import cached
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_card(product):
+    """The shop grid card for ``product``, rendered once per catalog version."""
+    return mark_safe(cached(
+        'card', lambda: render_to_string('shop/includes/product_card.html', {'product': product}), product.id,
+    ))
+
+
+@register.simple_tag
+def product_image(product, sizes='(max-width: 600px) 100vw, 320px', css_class='', loading='lazy'):
+    """
+    ``<picture>`` with WebP and JPEG ``srcset``s from the generated variants;
+    a plain ``<img>`` of the original until they exist.
+    """
+    if not images.variants(product):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', product.image.url, product.name, css_class, loading)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}">'
+        '</picture>',
+        images.srcset(product, 'webp'), sizes,
+        images.thumbnail_url(product), images.srcset(product, 'jpeg'), sizes, product.name, css_class, loading,
+    )
@@ -1,3 +1,1573 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+from PIL import Image
+
+from adorn_jewellery import timing
+from adorn_jewellery.static_assets import StaticASGIHandler, StaticAssets, StaticWSGIHandler
+
+from . import (
+    autocomplete, catalog_io, changelists, checks, conditional, counters, exports, facets, images, inventory, mail,
+    order_numbers, pagination, recommendations, search,
+)
+from .benchmarks import summarize
+from .cart import GUEST_MERGE_SESSION_KEY, MAX_QUANTITY, InvalidCartOperation, apply_cart_operations
+from . import cache as catalog_cache
+from .models import (
+    Category, Product, Order, OrderItem, CartItem, CoPurchase, DailyCategorySales, DailyProductSales, DailySales,
+    QueuedEmail, Recommendation, StockReservation, WishlistItem,
+)
+
+
+def make_products(count, category=None, **fields):
+    category = category or Category.objects.create(name=f'Category {Category.objects.count()}')
+    start = Product.objects.count()
+    return [
+        Product.objects.create(
+            name=f'Product {start + i}',
+            category=category,
+            description='Test product',
+            price=Decimal('100.00') + i,
+            stock=fields.get('stock', 50),
+        )
+        for i in range(count)
+    ]
+
+
+TIMING_LOGGER = logging.getLogger('adorn_jewellery.timing')
+TIMING_LOG_LEVEL = TIMING_LOGGER.level
+
+
+def setUpModule():
+    # Password hashing makes every login and signup a slow request; keep their WARNING lines out of the run.
+    TIMING_LOGGER.setLevel(logging.ERROR)
+
+
+def tearDownModule():
+    TIMING_LOGGER.setLevel(TIMING_LOG_LEVEL)
+
+
+CHECKOUT_FORM = {
+    'first_name': 'Amani',
+    'last_name': 'Wanjiru',
+    'email': 'amani@example.com',
+    'phone': '0700000000',
+    'address': '1 Moi Avenue',
+    'city': 'Nairobi',
+    'state': 'Nairobi',
+    'postal_code': '00100',
+    'country': 'Kenya',
+}
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pass12345')
+        self.client.force_login(self.user)
+
+    def checkout(self, products, quantity=2):
+        CartItem.objects.bulk_create([CartItem(user=self.user, product=product, quantity=quantity) for product in products])
+        return self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+
+    def test_checkout_places_order_and_decrements_stock(self):
+        products = make_products(3, stock=10)
+
+        # Whatever the browser posts, the server cart and prices are used.
+        response = self.checkout(products, quantity=3)
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.total_amount, sum(product.price * 3 for product in products))
+        self.assertEqual(
+            sorted(OrderItem.objects.values_list('price', flat=True)),
+            sorted(product.price for product in products),
+        )
+        self.assertEqual(set(Product.objects.values_list('stock', flat=True)), {7})
+        self.assertFalse(CartItem.objects.filter(user=self.user).exists())
+        self.assertEqual(QueuedEmail.objects.count(), 2)
+
+    def test_checkout_query_count_does_not_grow_with_cart_size(self):
+        small, large = make_products(1), make_products(20)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.checkout(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.checkout(large)
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_checkout_with_withdrawn_product_places_no_order(self):
+        product = make_products(1)[0]
+        CartItem.objects.create(user=self.user, product=product)
+        Product.objects.filter(pk=product.pk).update(is_available=False)
+
+        response = self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+
+        self.assertRedirects(response, reverse('shop:cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+    def test_checkout_page_renders_the_server_cart(self):
+        product = make_products(1)[0]
+        CartItem.objects.create(user=self.user, product=product, quantity=2)
+
+        response = self.client.get(reverse('shop:checkout'))
+
+        self.assertContains(response, product.name)
+        self.assertEqual(response.context['total'], product.price * 2)
+
+
+class MailQueueTests(TestCase):
+    def queue(self, count):
+        for i in range(count):
+            mail.queue_mail(f'Subject {i}', 'Body', 'shop@example.com', [f'user{i}@example.com'])
+
+    def test_messages_are_sent_after_the_claim_commits(self):
+        self.queue(2)
+        statuses = []
+
+        def send_messages(connection, messages):
+            statuses.append(list(QueuedEmail.objects.values_list('status', flat=True)))
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages):
+            self.assertEqual(mail.send_queued_mail(), (2, 0))
+
+        self.assertEqual(statuses, [['sending', 'sending']] * 2)
+        self.assertEqual(set(QueuedEmail.objects.values_list('status', flat=True)), {'sent'})
+
+    def test_claimed_messages_are_skipped_until_the_lease_expires(self):
+        self.queue(1)
+        now = timezone.now()
+        mail.claim_batch(10, now)
+
+        self.assertEqual(mail.claim_batch(10, now), [])
+        self.assertEqual(len(mail.claim_batch(10, now + mail.SEND_LEASE)), 1)
+
+    def test_failed_send_returns_message_to_the_queue(self):
+        self.queue(1)
+        queued = QueuedEmail.objects.get()
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            with self.assertLogs(mail.logger, 'WARNING') as logs:
+                self.assertEqual(mail.send_queued_mail(), (0, 1))
+
+        self.assertEqual([record.getMessage() for record in logs.records],
+                         [f'Sending queued email {queued.pk} failed: down'])
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error), ('pending', 1, 'down'))
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Rings')
+        # Repeated prices make sure ties are broken by id rather than skipped or duplicated.
+        Product.objects.bulk_create([
+            Product(name=f'Ring {i}', slug=f'ring-{i}', category=category, description='Ring',
+                    price=Decimal(100 + i % 7))
+            for i in range(50)
+        ])
+
+    def walk(self, sort):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse('shop:products_page'), {'sort': sort, 'cursor': cursor or ''})
+            data = response.json()
+            seen.extend(item['id'] for item in data['products'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen
+
+    def test_every_sort_visits_each_product_once_in_order(self):
+        orderings = {
+            'price_low': ('price', 'id'),
+            'price_high': ('-price', '-id'),
+            'newest': ('-created_at', '-id'),
+        }
+        for sort, ordering in orderings.items():
+            with self.subTest(sort=sort):
+                expected = list(Product.objects.order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual(self.walk(sort), expected)
+
+    def test_pages_are_fetched_without_offset(self):
+        first = self.client.get(reverse('shop:products_page'), {'sort': 'price_low'}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('shop:products_page'), {'sort': 'price_low', 'cursor': first['next_cursor']})
+
+        self.assertFalse(any('OFFSET' in query['sql'].upper() for query in queries))
+
+    def test_invalid_cursor_starts_from_the_first_page(self):
+        response = self.client.get(reverse('shop:products_page'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(len(response.json()['products']), 24)
+
+    def test_non_finite_or_oversized_price_cursor_is_rejected(self):
+        for value in ['NaN', 'Infinity', '-Infinity', 'sNaN', '1e999']:
+            with self.subTest(value=value):
+                cursor = pagination.encode_cursor(Decimal(value), 1)
+                response = self.client.get(reverse('shop:products_page'), {'sort': 'price_low', 'cursor': cursor})
+
+                self.assertEqual(len(response.json()['products']), 24)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rings = Category.objects.create(name='Rings')
+        necklaces = Category.objects.create(name='Necklaces')
+        cls.sapphire = Product.objects.create(name='Sapphire Ring', category=rings, price=500,
+                                              description='A deep blue stone set in silver.')
+        cls.pendant = Product.objects.create(name='Gold Pendant', category=necklaces, price=300,
+                                             description='Pairs well with a sapphire ring.')
+        cls.hidden = Product.objects.create(name='Sapphire Studs', category=rings, price=200,
+                                            description='Retired.', is_available=False)
+
+    def setUp(self):
+        search.reset_index()
+
+    def test_name_matches_rank_above_description_matches(self):
+        response = self.client.get(reverse('shop:search'), {'q': 'sapphire'})
+
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.sapphire.id, self.pendant.id])
+
+    def test_index_follows_product_saves_and_deletes(self):
+        search.get_index()
+        self.pendant.name = 'Emerald Pendant'
+        self.pendant.save()
+        self.sapphire.delete()
+
+        self.assertEqual([p.id for p in search.search_products('emerald')], [self.pendant.id])
+        self.assertEqual(search.search_products('ring sapphire'), [self.pendant])
+
+    def test_search_limit_is_clamped(self):
+        for limit, expected in [('-5', 1), ('0', 1), ('1000', 2), ('x', 2)]:
+            with self.subTest(limit=limit):
+                response = self.client.get(reverse('shop:search'), {'q': 'sapphire', 'limit': limit})
+
+                self.assertEqual(len(response.json()['results']), expected)
+
+    def test_out_of_scope_matches_do_not_crowd_out_results(self):
+        # Higher-ranked matches that are unavailable fill the first chunk of ids.
+        category = Category.objects.create(name='Archive')
+        Product.objects.bulk_create([
+            Product(name=f'Sapphire Sapphire Ring {i}', slug=f'archived-{i}', category=category, price=100,
+                    description='Sapphire.', is_available=False)
+            for i in range(5)
+        ])
+
+        results = search.search_products('sapphire', limit=2)
+
+        self.assertEqual(results, [self.sapphire, self.pendant])
+
+    def test_shop_page_shows_ranked_results(self):
+        response = self.client.get(reverse('shop:shop'), {'q': 'gold'})
+
+        self.assertEqual(list(response.context['products']), [self.pendant])
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rings = Category.objects.create(name='Rings')
+        cls.ruby = Product.objects.create(name='Ruby Ring', category=cls.rings, price=100, description='Ring')
+        Product.objects.create(name='Rose Gold Ring', category=cls.rings, price=100, description='Ring')
+
+    def setUp(self):
+        autocomplete.reset_index()
+
+    def labels(self, prefix):
+        return [item['label'] for item in autocomplete.suggest(prefix)]
+
+    def test_matches_any_word_with_categories_first(self):
+        self.assertEqual(self.labels('ri'), ['Rings', 'Ruby Ring', 'Rose Gold Ring'])
+        self.assertEqual(self.labels('gol'), ['Rose Gold Ring'])
+
+    def test_lookups_do_not_touch_the_database(self):
+        autocomplete.get_indexes()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('shop:autocomplete'), {'q': 'rub'})
+
+        self.assertEqual(response.json()['suggestions'][0]['url'], reverse('shop:product_detail', args=[self.ruby.slug]))
+
+    def test_index_follows_saves_and_deletes(self):
+        autocomplete.get_indexes()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Topaz Pendant', category=Category.objects.create(name='Pendants'),
+                                   price=100, description='New')
+            self.ruby.is_available = False
+            self.ruby.save()
+            self.rings.delete()
+
+        self.assertEqual(self.labels('to'), ['Topaz Pendant'])
+        self.assertEqual(self.labels('r'), [])
+
+    def test_own_saves_do_not_trigger_a_resync(self):
+        autocomplete.get_indexes()
+        with mock.patch.object(autocomplete, '_resync_in_background') as resync:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.ruby.name = 'Ruby Band'
+                self.ruby.save()
+            self.assertEqual(self.labels('ban'), ['Ruby Band'])
+
+        resync.assert_not_called()
+
+    def test_index_is_resynced_off_the_request_when_another_process_bumps_the_catalog(self):
+        autocomplete.get_indexes()
+        # A bulk UPDATE sends no signals; the version bump is all a worker sees.
+        Product.objects.filter(pk=self.ruby.pk).update(name='Ruby Cuff', is_available=True)
+        catalog_cache.bump_catalog_version()
+
+        # The thread would use its own connection, which cannot see this test's transaction.
+        with mock.patch.object(autocomplete, '_resync_in_background', autocomplete._resync):
+            self.assertEqual(self.labels('cu'), [])  # served from the current index while resyncing
+            self.assertEqual(self.labels('cu'), ['Ruby Cuff'])
+
+
+class FacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rings = Category.objects.create(name='Rings')
+        cls.chains = Category.objects.create(name='Chains')
+        Product.objects.create(name='Cheap Ring', category=cls.rings, price=500, stock=0, description='Ring')
+        Product.objects.create(name='Gold Ring', category=cls.rings, price=2500, original_price=3000,
+                               stock=4, description='Ring')
+        Product.objects.create(name='Gold Chain', category=cls.chains, price=12000, stock=2, description='Chain')
+        Product.objects.create(name='Hidden Chain', category=cls.chains, price=700, is_available=False,
+                               description='Chain')
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, **params):
+        filters = facets.parse_filters(params)
+        return facets.facet_counts(filters, [self.rings.id, self.chains.id])
+
+    def test_each_facet_ignores_its_own_dimension(self):
+        counts = self.counts(category='rings', in_stock='1')
+
+        self.assertEqual(counts['total'], 1)
+        self.assertEqual(counts['categories'], {self.rings.id: 1, self.chains.id: 1})
+        self.assertEqual(counts['prices'], [0, 1, 0, 0])
+        self.assertEqual(counts['in_stock'], 1)
+        self.assertEqual(counts['on_sale'], 1)
+        self.assertEqual(self.counts(min_price='not a number')['total'], 3)
+
+    def test_counts_take_one_query_and_are_cached_until_the_catalog_changes(self):
+        with self.assertNumQueries(1):
+            self.counts()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts()['prices'], [1, 1, 0, 1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='New Ring', category=self.rings, price=800, description='Ring')
+        self.assertEqual(self.counts()['prices'], [2, 1, 0, 1])
+
+    def test_shop_sidebar_shows_counts_and_applies_state_filters(self):
+        response = self.client.get(reverse('shop:shop'), {'on_sale': '1'})
+
+        self.assertEqual([product.name for product in response.context['products']], ['Gold Ring'])
+        self.assertContains(response, 'Rings <span class="facet-count">(1)</span>', html=False)
+        self.assertContains(response, 'Chains <span class="facet-count">(0)</span>', html=False)
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rings = Category.objects.create(name='Rings')
+        cls.ruby = Product.objects.create(name='Ruby Ring', category=cls.rings, price=100, stock=3,
+                                          is_featured=True, description='Ring')
+        Product.objects.create(name='Rose Ring', category=cls.rings, price=120, description='Ring')
+
+    def setUp(self):
+        cache.clear()
+        catalog_cache.reset_stats()
+
+    def test_repeat_views_are_served_from_the_cache(self):
+        self.client.get(reverse('shop:home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('shop:home'))
+        self.assertEqual([product.name for product in response.context['featured_products']], ['Ruby Ring'])
+
+        self.client.get(reverse('shop:product_detail', args=[self.ruby.slug]))
+        # Only the fresh stock read remains.
+        with self.assertNumQueries(1):
+            self.client.get(reverse('shop:product_detail', args=[self.ruby.slug]))
+
+        stats = catalog_cache.cache_stats()
+        self.assertEqual(stats['featured'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+        self.assertEqual(stats['related']['hits'], 1)
+
+    def test_saving_a_product_invalidates_cached_pages_and_cards(self):
+        self.client.get(reverse('shop:shop'))
+        self.ruby.name = 'Ruby Band'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ruby.save()
+
+        self.assertContains(self.client.get(reverse('shop:shop')), 'Ruby Band')
+        self.assertContains(self.client.get(reverse('shop:home')), 'Ruby Band')
+
+    def test_version_is_bumped_only_after_the_save_commits(self):
+        version = catalog_cache.catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.ruby.name = 'Ruby Band'
+            self.ruby.save()
+            # A read before the commit still caches under the old version.
+            self.assertEqual(catalog_cache.catalog_version(), version)
+
+        callbacks[0]()
+        self.assertGreater(catalog_cache.catalog_version(), version)
+
+    def test_system_check_requires_a_shared_cache(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}
+        with override_settings(CACHE_REQUIRE_SHARED=True, CACHES=local):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['shop.E001'])
+        for backend in ['filebased.FileBasedCache', 'db.DatabaseCache']:
+            caches = {'default': {'BACKEND': f'django.core.cache.backends.{backend}'}}
+            with self.subTest(backend=backend), override_settings(CACHE_REQUIRE_SHARED=True, CACHES=caches):
+                self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['shop.E002'])
+        with override_settings(CACHE_REQUIRE_SHARED=True, CACHES=shared):
+            self.assertEqual(checks.check_shared_cache(None), [])
+        with override_settings(CACHE_REQUIRE_SHARED=False, CACHES=local):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+    def test_detail_stock_is_not_cached(self):
+        self.client.get(reverse('shop:product_detail', args=[self.ruby.slug]))
+        Product.objects.filter(pk=self.ruby.pk).update(stock=0)
+
+        self.assertContains(self.client.get(reverse('shop:product_detail', args=[self.ruby.slug])), 'Out of Stock')
+        self.assertEqual(self.client.get(reverse('shop:product_detail', args=['missing'])).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ruby = make_products(2, stock=3)[0]
+
+    def setUp(self):
+        cache.clear()
+        conditional.reset_stats()
+
+    def revalidate(self, url, **params):
+        first = self.client.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        return lambda: self.client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_product_page_is_a_304_from_one_query(self):
+        again = self.revalidate(reverse('shop:product_detail', args=[self.ruby.slug]))
+
+        with self.assertNumQueries(1):
+            response = again()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        Product.objects.filter(pk=self.ruby.pk).update(stock=1)
+        self.assertEqual(again().status_code, 200)
+
+    def test_listing_follows_catalog_changes_and_filters(self):
+        again = self.revalidate(reverse('shop:shop'), category=self.ruby.category.slug)
+        self.assertEqual(again().status_code, 304)
+
+        self.ruby.name = 'Ruby Band'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ruby.save()
+        self.assertContains(again(), 'Ruby Band')
+
+        stats = conditional.conditional_stats()['shop']
+        self.assertEqual((stats['full'], stats['not_modified'], stats['not_modified_rate']), (2, 1, 0.333))
+
+    def test_page_etag_follows_the_header_badges(self):
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'pass12345')
+        self.client.force_login(user)
+        again = self.revalidate(reverse('shop:home'))
+        self.assertEqual(again().status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_cart_operations(user, [{'op': 'add', 'product_id': self.ruby.id}])
+        self.assertContains(again(), '<span class="badge" id="cart-count">1</span>', html=True)
+
+    def test_cart_api_etag_follows_the_cart_rows(self):
+        user = User.objects.create_user('shopper', 'shopper@example.com', 'pass12345')
+        self.client.force_login(user)
+        again = self.revalidate(reverse('shop:get_cart_items'))
+        self.assertEqual(again().status_code, 304)
+
+        # Written without going through this process's cache, as another worker would.
+        CartItem.objects.create(user=user, product=self.ruby)
+        self.assertEqual(len(again().json()['items']), 1)
+
+        again = self.revalidate(reverse('shop:get_cart_items'))
+        CartItem.objects.filter(user=user).update(quantity=3)
+        self.assertEqual(again().json()['items'][0]['quantity'], 3)
+
+
+class HeaderStateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.products = make_products(3)
+
+    def post(self, name, product, **data):
+        return self.client.post(reverse(name), json.dumps({'product_id': product.id, **data}),
+                                content_type='application/json').json()
+
+    def test_counts_are_cached_and_kept_current_by_writes(self):
+        WishlistItem.objects.create(user=self.user, product=self.products[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(counters.header_counts(self.user), {'cart_count': 0, 'wishlist_count': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.post('shop:add_to_cart', self.products[0])['cart_count'], 1)
+            self.assertEqual(self.post('shop:add_to_cart', self.products[0])['cart_count'], 1)
+            self.assertEqual(self.post('shop:add_to_cart', self.products[1])['cart_count'], 2)
+        self.assertEqual(self.post('shop:add_to_wishlist', self.products[0])['wishlist_count'], 0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.header_counts(self.user), {'cart_count': 2, 'wishlist_count': 0})
+
+    def test_header_state_endpoint_and_rendered_badges(self):
+        CartItem.objects.create(user=self.user, product=self.products[0])
+
+        self.assertEqual(self.client.get(reverse('shop:header_state')).json(), {'cart_count': 1, 'wishlist_count': 0})
+        self.assertContains(self.client.get(reverse('shop:home')), '<span class="badge" id="cart-count">1</span>', html=True)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('shop:header_state')).json(), {'cart_count': 0, 'wishlist_count': 0})
+
+    async def test_async_endpoints_under_the_async_client(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(reverse('shop:add_to_cart'), {'product_id': self.products[0].id, 'quantity': 2},
+                                                content_type='application/json')
+        self.assertEqual(response.json()['cart_count'], 1)
+        self.assertEqual(await CartItem.objects.filter(user=self.user).values_list('quantity', flat=True).aget(), 2)
+
+        response = await self.async_client.post(reverse('shop:add_to_cart'), {'product_id': 0},
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        for body in [{'product_id': self.products[0].id, 'quantity': 0},
+                     {'product_id': self.products[0].id, 'quantity': 'two'},
+                     {'product_id': self.products[0].id, 'quantity': 10 ** 20},
+                     {'product_id': self.products[0].id, 'quantity': MAX_QUANTITY - 1}, {'quantity': 1}, [1]]:
+            response = await self.async_client.post(reverse('shop:add_to_cart'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+        for body in ['{"product_id": ', [1], {}, {'product_id': 'ring'}]:
+            response = await self.async_client.post(reverse('shop:add_to_wishlist'), body,
+                                                    content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+        self.assertEqual((await self.async_client.get(reverse('shop:header_state'))).json(),
+                         {'cart_count': 1, 'wishlist_count': 0})
+        self.assertEqual(len((await self.async_client.get(reverse('shop:get_cart_items'))).json()['items']), 1)
+
+    def test_checkout_resets_the_cart_count(self):
+        CartItem.objects.create(user=self.user, product=self.products[0])
+        counters.header_counts(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+
+        self.assertEqual(counters.header_counts(self.user)['cart_count'], 0)
+
+
+class CartOperationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.products = make_products(3)
+
+    def quantities(self):
+        return dict(self.user.cart_items.values_list('product_id', 'quantity'))
+
+    def test_operations_fold_in_order_into_a_fixed_number_of_queries(self):
+        a, b, c = self.products
+        CartItem.objects.create(user=self.user, product=a, quantity=2)
+        CartItem.objects.create(user=self.user, product=c, quantity=1)
+
+        # availability check, savepoint, delete, upsert, insert-ignore, increment, read back, release
+        with self.assertNumQueries(8):
+            items = apply_cart_operations(self.user, [
+                {'op': 'add', 'product_id': a.id, 'quantity': 3},
+                {'op': 'set', 'product_id': b.id, 'quantity': 2},
+                {'op': 'add', 'product_id': b.id},
+                {'op': 'remove', 'product_id': c.id},
+            ])
+
+        self.assertEqual(len(items), 2)
+        self.assertEqual(self.quantities(), {a.id: 5, b.id: 3})
+
+    def test_invalid_batches_change_nothing(self):
+        hidden = Product.objects.create(name='Hidden', category=self.products[0].category, price=1,
+                                        is_available=False, description='Hidden')
+        for operations in ([{'op': 'add', 'product_id': hidden.id}],
+                           [{'op': 'add', 'product_id': self.products[0].id, 'quantity': 0}],
+                           [{'op': 'swap', 'product_id': self.products[0].id}]):
+            with self.assertRaises(InvalidCartOperation):
+                apply_cart_operations(self.user, operations)
+        self.assertEqual(self.quantities(), {})
+
+    def test_endpoint_returns_cart_state(self):
+        response = self.client.post(reverse('shop:cart_operations'), json.dumps({'operations': [
+            {'op': 'add', 'product_id': self.products[0].id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.products[0].id},
+        ]}), content_type='application/json')
+
+        data = response.json()
+        self.assertEqual(data['cart_count'], 1)
+        self.assertEqual(data['items'][0]['quantity'], 3)
+        bad = self.client.post(reverse('shop:cart_operations'), '{"operations": 1}', content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+
+    def test_lines_cannot_pass_the_quantity_limit(self):
+        a, b, _c = self.products
+        CartItem.objects.create(user=self.user, product=a, quantity=MAX_QUANTITY - 1)
+        for operations in ([{'op': 'set', 'product_id': b.id, 'quantity': 10 ** 12}],
+                           [{'op': 'add', 'product_id': b.id, 'quantity': 2 ** 31}],
+                           [{'op': 'add', 'product_id': b.id, 'quantity': MAX_QUANTITY}] * 2,
+                           [{'op': 'add', 'product_id': b.id}, {'op': 'add', 'product_id': a.id, 'quantity': 2}]):
+            response = self.client.post(reverse('shop:cart_operations'), json.dumps({'operations': operations}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.quantities(), {a.id: MAX_QUANTITY - 1})
+        apply_cart_operations(self.user, [{'op': 'add', 'product_id': a.id}])
+        self.assertEqual(self.quantities(), {a.id: MAX_QUANTITY})
+
+
+class GuestMergeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'pass12345')
+        self.products = make_products(3)
+
+    def merge(self, cart, wishlist):
+        return self.client.post(reverse('shop:merge_guest'), json.dumps({'cart': cart, 'wishlist': wishlist}),
+                                content_type='application/json').json()
+
+    def test_login_enables_one_merge_into_the_existing_rows(self):
+        a, b, c = self.products
+        CartItem.objects.create(user=self.user, product=a, quantity=1)
+        WishlistItem.objects.create(user=self.user, product=b)
+        Product.objects.filter(pk=c.pk).update(is_available=False)
+        self.client.post(reverse('shop:login'), {'username': 'shopper', 'password': 'pass12345'})
+
+        data = self.merge(
+            [{'id': a.id, 'quantity': 2}, {'id': b.id, 'quantity': 1}, {'id': c.id, 'quantity': 1}, {'id': 'junk'}],
+            [{'id': a.id}, {'id': b.id}, {'id': c.id}],
+        )
+
+        self.assertTrue(data['merged'])
+        self.assertEqual((data['cart_count'], data['wishlist_count']), (2, 2))
+        self.assertEqual(dict(self.user.cart_items.values_list('product_id', 'quantity')), {a.id: 3, b.id: 1})
+        self.assertFalse(self.merge([{'id': a.id, 'quantity': 5}], [])['merged'])
+        self.assertEqual(self.user.cart_items.get(product=a).quantity, 3)
+
+    def test_guest_quantities_are_capped(self):
+        a, b, _c = self.products
+        CartItem.objects.create(user=self.user, product=a, quantity=MAX_QUANTITY - 1)
+        self.client.post(reverse('shop:login'), {'username': 'shopper', 'password': 'pass12345'})
+
+        self.merge([{'id': a.id, 'quantity': 5}, {'id': b.id, 'quantity': 10 ** 20}, {'id': b.id, 'quantity': 2}], [])
+
+        self.assertEqual(dict(self.user.cart_items.values_list('product_id', 'quantity')),
+                         {a.id: MAX_QUANTITY, b.id: MAX_QUANTITY})
+
+    def test_malformed_body_is_a_bad_request(self):
+        self.client.post(reverse('shop:login'), {'username': 'shopper', 'password': 'pass12345'})
+        for body in ('{"cart": [', '[1]'):
+            response = self.client.post(reverse('shop:merge_guest'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+        self.assertTrue(self.merge([], [])['merged'])
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b, cls.c, cls.d = make_products(4)
+        cls.e = make_products(1)[0]
+
+    def setUp(self):
+        cache.clear()
+
+    def order(self, *products, age=timedelta(hours=1)):
+        order = Order.objects.create(first_name='A', last_name='B', email='a@example.com', phone='1', address='1',
+                                     city='C', state='S', postal_code='0', country='K', total_amount=Decimal('1.00'))
+        OrderItem.objects.bulk_create([OrderItem(order=order, product=product, price=product.price) for product in products])
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - age)
+        return order
+
+    def test_top_partners_are_ranked_and_topped_up_from_the_category(self):
+        self.order(self.a, self.b)
+        self.order(self.a, self.b, self.c)
+        self.order(self.a, self.e)
+
+        self.assertEqual(recommendations.update_recommendations(), {'orders': 3, 'products': 4})
+        with self.assertNumQueries(2):
+            related = recommendations.related_products(self.a)
+        self.assertEqual(related, [self.b, self.c, self.e, self.d])
+        self.assertEqual(recommendations.related_products(self.e), [self.a])
+
+    def test_runs_only_process_new_settled_orders(self):
+        self.order(self.a, self.b)
+        self.order(self.a, self.b)
+        recommendations.update_recommendations()
+
+        self.order(self.a, self.c)
+        self.order(self.a, self.c)
+        self.order(self.a, self.c)
+        self.order(self.a, self.d, age=timedelta(0))
+
+        self.assertEqual(recommendations.update_recommendations(), {'orders': 3, 'products': 2})
+        self.assertEqual(
+            list(Recommendation.objects.filter(product=self.a).values_list('recommended', 'orders')),
+            [(self.c.id, 3), (self.b.id, 2)],
+        )
+        self.assertEqual(recommendations.update_recommendations(), {'orders': 0, 'products': 0})
+
+        recommendations.update_recommendations(full=True)
+        self.assertEqual(CoPurchase.objects.get(product=self.a, other=self.c).orders, 3)
+
+    def test_products_without_history_use_the_category(self):
+        with self.assertNumQueries(2):
+            self.assertCountEqual(recommendations.related_products(self.d), [self.a, self.b, self.c])
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.ring, self.band = make_products(2, stock=10)
+        self.chain = make_products(1, stock=10)[0]
+
+    def checkout(self, *lines):
+        CartItem.objects.bulk_create([CartItem(user=self.user, product=product, quantity=quantity)
+                                      for product, quantity in lines])
+        self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+        return Order.objects.latest('id')
+
+    def snapshot(self):
+        return (
+            list(DailySales.objects.values_list('date', 'orders', 'units', 'revenue')),
+            sorted(DailyProductSales.objects.values_list('date', 'product_id', 'orders', 'units', 'revenue')),
+            sorted(DailyCategorySales.objects.values_list('date', 'category_id', 'orders', 'units', 'revenue')),
+        )
+
+    def test_checkout_and_status_changes_keep_rollups_current(self):
+        first = self.checkout((self.ring, 2), (self.chain, 1))
+        self.checkout((self.ring, 1), (self.band, 1))
+
+        day = DailySales.objects.get()
+        self.assertEqual((day.orders, day.units), (2, 5))
+        self.assertEqual(day.revenue, self.ring.price * 3 + self.band.price + self.chain.price)
+        self.assertEqual(DailyProductSales.objects.get(product=self.ring).orders, 2)
+        self.assertEqual(DailyCategorySales.objects.get(category=self.ring.category).units, 4)
+
+        first.status = 'cancelled'
+        first.save()
+        self.assertEqual(DailySales.objects.get().orders, 1)
+        self.assertEqual(DailyCategorySales.objects.get(category=self.chain.category).units, 0)
+
+        incremental = self.snapshot()
+        call_command('rebuild_sales_rollups', stdout=io.StringIO())
+        rebuilt = self.snapshot()
+        # The rebuild drops rows the cancellation zeroed out; everything else matches.
+        self.assertEqual(rebuilt[0], incremental[0])
+        self.assertEqual(rebuilt[1], [row for row in incremental[1] if row[2]])
+
+        first.status = 'processing'
+        first.save()
+        first.delete()
+        self.assertEqual(DailySales.objects.get().orders, 1)
+
+    def test_dashboard_reads_only_the_rollups(self):
+        self.checkout((self.ring, 2))
+        admin_user = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        self.client.force_login(admin_user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:shop_dailysales_changelist'), {'range': 'All time'})
+
+        self.assertContains(response, self.ring.name)
+        self.assertEqual(response.context['report']['totals']['units'], 2)
+        self.assertFalse([query for query in queries if 'shop_order' in query['sql']])
+
+
+class CatalogImportExportTests(TestCase):
+    CSV = (
+        'name,category,price,original_price,stock,is_featured\n'
+        'Opal Ring,Rings,120.00,150,4,yes\n'
+        'Jade Bangle,Bracelets,80,,2,no\n'
+        'Opal Ring,Rings,125.00,150,4,yes\n'
+        'Broken,Rings,cheap,,1,no\n'
+        ',Rings,10,,1,no\n'
+    )
+
+    def run_import(self, text, fmt='csv', **options):
+        return catalog_io.import_catalog(catalog_io.read_rows(io.StringIO(text), fmt), **options)
+
+    def test_csv_import_creates_dedupes_and_reports_bad_rows(self):
+        Category.objects.create(name='Rings')
+
+        stats, errors = self.run_import(self.CSV)
+
+        self.assertEqual((stats['rows'], stats['created'], stats['duplicates'], stats['invalid']), (5, 2, 1, 2))
+        self.assertEqual(stats['categories_created'], 1)
+        self.assertEqual(errors, ["line 5: price is not a number: 'cheap'", 'line 6: missing name'])
+        opal = Product.objects.get(slug='opal-ring')
+        self.assertEqual((opal.price, opal.stock, opal.is_featured), (Decimal('125.00'), 4, True))
+        self.assertEqual(Product.objects.get(slug='jade-bangle').category.name, 'Bracelets')
+
+    def test_oversized_values_are_row_errors(self):
+        long_category = 'Hand Forged Sterling Silver Statement Pieces From Our Coastal Workshop Collection'
+        stats, errors = self.run_import(
+            'name,category,price,original_price\n'
+            f'Coral Cuff,{long_category},120,\n'
+            'Gold Crown,Rings,123456789,\n'
+            'Gold Tiara,Rings,10,100000000\n'
+            'Gold Ring,Rings,99999999.999,\n'
+        )
+
+        self.assertEqual((stats['created'], stats['invalid']), (1, 3))
+        self.assertEqual(errors, ['line 3: price must be less than 100,000,000',
+                                  'line 4: original_price must be less than 100,000,000',
+                                  'line 5: price must be less than 100,000,000'])
+        category = Product.objects.get(slug='coral-cuff').category
+        self.assertEqual(category.slug, slugify(long_category)[:50])
+
+    def test_stock_out_of_range_is_a_row_error(self):
+        stats, errors = self.run_import(
+            'name,category,price,stock\n'
+            'Opal Ring,Rings,10,5\n'
+            'Jade Ring,Rings,10,99999999999999999999999\n'
+            'Onyx Ring,Rings,10,-5\n'
+        )
+
+        self.assertEqual((stats['created'], stats['invalid']), (1, 2))
+        self.assertEqual(errors, ['line 3: stock must be between 0 and 2,147,483,647',
+                                  'line 4: stock must be between 0 and 2,147,483,647'])
+        self.assertEqual(Product.objects.get(slug='opal-ring').stock, 5)
+
+    def test_export_reads_in_id_chunks(self):
+        self.run_import(''.join(['name,category,price\n'] + [f'Ring {i},Rings,{100 + i}\n' for i in range(5)]))
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(catalog_io._export_rows(Product.objects.all(), chunk_size=2))
+
+        self.assertEqual([row['name'] for row in rows], [f'Ring {i}' for i in range(5)])
+        self.assertEqual(len(queries), 4)
+
+    def test_updates_only_touch_the_columns_given(self):
+        self.run_import(self.CSV)
+        stats, _errors = self.run_import('{"name": "Opal Ring", "category": "Rings", "price": "99"}\n', fmt='jsonl')
+
+        self.assertEqual((stats['created'], stats['updated']), (0, 1))
+        opal = Product.objects.get(slug='opal-ring')
+        self.assertEqual((opal.price, opal.stock, opal.original_price), (Decimal('99.00'), 4, Decimal('150.00')))
+
+        stats, _errors = self.run_import('name,category,price\nOpal Ring,Rings,1\n', update_existing=False)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(Product.objects.get(slug='opal-ring').price, Decimal('99.00'))
+
+    def test_queries_grow_with_batches_not_rows(self):
+        rows = ''.join(f'Ring {i},Rings,{100 + i}\n' for i in range(200))
+        with CaptureQueriesContext(connection) as queries:
+            stats, _errors = self.run_import('name,category,price\n' + rows, batch_size=100)
+
+        self.assertEqual(stats['created'], 200)
+        self.assertLess(len(queries), 20)
+
+    def test_export_round_trips_through_import(self):
+        self.run_import(self.CSV)
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                exported = ''.join(catalog_io.export_catalog(fmt))
+                stats, errors = self.run_import(exported, fmt=fmt)
+                self.assertEqual((stats['updated'], stats['created'], errors), (2, 0, []))
+                self.assertEqual(''.join(catalog_io.export_catalog(fmt)), exported)
+
+
+class OrderExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = make_products(3)
+
+    def place(self, count, items=2):
+        for _ in range(count):
+            order = Order.objects.create(first_name='A', last_name='B', email='a@example.com', phone='1', address='1',
+                                         city='C', state='S', postal_code='0', country='K', total_amount=Decimal('1'))
+            OrderItem.objects.bulk_create([OrderItem(order=order, product=product, quantity=2, price=product.price)
+                                           for product in self.products[:items]])
+
+    def export(self, fmt, chunk_size=exports.CHUNK_SIZE):
+        return ''.join(exports.order_lines(Order.objects.all(), fmt, chunk_size))
+
+    def test_queries_depend_on_chunks_not_orders(self):
+        self.place(3)
+        with CaptureQueriesContext(connection) as few:
+            self.export('csv')
+        self.place(30)
+        with CaptureQueriesContext(connection) as many:
+            self.export('csv')
+        with CaptureQueriesContext(connection) as chunked:
+            self.export('jsonl', chunk_size=10)
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(len(chunked), 4 * 2 + 1)
+
+    def test_csv_has_a_row_per_item_and_jsonl_a_line_per_order(self):
+        self.place(2)
+        self.place(1, items=0)
+
+        rows = list(csv.DictReader(io.StringIO(self.export('csv'))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['product_name'], self.products[0].name)
+        self.assertEqual(Decimal(rows[0]['subtotal']), self.products[0].price * 2)
+
+        orders = [json.loads(line) for line in self.export('jsonl').splitlines()]
+        self.assertEqual([len(order['items']) for order in orders], [2, 2, 0])
+
+    def test_admin_action_streams_the_selection(self):
+        self.place(2)
+        self.client.force_login(User.objects.create_superuser('boss', 'boss@example.com', 'pass12345'))
+
+        response = self.client.post(reverse('admin:shop_order_changelist'), {
+            'action': 'export_jsonl', '_selected_action': [Order.objects.earliest('id').pk],
+        })
+
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('boss', 'boss@example.com', 'pass12345')
+        for first, last, email in [('Amani', 'Wanjiru', 'amani@example.com'), ('Baraka', 'Otieno', 'baraka@example.com'),
+                                   ('Chebet', 'Wanjala', 'chebet@example.com'), ('Dalia', 'Mwangi', 'dalia@example.com'),
+                                   ('Eshe', 'Kamau', 'eshe@example.com')]:
+            Order.objects.create(first_name=first, last_name=last, email=email, phone='1', address='1', city='C',
+                                 state='S', postal_code='0', country='K', total_amount=Decimal('1'))
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, query='', **params):
+        return self.client.get(reverse('admin:shop_order_changelist') + query, params).context['cl']
+
+    def test_orders_page_by_cursor(self):
+        seen = []
+        query = ''
+        with mock.patch.object(admin.site._registry[Order], 'list_per_page', 2):
+            for _page in range(3):
+                cl = self.changelist(query)
+                seen += [order.pk for order in cl.result_list]
+                self.assertNotIn('OFFSET', str(cl.result_list.query))
+                query = cl.next_page_url
+                if query is None:
+                    break
+
+        self.assertIsNone(query)
+        self.assertEqual(seen, list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True)))
+
+    def test_sorting_by_a_column_falls_back_to_numbered_pages(self):
+        with mock.patch.object(admin.site._registry[Order], 'list_per_page', 2):
+            cl = self.changelist(o='1')
+        self.assertFalse(cl.uses_keyset)
+        self.assertIsNone(cl.next_page_url)
+
+    def test_counts_are_estimated_or_capped(self):
+        with mock.patch.object(changelists, 'estimated_row_count', return_value=2_500_000):
+            paginator = changelists.EstimatedCountPaginator(Order.objects.all(), 100)
+            self.assertEqual(paginator.count, 2_500_000)
+            self.assertEqual(paginator.count_label, 'about 2,500,000')
+
+        with mock.patch.object(changelists, 'COUNT_LIMIT', 3):
+            paginator = changelists.EstimatedCountPaginator(Order.objects.filter(status='pending'), 100)
+            self.assertEqual(paginator.count_label, '3+')
+        self.assertEqual(changelists.EstimatedCountPaginator(Order.objects.all(), 100).count_label, '5')
+
+    def test_search_uses_one_indexed_column_per_kind_of_term(self):
+        order = Order.objects.get(email='baraka@example.com')
+
+        self.assertEqual([o.pk for o in self.changelist(q='BARAKA@example.com').result_list], [order.pk])
+        self.assertEqual([o.pk for o in self.changelist(q=order.order_number).result_list], [order.pk])
+        self.assertEqual([o.pk for o in self.changelist(q=order.order_number[3:]).result_list], [order.pk])
+        self.assertEqual({o.last_name for o in self.changelist(q='wanj').result_list}, {'Wanjiru', 'Wanjala'})
+        self.assertEqual([o.last_name for o in self.changelist(q='chebet wanj').result_list], ['Wanjala'])
+
+    def test_product_list_edits_issue_one_update_per_field(self):
+        products = make_products(3)
+        data = {'form-TOTAL_FORMS': '3', 'form-INITIAL_FORMS': '3', '_save': 'Save'}
+        for i, product in enumerate(products):
+            data.update({f'form-{i}-id': product.pk, f'form-{i}-stock': 10 + i, f'form-{i}-price': product.price,
+                         f'form-{i}-is_available': 'on'})
+        data['form-0-price'] = '5.00'
+        data['form-1-price'] = '6.00'
+        version = catalog_cache.catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('admin:shop_product_changelist'), data)
+
+        self.assertEqual(response.status_code, 302)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "shop_product"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual([(p.stock, p.price) for p in Product.objects.filter(pk__in=[p.pk for p in products])
+                          .order_by('id')], [(10, Decimal('5.00')), (11, Decimal('6.00')), (12, products[2].price)])
+        self.assertEqual(LogEntry.objects.count(), 3)
+        self.assertNotEqual(catalog_cache.catalog_version(), version)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.category = Category.objects.create(name='Rings')
+
+    def upload(self, size=(1600, 1200)):
+        buffer = io.BytesIO()
+        Image.effect_noise(size, 64).convert('RGB').save(buffer, 'PNG')
+        return SimpleUploadedFile('ring.png', buffer.getvalue(), content_type='image/png')
+
+    def test_saving_an_image_builds_smaller_webp_and_jpeg_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Ruby Ring', category=self.category, price=100,
+                                             description='Ring', image=self.upload())
+
+        product.refresh_from_db()
+        variants = images.variants(product)
+        self.assertEqual([variant['width'] for variant in variants], list(images.VARIANT_WIDTHS))
+        self.assertLess(variants[0]['webp_bytes'], product.image_variants['original_bytes'])
+        self.assertIn('320w', images.srcset(product, 'webp'))
+
+        response = self.client.get(reverse('shop:shop'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertGreater(int(response['X-Image-Bytes-Saved']), 0)
+
+    def test_replacing_the_image_deletes_the_old_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Ruby Ring', category=self.category, price=100,
+                                             description='Ring', image=self.upload(size=(400, 300)))
+        product.refresh_from_db()
+        old_files = [variant['jpeg'] for variant in images.variants(product)]
+        self.assertTrue(all(default_storage.exists(name) for name in old_files))
+
+        product.image = SimpleUploadedFile('band.png', self.upload(size=(400, 300)).read(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        product.refresh_from_db()
+        self.assertFalse(any(default_storage.exists(name) for name in old_files))
+        self.assertTrue(all(default_storage.exists(variant['jpeg']) for variant in images.variants(product)))
+
+    def test_decompression_bomb_is_logged_not_raised(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000), self.assertLogs(images.logger, 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.create(name='Ruby Ring', category=self.category, price=100,
+                                                 description='Ring', image=self.upload(size=(400, 300)))
+
+        product.refresh_from_db()
+        self.assertEqual(images.variants(product), [])
+
+    def test_backfill_command_processes_products_without_variants(self):
+        product = Product.objects.create(name='Ruby Ring', category=self.category, price=100,
+                                         description='Ring', image=self.upload(size=(200, 100)))
+        self.assertEqual(images.variants(product), [])
+
+        output = io.StringIO()
+        call_command('build_image_variants', stdout=output)
+
+        product.refresh_from_db()
+        # Never upscaled: a 200px original yields a single 200px variant.
+        self.assertEqual([variant['width'] for variant in images.variants(product)], [200])
+        self.assertIn('Built variants for 1 product(s)', output.getvalue())
+
+
+# (url name, method) -> the most queries one request may run with a cold
+# cache. QueryBudgetTests runs each at several data sizes; the count must
+# stay within budget and must not grow with the data.
+QUERY_BUDGETS = {
+    ('home', 'GET'): 5,
+    ('shop', 'GET'): 7,
+    ('product_detail', 'GET'): 7,
+    ('cart', 'GET'): 3,
+    ('wishlist', 'GET'): 3,
+    ('checkout', 'GET'): 4,
+    ('checkout', 'POST'): 32,
+    ('my_account', 'GET'): 5,
+    ('contact', 'GET'): 3,
+    ('contact', 'POST'): 2,
+    ('why_choose_us', 'GET'): 3,
+    ('login', 'GET'): 3,
+    ('login', 'POST'): 6,
+    ('signup', 'GET'): 3,
+    ('signup', 'POST'): 11,
+    ('logout', 'GET'): 4,
+    ('add_to_cart', 'POST'): 6,
+    ('cart_operations', 'POST'): 7,
+    ('merge_guest', 'POST'): 15,
+    ('add_to_wishlist', 'POST'): 8,
+    ('get_cart_count', 'GET'): 3,
+    ('get_wishlist_count', 'GET'): 3,
+    ('header_state', 'GET'): 3,
+    ('get_cart_items', 'GET'): 4,
+    ('products_page', 'GET'): 4,
+    ('search', 'GET'): 2,
+    ('autocomplete', 'GET'): 2,
+    ('reserve_stock', 'POST'): 12,
+    ('cache_stats', 'GET'): 2,
+}
+
+
+class QueryBudgetTests(TestCase):
+    # Products, orders, lines per order, cart and wishlist lines.
+    SIZES = (1, 4, 12)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', 'budget@example.com', 'pass12345', first_name='Budget')
+        cls.category = Category.objects.create(name='Budget')
+
+    def grow(self, size):
+        """``size`` products plus a spare, ``size`` orders of ``size`` lines each."""
+        products = list(Product.objects.filter(category=self.category).order_by('id'))
+        products += make_products(size + 1 - len(products), self.category, stock=1000)
+        Product.objects.filter(category=self.category).update(is_featured=True)
+        Order.objects.filter(user=self.user).delete()
+        for _ in range(size):
+            order = Order.objects.create(user=self.user, total_amount=Decimal('1'), **CHECKOUT_FORM)
+            OrderItem.objects.bulk_create([OrderItem(order=order, product=product, quantity=1, price=product.price)
+                                           for product in products[:size]])
+        return products
+
+    def reset(self, lines):
+        """A fresh signed-in client with ``lines`` in the cart and wishlist, and every cache cold."""
+        CartItem.objects.filter(user=self.user).delete()
+        CartItem.objects.bulk_create([CartItem(user=self.user, product=product) for product in lines])
+        WishlistItem.objects.filter(user=self.user).delete()
+        WishlistItem.objects.bulk_create([WishlistItem(user=self.user, product=product) for product in lines])
+        StockReservation.objects.filter(user=self.user).delete()
+        self.client = self.client_class()
+        self.client.force_login(self.user)
+        session = self.client.session
+        session[GUEST_MERGE_SESSION_KEY] = True
+        session.save()
+        cache.clear()
+        search.reset_index()
+        autocomplete.reset_index()
+        order_numbers.discard_block()
+
+    def requests(self, products, size):
+        lines, spare = products[:size], products[size]
+        guest = [{'id': product.id, 'quantity': 1} for product in lines]
+
+        def get(name, *args, **params):
+            return lambda: self.client.get(reverse(f'shop:{name}', args=args), params)
+
+        def post(name, data):
+            return lambda: self.client.post(reverse(f'shop:{name}'), data)
+
+        def post_json(name, data):
+            return lambda: self.client.post(reverse(f'shop:{name}'), json.dumps(data), content_type='application/json')
+
+        return {
+            ('home', 'GET'): get('home'),
+            ('shop', 'GET'): get('shop', category=self.category.slug, sort='price_low'),
+            ('product_detail', 'GET'): get('product_detail', lines[0].slug),
+            ('cart', 'GET'): get('cart'),
+            ('wishlist', 'GET'): get('wishlist'),
+            ('checkout', 'GET'): get('checkout'),
+            ('checkout', 'POST'): post('checkout', CHECKOUT_FORM),
+            ('my_account', 'GET'): get('my_account'),
+            ('contact', 'GET'): get('contact'),
+            ('contact', 'POST'): post('contact', {'name': 'A', 'email': 'a@example.com', 'message': 'Hello'}),
+            ('why_choose_us', 'GET'): get('why_choose_us'),
+            ('login', 'GET'): get('login'),
+            ('login', 'POST'): post('login', {'username': 'budget', 'password': 'pass12345'}),
+            ('signup', 'GET'): get('signup'),
+            ('signup', 'POST'): post('signup', {
+                'username': f'newcomer{size}', 'first_name': 'New', 'last_name': 'Comer',
+                'email': f'newcomer{size}@example.com', 'password1': 'Gold-ring-2024', 'password2': 'Gold-ring-2024',
+            }),
+            ('logout', 'GET'): get('logout'),
+            ('add_to_cart', 'POST'): post_json('add_to_cart', {'product_id': spare.id, 'quantity': 1}),
+            ('cart_operations', 'POST'): post_json('cart_operations', {
+                'operations': [{'op': 'set', 'product_id': product.id, 'quantity': 2} for product in lines],
+            }),
+            ('merge_guest', 'POST'): post_json('merge_guest', {'cart': guest, 'wishlist': guest}),
+            ('add_to_wishlist', 'POST'): post_json('add_to_wishlist', {'product_id': spare.id}),
+            ('get_cart_count', 'GET'): get('get_cart_count'),
+            ('get_wishlist_count', 'GET'): get('get_wishlist_count'),
+            ('header_state', 'GET'): get('header_state'),
+            ('get_cart_items', 'GET'): get('get_cart_items'),
+            ('products_page', 'GET'): get('products_page', category=self.category.slug),
+            ('search', 'GET'): get('search', q='product'),
+            ('autocomplete', 'GET'): get('autocomplete', q='prod'),
+            ('reserve_stock', 'POST'): post_json('reserve_stock', {}),
+            ('cache_stats', 'GET'): get('cache_stats'),
+        }
+
+    def test_every_url_has_a_budget(self):
+        from .urls import urlpatterns
+        self.assertEqual({pattern.name for pattern in urlpatterns}, {name for name, _method in QUERY_BUDGETS})
+
+    def test_query_counts_stay_within_budget_and_do_not_grow(self):
+        counts = {key: [] for key in QUERY_BUDGETS}
+        for size in self.SIZES:
+            products = self.grow(size)
+            for key, send in self.requests(products, size).items():
+                self.reset(products[:size])
+                with CaptureQueriesContext(connection) as queries:
+                    response = send()
+                self.assertLess(response.status_code, 400, key)
+                counts[key].append(len(queries))
+
+        for key, budget in QUERY_BUDGETS.items():
+            with self.subTest(url=key):
+                self.assertLessEqual(max(counts[key]), budget)
+                self.assertEqual(len(set(counts[key])), 1, f'query count grows with data: {counts[key]}')
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('amani', 'amani@example.com', 'pass12345')
+        cls.products = make_products(3)
+
+    def timings(self, response):
+        return dict(
+            (metric.split(';')[0], metric) for metric in response['Server-Timing'].split(', ')
+        )
+
+    def test_pages_report_queries_and_template_time(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shop:home'))
+
+        metrics = self.timings(response)
+        self.assertIn(f'desc="{len(queries)} queries"', metrics['db'])
+        self.assertIn('tpl', metrics)
+        self.assertIn('total', metrics)
+        self.assertNotIn('repeat', metrics)
+
+    def test_checkout_reports_mail_time(self):
+        self.client.force_login(self.user)
+        CartItem.objects.create(user=self.user, product=self.products[0])
+
+        response = self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+
+        self.assertIn('mail', self.timings(response))
+
+    async def test_async_views_count_their_queries(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('shop:header_state'))
+        self.assertNotIn('desc="0 queries"', self.timings(response)['db'])
+
+    def test_repeated_queries_are_flagged_and_logged(self):
+        def view(request):
+            for product in self.products * 2:
+                Product.objects.filter(pk=product.pk).exists()
+            return HttpResponse()
+
+        with self.assertLogs('adorn_jewellery.timing', 'WARNING') as logs:
+            response = timing.RequestTimingMiddleware(view)(RequestFactory().get('/loop/'))
+
+        self.assertEqual(self.timings(response)['repeat'], 'repeat;desc="same query 6x"')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['queries'], record['repeats']), ('/loop/', 6, 6))
+        self.assertIn('shop_product', record['repeated_sql'])
+
+
+class StaticAssetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'adorn_jewellery.static_assets.CompressedManifestStaticFilesStorage'},
+        }
+        with override_settings(STATIC_ROOT=cls.static_root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            cls.assets = StaticAssets()
+            cls.css_url = staticfiles_storage.url('css/style.css')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.static_root)
+        super().tearDownClass()
+
+    def get(self, path, **headers):
+        captured = {}
+
+        def start_response(status, response_headers):
+            captured['status'], captured['headers'] = status, dict(response_headers)
+
+        def django_app(environ, start_response):
+            start_response('404 Not Found', [])
+            return [b'django']
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, **headers}
+        body = b''.join(StaticWSGIHandler(django_app, self.assets)(environ, start_response))
+        return captured['status'], captured['headers'], body
+
+    def test_hashed_assets_are_precompressed_and_cached_forever(self):
+        self.assertRegex(self.css_url, r'/static/css/style\.[0-9a-f]{12}\.css$')
+
+        status, headers, body = self.get(self.css_url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertIn(b'.product-card', gzip.decompress(body))
+
+        status, plain_headers, plain = self.get(self.css_url)
+        self.assertNotIn('Content-Encoding', plain_headers)
+        self.assertEqual(plain, gzip.decompress(body))
+        self.assertNotEqual(plain_headers['ETag'], headers['ETag'])
+
+    def test_q_values_are_honoured(self):
+        def encoding(accept):
+            return self.get(self.css_url, HTTP_ACCEPT_ENCODING=accept)[1].get('Content-Encoding')
+
+        self.assertIsNone(encoding('gzip;q=0'))
+        self.assertIsNone(encoding('*;q=0'))
+        self.assertIsNone(encoding('gzip;q=oops'))
+        self.assertEqual(encoding('br;q=0, GZIP; Q=0.5'), 'gzip')
+        self.assertEqual(encoding('identity, *;q=0.1, br;q=0'), 'gzip')
+
+    def test_revalidation_and_fallthrough(self):
+        _status, headers, _body = self.get(self.css_url, HTTP_ACCEPT_ENCODING='gzip')
+        status, _headers, body = self.get(self.css_url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+        # Unhashed names are still served, with a short lifetime.
+        _status, headers, _body = self.get('/static/css/style.css')
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.get('/shop/')[2], b'django')
+
+    def test_asgi_handler_streams_the_same_file(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': self.css_url, 'headers': [(b'accept-encoding', b'gzip')]}
+        asyncio.run(StaticASGIHandler(None, self.assets)(scope, None, send))
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertIn((b'content-encoding', b'gzip'), messages[0]['headers'])
+        self.assertIn(b'.product-card', gzip.decompress(b''.join(m.get('body', b'') for m in messages[1:])))
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'pass12345')
+        self.client.force_login(self.user)
+        self.product = make_products(1, stock=3)[0]
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_checkout_confirms_the_hold_from_the_checkout_page(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=2)
+        self.client.post(reverse('shop:reserve_stock'), '{}', content_type='application/json')
+        self.assertEqual(self.stock(), 1)
+
+        self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+
+        self.assertEqual(self.stock(), 1)
+        reservation = StockReservation.objects.get()
+        self.assertEqual(reservation.status, 'confirmed')
+        self.assertEqual(reservation.order, Order.objects.get())
+
+    def test_reservation_ignores_client_supplied_items(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=1)
+
+        response = self.client.post(reverse('shop:reserve_stock'),
+                                    json.dumps({'items': [{'id': self.product.id, 'quantity': -5}]}),
+                                    content_type='application/json')
+
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(self.stock(), 2)
+
+    def test_last_unit_can_only_be_held_once(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=1)
+        other = User.objects.create_user('rival', 'rival@example.com', 'pass12345')
+
+        inventory.reserve_stock(self.user, {self.product.id: 1})
+        with self.assertRaises(inventory.OutOfStock) as raised:
+            inventory.reserve_stock(other, {self.product.id: 1})
+
+        self.assertEqual(raised.exception.available, {self.product.id: 0})
+        self.assertEqual(self.stock(), 0)
+        self.assertEqual(StockReservation.objects.get().user, self.user)
+
+    def test_checkout_beyond_stock_is_refused(self):
+        CartItem.objects.create(user=self.user, product=self.product, quantity=4)
+        response = self.client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+
+        self.assertRedirects(response, reverse('shop:cart'), fetch_redirect_response=False)
+        self.assertEqual(self.stock(), 3)
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_holds_are_released(self):
+        inventory.reserve_stock(self.user, {self.product.id: 2})
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(inventory.release_expired(), 1)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(StockReservation.objects.get().status, 'released')
+
+
+class OrderNumberTests(TransactionTestCase):
+    def setUp(self):
+        # The counter table is flushed between tests; drop numbers reserved before that.
+        order_numbers.discard_block()
+
+    def test_concurrent_orders_get_unique_increasing_numbers(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('shared-cache in-memory SQLite cannot run concurrent writers')
+
+        def place(i):
+            try:
+                return Order.objects.create(first_name='A', last_name='B', email='a@example.com', phone='1',
+                                            address='1', city='C', state='S', postal_code='0', country='K',
+                                            total_amount=Decimal('1.00')).order_number
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            numbers = list(pool.map(place, range(200)))
+
+        self.assertEqual(len(set(numbers)), 200)
+        self.assertTrue(all(number.startswith('ORD') and len(number) == 10 for number in numbers))
+        # One shared block per process: a single counter update per BLOCK_SIZE orders.
+        self.assertEqual(sorted(numbers), [f'ORD{1000000 + i}' for i in range(200)])
+
+    def test_blocks_never_overlap_between_processes(self):
+        first = order_numbers.next_number()
+        # Another process reserving directly gets the block after ours.
+        other = order_numbers.reserve(order_numbers.BLOCK_SIZE)
+        mine = [first] + [order_numbers.next_number() for _ in range(order_numbers.BLOCK_SIZE)]
+
+        self.assertEqual(other, first + order_numbers.BLOCK_SIZE)
+        self.assertFalse(set(mine) & set(range(other, other + order_numbers.BLOCK_SIZE)))
+        self.assertEqual(len(set(mine)), len(mine))
+
+    def test_numbers_taken_in_a_rolled_back_transaction_are_not_cached(self):
+        try:
+            with transaction.atomic():
+                taken = order_numbers.next_number()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertEqual(order_numbers.next_number(), taken)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('shared-cache in-memory SQLite cannot run concurrent writers')
+        product = make_products(1, stock=5)[0]
+        users = [User.objects.create(username=f'buyer{i}') for i in range(20)]
+        CartItem.objects.bulk_create([CartItem(user=user, product=product) for user in users])
+
+        def place_order(user):
+            client = Client()
+            client.force_login(user)
+            try:
+                client.post(reverse('shop:checkout'), CHECKOUT_FORM)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(place_order, users))
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(Order.objects.values('order_number').distinct().count(), 5)
+        self.assertEqual(StockReservation.objects.filter(status='confirmed').count(), 5)
+
+    def test_parallel_cart_adds_are_not_lost(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('shared-cache in-memory SQLite cannot run concurrent writers')
+        product = make_products(1)[0]
+        user = User.objects.create(username='shopper')
+
+        def add(_):
+            try:
+                apply_cart_operations(user, [{'op': 'add', 'product_id': product.id}])
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(add, range(20)))
+
+        self.assertEqual(CartItem.objects.get(user=user, product=product).quantity, 20)
+
+
+@override_settings(REQUEST_TIMING=True)
+class StorefrontBenchmarkTests(TransactionTestCase):
+    def test_benchmark_reports_every_scenario(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('shared-cache in-memory SQLite cannot run concurrent writers')
+        scenarios = ['home', 'shop_price_low', 'product_detail', 'api_add_to_cart', 'checkout']
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command('benchmark_storefront', products=40, concurrency=2, requests=4, output=output.name,
+                         scenario=scenarios, stdout=io.StringIO(), stderr=io.StringIO())
+            report = json.load(output)
+
+        self.assertEqual(list(report['scenarios']), scenarios)
+        for result in report['scenarios'].values():
+            self.assertEqual((result['requests'], result['errors']), (4, 0))
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(Order.objects.exclude(order_number__startswith='bench-').count(), 2 + 4)
+
+    def test_errors_are_kept_out_of_the_latency_figures(self):
+        result = summarize([(200, 10.0, 3), (302, 20.0, 5), (500, 1.0, 1), (403, 2.0, 0)], elapsed=1)
+
+        self.assertEqual((result['requests'], result['errors'], result['throughput_rps']), (4, 2, 2.0))
+        self.assertEqual((result['p50_ms'], result['p99_ms'], result['queries_per_request']), (10.0, 20.0, 4))
+        self.assertIsNone(summarize([(500, 1.0, 1)], elapsed=1)['p95_ms'])
+
+    def test_checkout_redirects_back_to_the_cart_count_as_errors(self):
+        result = summarize([(200, 10.0, 3), (302, 1.0, 2)], elapsed=1, expected_status=200)
+
+        self.assertEqual((result['errors'], result['throughput_rps'], result['p99_ms']), (1, 1.0, 10.0))
@@ -20,8 +20,16 @@ urlpatterns = [
     path('logout/', views.user_logout, name='logout'),
 
     path('api/add-to-cart/', views.add_to_cart, name='add_to_cart'),
+    path('api/cart/', views.cart_operations, name='cart_operations'),
+    path('api/merge-guest/', views.merge_guest, name='merge_guest'),
     path('api/add-to-wishlist/', views.add_to_wishlist, name='add_to_wishlist'),
     path('api/cart-count/', views.get_cart_count, name='get_cart_count'),
     path('api/wishlist-count/', views.get_wishlist_count, name='get_wishlist_count'),
+    path('api/header-state/', views.header_state, name='header_state'),
     path('api/cart-items/', views.get_cart_items, name='get_cart_items'),
+    path('api/products/', views.products_page, name='products_page'),
+    path('api/search/', views.search_api, name='search'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete'),
+    path('api/reserve-stock/', views.reserve_stock, name='reserve_stock'),
+    path('api/cache-stats/', views.cache_stats, name='cache_stats'),
 ]
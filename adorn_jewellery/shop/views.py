@@ -1,14 +1,17 @@
 # adorn_jewellery/shop/views.py
-from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.http import Http404, JsonResponse
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import AuthenticationForm
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch, Sum
+from decimal import Decimal
 import json
 import sys
 
@@ -30,133 +33,330 @@ if sys.platform.startswith('win'):
         smtplib.SMTP.sendmail = _utf8_sendmail
 
 from .models import Product, Category, Order, OrderItem, ContactMessage, CartItem, WishlistItem
+from . import autocomplete, counters, facets, images, inventory, order_numbers, recommendations, sales
+from .conditional import conditional, conditional_stats
+from . import cache as catalog_cache
+from .cart import (
+    GUEST_MERGE_SESSION_KEY, InvalidCartOperation, UnavailableProduct, aadd_to_cart, apply_cart_operations,
+    merge_guest_state,
+)
 from .forms import SignUpForm
+from .mail import queue_mail
+from .pagination import keyset_page
+from .search import search_products
 
 
 # ────────────────────────────────
 # CART & WISHLIST API
 # ────────────────────────────────
+def _cart_item_data(item):
+    return {
+        'id': item.product.id,
+        'name': item.product.name,
+        'price': float(item.product.price),
+        'quantity': item.quantity,
+        'image': images.thumbnail_url(item.product),
+        'slug': item.product.slug
+    }
+
+
+# The high-frequency cart/wishlist/count endpoints are async so that, under
+# ASGI, a request waiting on the database does not hold a worker thread.
 @login_required
-def add_to_cart(request):
+async def add_to_cart(request):
     if request.method == 'POST':
-        data = json.loads(request.body)
-        product_id = data.get('product_id')
-        quantity = int(data.get('quantity', 1))
-
-        product = get_object_or_404(Product, id=product_id)
-        cart_item, created = CartItem.objects.get_or_create(
-            user=request.user,
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        user = await request.auser()
+        try:
+            data = json.loads(request.body)
+            if not isinstance(data, dict):
+                raise InvalidCartOperation('expected a JSON object')
+            cart_count = await aadd_to_cart(user, data.get('product_id'), data.get('quantity', 1))
+        except UnavailableProduct:
+            raise Http404('No Product matches the given query.')
+        except ValueError as exc:
+            return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+
+        return JsonResponse({'success': True, 'cart_count': cart_count})
+
+    return JsonResponse({'success': False})
+
+
+@login_required
+def cart_operations(request):
+    """Apply a batch of ``{op: add|set|remove, product_id, quantity}`` and return the cart."""
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            operations = data.get('operations') if isinstance(data, dict) else None
+            if not isinstance(operations, list):
+                raise InvalidCartOperation('operations must be a list')
+            items = apply_cart_operations(request.user, operations)
+        except ValueError as exc:
+            return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+
+        return JsonResponse({
+            'success': True,
+            'items': [_cart_item_data(item) for item in items],
+            'cart_count': len(items),
+        })
+
+    return JsonResponse({'success': False})
 
-        return JsonResponse({'success': True, 'cart_count': request.user.cart_items.count()})
+
+@login_required
+def merge_guest(request):
+    """Fold the guest localStorage cart/wishlist into the account, once per login."""
+    if request.method == 'POST':
+        # Parsed first, so a malformed body does not use up the one merge.
+        try:
+            data = json.loads(request.body or '{}')
+            if not isinstance(data, dict):
+                raise InvalidCartOperation('expected a JSON object')
+        except ValueError as exc:
+            return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+        if not request.session.pop(GUEST_MERGE_SESSION_KEY, False):
+            return JsonResponse({'success': True, 'merged': False, **counters.header_counts(request.user)})
+        items = merge_guest_state(request.user, data.get('cart'), data.get('wishlist'))
+        return JsonResponse({
+            'success': True,
+            'merged': True,
+            'items': [_cart_item_data(item) for item in items],
+            'cart_count': len(items),
+            'wishlist_count': request.user.wishlist_items.count(),
+        })
 
     return JsonResponse({'success': False})
 
 
 @login_required
-def get_cart_count(request):
-    count = request.user.cart_items.count() if request.user.is_authenticated else 0
-    return JsonResponse({'cart_count': count})
+async def get_cart_count(request):
+    counts = await counters.aheader_counts(await request.auser())
+    return JsonResponse({'cart_count': counts['cart_count']})
+
+
+async def _cart_validator(request):
+    # The cart rows themselves, read from the database, so whichever worker answers
+    # agrees on the ETag. Prices and images come from the catalog, so a catalog
+    # change invalidates the cart too.
+    user = await request.auser()
+    rows = [row async for row in user.cart_items.order_by('product_id').values_list('product_id', 'quantity')]
+    return [rows, await catalog_cache.acatalog_version()], None
 
 
 @login_required
-def get_cart_items(request):
-    items = request.user.cart_items.select_related('product').all()
-    data = [{
-        'id': item.product.id,
-        'name': item.product.name,
-        'price': float(item.product.price),
-        'quantity': item.quantity,
-        'image': item.product.image.url if item.product.image else '',
-        'slug': item.product.slug
-    } for item in items]
-    return JsonResponse({'items': data})
+@conditional(_cart_validator, page=False)
+async def get_cart_items(request):
+    user = await request.auser()
+    items = [item async for item in user.cart_items.select_related('product')]
+    return JsonResponse({'items': [_cart_item_data(item) for item in items]})
 
 
 @login_required
-def add_to_wishlist(request):
+async def add_to_wishlist(request):
     if request.method == 'POST':
-        data = json.loads(request.body)
-        product_id = data.get('product_id')
-        product = get_object_or_404(Product, id=product_id)
-
-        wishlist_item, created = WishlistItem.objects.get_or_create(
-            user=request.user,
+        try:
+            data = json.loads(request.body)
+            if not isinstance(data, dict):
+                raise InvalidCartOperation('expected a JSON object')
+        except ValueError as exc:
+            return JsonResponse({'success': False, 'error': str(exc)}, status=400)
+        try:
+            product_id = int(data['product_id'])
+        except (KeyError, TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'product_id is required'}, status=400)
+        user = await request.auser()
+        product = await aget_object_or_404(Product, id=product_id)
+
+        wishlist_item, created = await WishlistItem.objects.aget_or_create(
+            user=user,
             product=product
         )
         action = "added" if created else "removed"
         if not created:
-            wishlist_item.delete()
+            await wishlist_item.adelete()
+        await counters.aadjust(user.id, 'wishlist_count', 1 if created else -1)
+        counts = await counters.aheader_counts(user)
 
         return JsonResponse({
             'success': True,
             'action': action,
-            'wishlist_count': request.user.wishlist_items.count()
+            'wishlist_count': counts['wishlist_count']
         })
 
     return JsonResponse({'success': False})
 
 
 @login_required
-def get_wishlist_count(request):
-    count = request.user.wishlist_items.count() if request.user.is_authenticated else 0
-    return JsonResponse({'wishlist_count': count})
+async def get_wishlist_count(request):
+    counts = await counters.aheader_counts(await request.auser())
+    return JsonResponse({'wishlist_count': counts['wishlist_count']})
+
+
+async def header_state(request):
+    """Both header badge counts in one request; zeros for guests."""
+    return JsonResponse(await counters.aheader_counts(await request.auser()))
+
+
+@login_required
+def reserve_stock(request):
+    """Hold the customer's cart stock while they fill in the checkout form."""
+    if request.method == 'POST':
+        quantities = dict(request.user.cart_items.values_list('product_id', 'quantity'))
+        try:
+            reservations = inventory.hold_for_checkout(request.user, quantities)
+        except inventory.OutOfStock as exc:
+            names = dict(Product.objects.filter(id__in=exc.available).values_list('id', 'name'))
+            return JsonResponse({
+                'success': False,
+                'unavailable': [{'id': product_id, 'name': names.get(product_id, ''), 'available': available}
+                                for product_id, available in exc.available.items()],
+            })
+
+        return JsonResponse({
+            'success': True,
+            'expires_at': reservations[0].expires_at.isoformat() if reservations else None,
+        })
+
+    return JsonResponse({'success': False})
 
 
 # ────────────────────────────────
 # MAIN VIEWS
 # ────────────────────────────────
+def _home_validator(request):
+    # Featured products and categories are both cached under the catalog version.
+    return [catalog_cache.catalog_version()], None
+
+
+@conditional(_home_validator)
 def home(request):
-    featured_products = Product.objects.filter(is_featured=True, is_available=True)[:6]
-    categories = Category.objects.all()
     return render(request, 'shop/home.html', {
-        'featured_products': featured_products,
-        'categories': categories,
+        'featured_products': catalog_cache.featured_products(),
+        'categories': catalog_cache.all_categories(),
     })
 
 
+def _filtered_products(request):
+    return Product.objects.filter(is_available=True).select_related('category').filter(
+        facets.filter_q(facets.parse_filters(request.GET))
+    )
+
+
+def _report_image_bytes(response, products):
+    """Tell the client how many image bytes the resized variants saved on this page."""
+    original, served = images.bytes_saved(products)
+    response['X-Image-Bytes-Saved'] = original - served
+    return response
+
+
+def _listing_validator(request):
+    """One aggregate over the filtered set: stock and availability change without a catalog bump."""
+    row = _filtered_products(request).order_by().aggregate(
+        changed=Max('updated_at'), count=Count('id'), stock=Sum('stock'),
+    )
+    return [catalog_cache.catalog_version(), row['count'], row['stock']], row['changed']
+
+
+@conditional(_listing_validator)
 def shop(request):
-    products = Product.objects.filter(is_available=True)
-    categories = Category.objects.all()
-    
-    category_slug = request.GET.get('category')
-    if category_slug:
-        products = products.filter(category__slug=category_slug)
-    min_price = request.GET.get('min_price')
-    max_price = request.GET.get('max_price')
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    sort_by = request.GET.get('sort')
-    if sort_by == 'price_low':
-        products = products.order_by('price')
-    elif sort_by == 'price_high':
-        products = products.order_by('-price')
-    elif sort_by == 'newest':
-        products = products.order_by('-created_at')
-    
-    return render(request, 'shop/shop.html', {
+    query = request.GET.get('q', '').strip()
+    if query:
+        # Search results are ranked by relevance and capped, so they are not paginated.
+        products, next_cursor = search_products(query, _filtered_products(request)), None
+    else:
+        products, next_cursor = keyset_page(_filtered_products(request), request.GET.get('sort'))
+    categories = catalog_cache.all_categories()
+
+    response = render(request, 'shop/shop.html', {
         'products': products,
         'categories': categories,
+        'facets': facets.sidebar(request.GET, categories),
+        'next_cursor': next_cursor,
+        'query': query,
+    })
+    return _report_image_bytes(response, products)
+
+
+@conditional(_listing_validator, page=False)
+def products_page(request):
+    """Next page of the shop grid for infinite scroll; takes the same filters as ``shop``."""
+    products, next_cursor = keyset_page(
+        _filtered_products(request), request.GET.get('sort'), request.GET.get('cursor'),
+    )
+    response = JsonResponse({
+        'products': [{
+            'id': product.id,
+            'name': product.name,
+            'slug': product.slug,
+            'price': float(product.price),
+            'image': images.thumbnail_url(product),
+        } for product in products],
+        'html': render_to_string('shop/includes/product_cards.html', {'products': products}, request),
+        'next_cursor': next_cursor,
+    })
+    return _report_image_bytes(response, products)
+
+
+def search_api(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    products = search_products(query, Product.objects.filter(is_available=True).select_related('category'), limit)
+    return JsonResponse({
+        'query': query,
+        'results': [{
+            'id': product.id,
+            'name': product.name,
+            'slug': product.slug,
+            'category': product.category.name,
+            'price': float(product.price),
+            'image': images.thumbnail_url(product),
+        } for product in products],
+    })
+
+
+@staff_member_required
+def cache_stats(request):
+    """Catalog cache hit/miss and conditional GET counters for this worker process."""
+    return JsonResponse({
+        'version': catalog_cache.catalog_version(),
+        'stats': catalog_cache.cache_stats(),
+        'conditional': conditional_stats(),
     })
 
 
+def autocomplete_api(request):
+    """Typeahead suggestions served from the in-memory prefix index."""
+    query = request.GET.get('q', '')
+    return JsonResponse({'query': query, 'suggestions': autocomplete.suggest(query)})
+
+
+def _product_validator(request, slug):
+    row = Product.objects.filter(slug=slug, is_available=True).values_list('updated_at', 'stock').first()
+    if row is None:
+        return None
+    updated_at, stock = row
+    request.fresh_stock = stock  # saves product_detail reading it again
+    # Related products and the category name come from the catalog cache.
+    return [catalog_cache.catalog_version(), stock], updated_at
+
+
+@conditional(_product_validator)
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, is_available=True)
-    related_products = Product.objects.filter(
-        category=product.category, 
-        is_available=True
-    ).exclude(id=product.id)[:4]
-    
+    product = catalog_cache.product_by_slug(slug)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    # Stock moves with every checkout without a catalog version bump; read it fresh.
+    stock = getattr(request, 'fresh_stock', None)
+    if stock is None:
+        stock = Product.objects.filter(pk=product.pk).values_list('stock', flat=True).first() or 0
+    product.stock = stock
+
     return render(request, 'shop/product_detail.html', {
         'product': product,
-        'related_products': related_products,
+        'related_products': recommendations.related_products(product),
     })
 
 
@@ -173,74 +373,108 @@ def wishlist(request):
 @login_required
 def checkout(request):
     if request.method == 'POST':
-        cart_data = json.loads(request.POST.get('cart_data', '[]'))
-
-        order = Order.objects.create(
-            user=request.user,
-            first_name=request.POST.get('first_name'),
-            last_name=request.POST.get('last_name'),
-            email=request.POST.get('email'),
-            phone=request.POST.get('phone'),
-            address=request.POST.get('address'),
-            city=request.POST.get('city'),
-            state=request.POST.get('state'),
-            postal_code=request.POST.get('postal_code'),
-            country=request.POST.get('country'),
-            total_amount=request.POST.get('total_amount'),
-            notes=request.POST.get('notes', ''),
-        )
+        # The server-side cart is the source of truth; nothing priced comes from the browser.
+        quantities = dict(request.user.cart_items.values_list('product_id', 'quantity'))
+
+        if not quantities:
+            messages.error(request, "Your cart is empty.")
+            return redirect('shop:cart')
+
+        # Taken before the transaction so concurrent checkouts don't queue on the counter row.
+        order_number = order_numbers.next_order_number()
+        try:
+            with transaction.atomic():
+                products = Product.objects.filter(is_available=True).in_bulk(list(quantities))
+                if len(products) != len(quantities):
+                    messages.error(request, "Some items in your cart are no longer available.")
+                    return redirect('shop:cart')
+
+                # Reuses the hold placed when the checkout page opened, or
+                # reserves now; never lets stock go below zero.
+                inventory.claim_for_order(request.user, quantities)
+
+                order = Order.objects.create(
+                    user=request.user,
+                    order_number=order_number,
+                    first_name=request.POST.get('first_name'),
+                    last_name=request.POST.get('last_name'),
+                    email=request.POST.get('email'),
+                    phone=request.POST.get('phone'),
+                    address=request.POST.get('address'),
+                    city=request.POST.get('city'),
+                    state=request.POST.get('state'),
+                    postal_code=request.POST.get('postal_code'),
+                    country=request.POST.get('country'),
+                    total_amount=sum(
+                        (products[product_id].price * quantity for product_id, quantity in quantities.items()),
+                        Decimal('0.00'),
+                    ),
+                    notes=request.POST.get('notes', ''),
+                )
+
+                items = OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product=products[product_id], quantity=quantity,
+                              price=products[product_id].price)
+                    for product_id, quantity in quantities.items()
+                ])
+                inventory.confirm_reservations(request.user, order)
+                sales.record_order(order)
+
+                context = {
+                    'order': order,
+                    'items': items,
+                    'customer_name': f"{order.first_name} {order.last_name}",
+                }
+
+                # Customer Email
+                html_customer = render_to_string('emails/order_confirmation_customer.html', context)
+                text_customer = strip_tags(html_customer)
+                queue_mail(
+                    subject=f"Your Order #{order.order_number} is Confirmed!",
+                    message=text_customer,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[order.email],
+                    html_message=html_customer,
+                )
+
+                # Admin Email
+                html_admin = render_to_string('emails/order_notification_admin.html', context)
+                text_admin = strip_tags(html_admin)
+                queue_mail(
+                    subject=f"NEW ORDER #{order.order_number} – KES {order.total_amount:,}",
+                    message=text_admin,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=[settings.ADMIN_EMAIL],
+                    html_message=html_admin,
+                )
+
+                request.user.cart_items.all().delete()
+                transaction.on_commit(lambda: counters.reset(request.user.id, 'cart_count'))
+        except inventory.OutOfStock as exc:
+            names = ', '.join(products[product_id].name for product_id in exc.available)
+            messages.error(request, f"Sorry, not enough stock left for: {names}.")
+            return redirect('shop:cart')
 
-        for item in cart_data:
-            product = Product.objects.get(id=item['id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item['quantity'],
-                price=product.price
-            )
-            product.stock -= item['quantity']
-            product.save()
-
-        context = {
-            'order': order,
-            'items': order.items.all(),
-            'customer_name': f"{order.first_name} {order.last_name}",
-        }
-
-        # Customer Email
-        html_customer = render_to_string('emails/order_confirmation_customer.html', context)
-        text_customer = strip_tags(html_customer)
-        send_mail(
-            subject=f"Your Order #{order.order_number} is Confirmed!",
-            message=text_customer,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            html_message=html_customer,
-            fail_silently=False,
-        )
-
-        # Admin Email
-        html_admin = render_to_string('emails/order_notification_admin.html', context)
-        text_admin = strip_tags(html_admin)
-        send_mail(
-            subject=f"NEW ORDER #{order.order_number} – KES {order.total_amount:,}",
-            message=text_admin,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.ADMIN_EMAIL],
-            html_message=html_admin,
-            fail_silently=False,
-        )
-
-        request.user.cart_items.all().delete()
         messages.success(request, "Order placed successfully! Check your email.")
         return render(request, 'shop/order_confirmation.html', {'order': order})
 
-    return render(request, 'shop/checkout.html')
+    items = list(request.user.cart_items.select_related('product'))
+    if not items:
+        return redirect('shop:cart')
+    for item in items:
+        item.subtotal = item.product.price * item.quantity
+    return render(request, 'shop/checkout.html', {
+        'items': items,
+        'total': sum((item.subtotal for item in items), Decimal('0.00')),
+    })
 
 
 @login_required
 def my_account(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    # Every order's lines and their products in two queries, however many orders there are.
+    orders = Order.objects.filter(user=request.user).order_by('-created_at').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product')),
+    )
     return render(request, 'shop/my_account.html', {'orders': orders})
 
 
@@ -253,6 +487,7 @@ def user_login(request):
         if form.is_valid():
             user = form.get_user()
             login(request, user)
+            request.session[GUEST_MERGE_SESSION_KEY] = True
             messages.success(request, f"Welcome back, {user.first_name or user.username}!")
             next_url = request.GET.get('next', 'shop:home')
             return redirect(next_url)
@@ -267,6 +502,7 @@ def user_signup(request):
         if form.is_valid():
             user = form.save()
             login(request, user)
+            request.session[GUEST_MERGE_SESSION_KEY] = True
             messages.success(request, "Account created! Welcome to Adorn Jewellery.")
             return redirect('shop:home')
     else:
@@ -299,13 +535,12 @@ def contact(request):
         html_message = render_to_string('emails/contact_message.html', context)
         plain_message = strip_tags(html_message)
 
-        send_mail(
+        queue_mail(
             subject=f"New Message from {name}: {subject}",
             message=plain_message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[settings.ADMIN_EMAIL],
             html_message=html_message,
-            fail_silently=False,
         )
 
         messages.success(request, "Thank you! Your message has been sent. We'll reply soon.")
@@ -0,0 +1,232 @@
+# adorn_jewellery/static_assets.py
+"""
+Production static files without a CDN or nginx in front.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage (content
+hashes in file names) that also writes ``.gz`` and, when the optional
+``brotli`` package is installed, ``.br`` siblings for text assets during
+``collectstatic``.
+
+``StaticWSGIHandler`` / ``StaticASGIHandler`` wrap the Django application and
+answer ``STATIC_URL`` requests straight from ``STATIC_ROOT``: the best
+precompressed file the client accepts, ``Vary: Accept-Encoding``, a strong
+ETag, and a one-year ``immutable`` lifetime for hashed names. Everything else
+goes to Django. The file index is built once at startup, so run
+``collectstatic`` before starting the server.
+"""
+import asyncio
+import gzip
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always produced
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.svg', '.json', '.map', '.txt', '.xml', '.html', '.ico')
+# Skip the compressed copy unless it is at least this much smaller.
+MIN_SAVING = 0.05
+CHUNK_SIZE = 64 * 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+
+# (Content-Encoding, file suffix) in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _accepted_encodings(header):
+    """``{coding: q}`` from an ``Accept-Encoding`` header; a malformed q-value counts as a refusal."""
+    qualities = {}
+    for part in (header or '').split(','):
+        coding, *params = (item.strip() for item in part.split(';'))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _sep, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality if 0 <= quality <= 1 else 0.0
+    return qualities
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write the precompressed siblings of ``name``; returns the suffixes written."""
+        path = self.path(name)
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        written = []
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                with open(path + suffix, 'wb') as fh:
+                    fh.write(compressed)
+                written.append(suffix)
+        return written
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'image/svg+xml'):
+            self.content_type += '; charset=utf-8'
+        self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL
+        self.variants = {None: (path, stat.st_size)}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (path + suffix, os.path.getsize(path + suffix))
+
+    def choose(self, accept_encoding):
+        """``(path, size, etag, headers)`` for the best encoding the client accepts."""
+        qualities = _accepted_encodings(accept_encoding)
+        wildcard = qualities.get('*', 0.0)
+
+        def quality(encoding):
+            return qualities.get(encoding, wildcard)
+
+        # Highest q wins, ties go to the ENCODINGS order; q=0 means refused, leaving identity.
+        candidates = [encoding for encoding, _suffix in ENCODINGS
+                      if encoding in self.variants and quality(encoding) > 0]
+        encoding = max(candidates, key=quality, default=None)
+        path, size = self.variants[encoding]
+        # Each encoding is a different byte sequence, so each gets its own strong ETag.
+        etag = f'{self.etag[:-1]}-{encoding}"' if encoding else self.etag
+        headers = [
+            ('Content-Type', self.content_type),
+            ('Cache-Control', self.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', self.last_modified),
+        ]
+        if len(self.variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return path, size, etag, headers
+
+
+class StaticAssets:
+    """Index of everything under ``STATIC_ROOT``, keyed by request path."""
+
+    def __init__(self, root=None, url=None):
+        self.root = str(root or settings.STATIC_ROOT)
+        self.url = url or settings.STATIC_URL
+        if not self.url.startswith('/'):
+            self.url = '/' + self.url
+        self.files = {}
+        if os.path.isdir(self.root):
+            self._scan()
+
+    def _scan(self):
+        hashed = set()
+        manifest = os.path.join(self.root, ManifestStaticFilesStorage.manifest_name)
+        if os.path.exists(manifest):
+            storage = ManifestStaticFilesStorage(location=self.root)
+            hashed = set(storage.hashed_files.values())
+        suffixes = tuple(suffix for _encoding, suffix in ENCODINGS)
+        for directory, _dirs, names in os.walk(self.root):
+            for filename in names:
+                if filename.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                self.files[self.url + name] = StaticFile(path, immutable=name in hashed)
+
+    def match(self, method, path):
+        if method not in ('GET', 'HEAD') or not path.startswith(self.url):
+            return None
+        return self.files.get(path)
+
+    def respond(self, asset, request_headers):
+        """``(status, headers, path or None)``; ``path`` is ``None`` for bodiless responses."""
+        path, size, etag, headers = asset.choose(request_headers.get('accept-encoding'))
+        if_none_match = request_headers.get('if-none-match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return 304, [header for header in headers if header[0] != 'Content-Type'], None
+        return 200, headers + [('Content-Length', str(size))], path
+
+
+def _chunks(fh):
+    with fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            yield chunk
+
+
+class StaticWSGIHandler:
+    def __init__(self, application, assets=None):
+        self.application = application
+        self.assets = assets or StaticAssets()
+
+    def __call__(self, environ, start_response):
+        asset = self.assets.match(environ.get('REQUEST_METHOD'), environ.get('PATH_INFO', ''))
+        if asset is None:
+            return self.application(environ, start_response)
+
+        status, headers, path = self.assets.respond(asset, {
+            'accept-encoding': environ.get('HTTP_ACCEPT_ENCODING', ''),
+            'if-none-match': environ.get('HTTP_IF_NONE_MATCH', ''),
+        })
+        start_response('200 OK' if status == 200 else '304 Not Modified', headers)
+        if path is None or environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        fh = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        return file_wrapper(fh, CHUNK_SIZE) if file_wrapper else _chunks(fh)
+
+
+class StaticASGIHandler:
+    def __init__(self, application, assets=None):
+        self.application = application
+        self.assets = assets or StaticAssets()
+
+    async def __call__(self, scope, receive, send):
+        asset = None
+        if scope['type'] == 'http':
+            asset = self.assets.match(scope['method'], scope['path'])
+        if asset is None:
+            return await self.application(scope, receive, send)
+
+        request_headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        status, headers, path = self.assets.respond(asset, request_headers)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        if path is None or scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        with open(path, 'rb') as fh:
+            while True:
+                chunk = await asyncio.to_thread(fh.read, CHUNK_SIZE)
+                more = len(chunk) == CHUNK_SIZE
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': more})
+                if not more:
+                    break
@@ -0,0 +1,211 @@
+# adorn_jewellery/timing.py
+"""
+Per-request performance instrumentation.
+
+``RequestTimingMiddleware`` records, for every request, the number of SQL
+queries and the time spent in the database, in template rendering and in
+queueing mail, plus the slowest statement and the most repeated one. The
+totals go out as a ``Server-Timing`` header (shown in the browser's network
+panel) and as a JSON log line on the ``adorn_jewellery.timing`` logger:
+at INFO for every request, at WARNING when a request is slow or runs the
+same statement ``REPEATED_QUERY_THRESHOLD`` times or more, which is almost
+always an N+1 loop. SQL never goes into the header, only into the log.
+
+Queries are timed by a ``connection.execute_wrapper`` added to each
+database connection as it opens; templates by the ``TimedDjangoTemplates``
+backend named in ``TEMPLATES``; mail by ``track('mail')`` in
+``shop.mail``. The current request's ``RequestTimer`` lives in a context
+variable, so async views and their ``sync_to_async`` database calls are
+counted too, and code running outside a request pays one lookup per query.
+Template time includes any queries the template triggers lazily.
+
+On when ``REQUEST_TIMING`` is set, which defaults to ``DEBUG``: the header
+is sent to every visitor, so production only enables it deliberately.
+"""
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+logger = logging.getLogger(__name__)
+
+REPEATED_QUERY_THRESHOLD = 5
+SLOW_REQUEST_MS = 500
+MAX_LOGGED_SQL = 500
+
+_current = ContextVar('request_timer', default=None)
+
+
+class RequestTimer:
+    __slots__ = ('started', 'queries', 'db', 'slowest', 'slowest_sql', 'statements', 'spans', 'active')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = ''
+        self.statements = {}
+        self.spans = {}
+        self.active = set()
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.db += elapsed
+        self.statements[sql] = self.statements.get(sql, 0) + 1
+        if elapsed > self.slowest:
+            self.slowest, self.slowest_sql = elapsed, sql
+
+    def most_repeated(self):
+        """``(sql, count)`` for the statement run most often, or ``('', 0)``."""
+        if not self.statements:
+            return '', 0
+        return max(self.statements.items(), key=lambda item: item[1])
+
+
+@contextmanager
+def track(name):
+    """Add the time spent in the block to the current request's ``name`` span."""
+    timer = _current.get()
+    # Nested blocks of the same kind (a template rendering another) count once.
+    if timer is None or name in timer.active:
+        yield
+        return
+    timer.active.add(name)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timer.spans[name] = timer.spans.get(name, 0.0) + perf_counter() - started
+        timer.active.discard(name)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _current.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.add_query(sql, perf_counter() - started)
+
+
+def install(db_connection):
+    if _time_query not in db_connection.execute_wrappers:
+        db_connection.execute_wrappers.append(_time_query)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with track('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with rendering time added to the request's timings."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def server_timing(timer, total):
+    metrics = [f'db;dur={_ms(timer.db)};desc="{timer.queries} queries"']
+    for name, label in (('template', 'tpl'), ('mail', 'mail')):
+        if name in timer.spans:
+            metrics.append(f'{label};dur={_ms(timer.spans[name])}')
+    _sql, repeats = timer.most_repeated()
+    if repeats >= REPEATED_QUERY_THRESHOLD:
+        metrics.append(f'repeat;desc="same query {repeats}x"')
+    metrics.append(f'total;dur={_ms(total)}')
+    return ', '.join(metrics)
+
+
+def _log(request, response, timer, total):
+    sql, repeats = timer.most_repeated()
+    flagged = repeats >= REPEATED_QUERY_THRESHOLD
+    level = logging.WARNING if flagged or total * 1000 >= SLOW_REQUEST_MS else logging.INFO
+    if not logger.isEnabledFor(level):
+        return
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'total_ms': _ms(total),
+        'queries': timer.queries,
+        'db_ms': _ms(timer.db),
+        'template_ms': _ms(timer.spans.get('template', 0.0)),
+        'mail_ms': _ms(timer.spans.get('mail', 0.0)),
+        'slowest_ms': _ms(timer.slowest),
+        'slowest_sql': timer.slowest_sql[:MAX_LOGGED_SQL],
+    }
+    if flagged:
+        record['repeated_sql'] = sql[:MAX_LOGGED_SQL]
+        record['repeats'] = repeats
+    logger.log(level, json.dumps(record))
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        # A connection opened before this module was imported has no wrapper yet.
+        install(connection)
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer()
+        token = _current.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timer)
+
+    def _finish(self, request, response, timer):
+        total = perf_counter() - timer.started
+        response['Server-Timing'] = server_timing(timer, total)
+        _log(request, response, timer, total)
+        return response
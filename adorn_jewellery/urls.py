@@ -24,6 +24,6 @@ urlpatterns = [
     path('', include('adorn_jewellery.shop.urls')),
 ]
 
+# Static files: runserver serves them in DEBUG; otherwise wsgi.py/asgi.py do.
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -18,31 +18,60 @@ function saveCart(cart) {
     updateCartCount();
 }
 
+// ── Logged-in cart changes are queued and sent to /api/cart/ as one batch ──
+const CART_FLUSH_DELAY = 300;
+let pendingCartOperations = [];
+let cartFlushTimer = null;
+
+function queueCartOperation(operation) {
+    pendingCartOperations.push(operation);
+    clearTimeout(cartFlushTimer);
+    cartFlushTimer = setTimeout(flushCartOperations, CART_FLUSH_DELAY);
+}
+
+async function flushCartOperations(keepalive = false) {
+    clearTimeout(cartFlushTimer);
+    cartFlushTimer = null;
+    const operations = pendingCartOperations;
+    pendingCartOperations = [];
+    if (!operations.length) return null;
+
+    try {
+        const response = await fetch('/api/cart/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: JSON.stringify({ operations: operations }),
+            keepalive: keepalive
+        });
+        const data = await response.json();
+        if (data.success) {
+            document.getElementById('cart-count').textContent = data.cart_count || 0;
+            if (window.location.pathname.includes('/cart/')) {
+                location.reload(); // refresh to show server items
+            }
+        } else {
+            console.error('Cart update rejected:', data.error);
+        }
+        return data;
+    } catch (err) {
+        console.error("Failed to update server cart", err);
+        alert("Please log in again.");
+        return null;
+    }
+}
+
+// Send anything still queued when the user navigates away.
+window.addEventListener('pagehide', () => flushCartOperations(true));
+
 // ── MODIFIED: addToCart now supports both guest & logged-in users ──
 async function addToCart(id, name, price, image, quantity = 1) {
     if (isLoggedIn()) {
-        // ── Logged-in user → save to database ──
-        try {
-            const response = await fetch('/api/add-to-cart/', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': getCsrfToken()
-                },
-                body: JSON.stringify({ product_id: id, quantity: quantity })
-            });
-            if (response.ok) {
-                const data = await response.json();
-                document.getElementById('cart-count').textContent = data.cart_count || 0;
-                showNotification('Item added to cart!');
-                if (window.location.pathname.includes('/cart/')) {
-                    location.reload(); // refresh to show server items
-                }
-            }
-        } catch (err) {
-            console.error("Failed to add to server cart", err);
-            alert("Please log in again.");
-        }
+        // ── Logged-in user → queue for the next batch; rapid clicks share one request ──
+        queueCartOperation({ op: 'add', product_id: id, quantity: quantity });
+        showNotification('Item added to cart!');
     } else {
         // ── Guest user → use your original localStorage logic ──
         const cart = getCart();
@@ -68,9 +97,9 @@ async function addToCart(id, name, price, image, quantity = 1) {
 // ── Keep all your other functions EXACTLY as they are ──
 function removeFromCart(id) {
     if (isLoggedIn()) {
-        // For logged-in users, we'll just reload the page (simpler)
         if (confirm("Remove this item?")) {
-            location.href = `/cart/remove/${id}/`; // we'll create this URL later if needed
+            queueCartOperation({ op: 'remove', product_id: id });
+            flushCartOperations();
         }
     } else {
         let cart = getCart();
@@ -82,7 +111,7 @@ function removeFromCart(id) {
 
 function updateCartQuantity(id, quantity) {
     if (isLoggedIn()) {
-        location.reload(); // simple for now
+        queueCartOperation({ op: 'set', product_id: id, quantity: Math.max(0, parseInt(quantity) || 0) });
         return;
     }
     const cart = getCart();
@@ -98,16 +127,22 @@ function updateCartQuantity(id, quantity) {
     }
 }
 
+// ── Header badges: rendered by the server, refreshed together in one request ──
+async function refreshHeaderState() {
+    try {
+        const res = await fetch('/api/header-state/');
+        const data = await res.json();
+        document.getElementById('cart-count').textContent = data.cart_count || 0;
+        document.getElementById('wishlist-count').textContent = data.wishlist_count || 0;
+    } catch (e) {
+        console.error(e);
+    }
+}
+
 // ── updateCartCount: show server count when logged in ──
 async function updateCartCount() {
     if (isLoggedIn()) {
-        try {
-            const res = await fetch('/api/cart-count/');
-            const data = await res.json();
-            document.getElementById('cart-count').textContent = data.cart_count || 0;
-        } catch (e) {
-            console.error(e);
-        }
+        await refreshHeaderState();
     } else {
         const cart = getCart();
         const totalItems = cart.reduce((sum, item) => sum + item.quantity, 0);
@@ -120,8 +155,39 @@ async function updateCartCount() {
 function displayCartItems() { /* ... your beautiful code ... */ }
 function showNotification(message) { /* ... your animation ... */ }
 
+// ── After login/signup: move the guest localStorage cart & wishlist to the account once ──
+async function mergeGuestState() {
+    const cart = getCart();
+    const wishlist = JSON.parse(localStorage.getItem('wishlist')) || [];
+    try {
+        const response = await fetch('/api/merge-guest/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: JSON.stringify({
+                cart: cart.map(item => ({ id: item.id, quantity: item.quantity })),
+                wishlist: wishlist.map(item => ({ id: item.id }))
+            })
+        });
+        const data = await response.json();
+        if (data.success) {
+            // The server copy is the source of truth from here on.
+            localStorage.removeItem('cart');
+            localStorage.removeItem('wishlist');
+            document.getElementById('cart-count').textContent = data.cart_count || 0;
+            document.getElementById('wishlist-count').textContent = data.wishlist_count || 0;
+        }
+    } catch (err) {
+        console.error('Failed to merge guest cart', err);
+    }
+}
+
 document.addEventListener('DOMContentLoaded', function() {
-    updateCartCount();
+    if (isLoggedIn() && document.body.dataset.mergeGuestState === "True") mergeGuestState();
+    // Logged-in counts are already in the page.
+    if (!isLoggedIn()) updateCartCount();
     if (document.getElementById('cart-items-list')) {
         displayCartItems();
     }
@@ -36,3 +36,51 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 });
+
+// ── Search typeahead ──
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.querySelector('.search-input');
+    if (!input) return;
+
+    const list = document.createElement('ul');
+    list.className = 'search-suggestions';
+    input.parentNode.appendChild(list);
+
+    let timer = null;
+    let latest = '';
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            list.replaceChildren();
+            return;
+        }
+        timer = setTimeout(async () => {
+            latest = query;
+            try {
+                const res = await fetch(`/api/autocomplete/?q=${encodeURIComponent(query)}`);
+                const data = await res.json();
+                if (data.query !== latest) return; // a newer keystroke already went out
+                // Names come from the admin and supplier imports: insert them as text, never as HTML.
+                list.replaceChildren(...data.suggestions.map(item => {
+                    const li = document.createElement('li');
+                    const link = document.createElement('a');
+                    const type = document.createElement('span');
+                    link.href = item.url;
+                    type.className = 'suggestion-type';
+                    type.textContent = item.type;
+                    link.append(type, item.label);
+                    li.appendChild(link);
+                    return li;
+                }));
+            } catch (e) {
+                console.error('Autocomplete failed', e);
+            }
+        }, 80);
+    });
+
+    document.addEventListener('click', function(e) {
+        if (!input.parentNode.contains(e.target)) list.replaceChildren();
+    });
+});
@@ -35,7 +35,7 @@ async function toggleWishlist(id, name, price, image) {
             const data = await response.json();
 
             if (data.success) {
-                updateWishlistCount();
+                document.getElementById('wishlist-count').textContent = data.wishlist_count || 0;
                 showNotification(
                     data.action === 'added' 
                         ? 'Added to wishlist!' 
@@ -96,13 +96,7 @@ function removeFromWishlist(id) {
 // ── MODIFIED: updateWishlistCount shows correct count for both cases ──
 async function updateWishlistCount() {
     if (isLoggedIn()) {
-        try {
-            const res = await fetch('/api/wishlist-count/');
-            const data = await res.json();
-            document.getElementById('wishlist-count').textContent = data.wishlist_count || 0;
-        } catch (e) {
-            console.error("Failed to fetch wishlist count", e);
-        }
+        await refreshHeaderState();
     } else {
         const wishlist = getWishlist();
         const countElement = document.getElementById('wishlist-count');
@@ -199,7 +193,8 @@ function showNotification(message) {
 
 // ── DOM Loaded ──
 document.addEventListener('DOMContentLoaded', function() {
-    updateWishlistCount();
+    // Logged-in counts are already in the page.
+    if (!isLoggedIn()) updateWishlistCount();
     updateWishlistButtons();
     
     if (document.getElementById('wishlist-items-list')) {